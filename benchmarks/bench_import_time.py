@@ -0,0 +1,132 @@
+"""
+Import time budget of the Skytap XBlock.
+
+LMS workers import every installed XBlock when they boot, so the time it takes to import the XBlock class
+delays every worker start (and every cold start when autoscaling). This script imports the class in fresh
+interpreters with `python -X importtime`, and checks that
+
+* the modules only needed by launches (the HTTP client and the Boomi client) or by optional features (SQLite)
+  are not imported, and
+* the total import time, and the time spent in xblock_skytap's own modules, stay within the budget stored
+  in `import_budget.json`.
+
+Import times depend on the machine; record a budget on the machine that runs the check::
+
+    python benchmarks/bench_import_time.py --update-budget
+    python benchmarks/bench_import_time.py [--runs 5]
+"""
+
+# Imports ###########################################################
+
+import argparse
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+
+# Globals ###########################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+STATEMENT = "from xblock_skytap import SkytapXBlock"
+
+# Modules that must only be imported by the first launch, or when an optional feature is enabled.
+DEFERRED_MODULES = ("requests", "urllib3", "sqlite3", "xblock_skytap.boomi", "xblock_skytap.routing")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+# Functions #########################################################
+
+def import_times(statement):
+    """
+    Run `statement` in a fresh interpreter, and return the time spent importing each module (in microseconds,
+    excluding the modules it imports), in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(1))
+    return times
+
+
+def measure(runs):
+    """
+    Return the import time metrics of the XBlock class (the fastest of `runs` runs),
+    and the modules it imports, with their import times in microseconds.
+    """
+    startup_modules = set(import_times("pass"))
+    best = None
+    for _ in range(runs):
+        times = {
+            module: microseconds for module, microseconds in import_times(STATEMENT).items()
+            if module not in startup_modules
+        }
+        metrics = {
+            "total_ms": sum(times.values()) / 1000.0,
+            "own_ms": sum(
+                microseconds for module, microseconds in times.items() if module.split(".")[0] == "xblock_skytap"
+            ) / 1000.0,
+        }
+        if best is None or metrics["total_ms"] < best[0]["total_ms"]:
+            best = (metrics, times)
+    return best
+
+
+def main(argv=None):
+    """
+    Measure the import time of the XBlock class, print it, and check it against the budget. Return the exit status.
+    """
+    parser = argparse.ArgumentParser(description="Check the import time of the Skytap XBlock against a budget.")
+    parser.add_argument("--runs", type=int, default=5, help="imports to measure; the fastest one is reported")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    parser.add_argument("--budget", default=BUDGET_PATH, help="path of the budget file")
+    parser.add_argument("--update-budget", action="store_true",
+                        help="store the measured times, plus HEADROOM, as the new budget")
+    parser.add_argument("--headroom", type=float, default=0.5,
+                        help="relative headroom added to the measured times by --update-budget")
+    args = parser.parse_args(argv)
+
+    metrics, times = measure(args.runs)
+    print("{:>8.1f} ms total".format(metrics["total_ms"]))
+    print("{:>8.1f} ms in xblock_skytap modules".format(metrics["own_ms"]))
+    print("Slowest modules (excluding the modules they import):")
+    for module, microseconds in sorted(times.items(), key=lambda item: -item[1])[:args.top]:
+        print("{:>8.1f} ms {}".format(microseconds / 1000.0, module))
+
+    failures = [
+        "{} is imported, but should only be imported when needed".format(module)
+        for module in DEFERRED_MODULES if module in times
+    ]
+
+    if args.update_budget:
+        budget = {name: math.ceil(value * (1 + args.headroom)) for name, value in metrics.items()}
+        with open(args.budget, "w") as budget_file:
+            json.dump(budget, budget_file, indent=4, sort_keys=True)
+            budget_file.write("\n")
+        print("Stored the budget in {}.".format(args.budget))
+    elif os.path.exists(args.budget):
+        with open(args.budget) as budget_file:
+            budget = json.load(budget_file)
+        failures.extend(
+            "{}: {:.1f} exceeds the budget of {}".format(name, value, budget[name])
+            for name, value in sorted(metrics.items()) if name in budget and value > budget[name]
+        )
+    else:
+        print("No budget at {}; run with --update-budget to record one.".format(args.budget))
+
+    for failure in failures:
+        print("FAILURE " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
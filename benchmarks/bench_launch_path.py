@@ -0,0 +1,257 @@
+"""
+Benchmark and allocation regression suite for the launch path of the Skytap XBlock.
+
+Exercises `launch`, `get_boomi_url`, `get_boomi_configuration` and `student_view` against Boomi mocked with httpretty
+(no network latency), so only the overhead of the XBlock itself is measured. For every benchmark, records the
+throughput (calls per second), the memory allocated per call (the tracemalloc peak above the memory in use
+before the call), the memory retained per call, and the peak memory of the whole run; then compares them to the
+baseline stored in `baseline.json`, and exits with status 1 if any of them regressed beyond the thresholds.
+The requests that httpretty records are discarded after every launch, so they don't count as memory retained
+by the launch, and the peak memory of the run only grows with `--number` if calls retain memory.
+
+Throughput depends on the machine, and varies between runs on shared machines, so record a baseline
+on the machine that runs the comparison, and only tighten the throughput threshold on a quiet machine.
+Memory use hardly varies between runs, which makes it the more sensitive check; record the baseline with
+the Python version that runs the comparison, though, as before Python 3.9 allocations per call are measured
+by restarting tracemalloc, which counts somewhat more of them::
+
+    python benchmarks/bench_launch_path.py --update-baseline
+    python benchmarks/bench_launch_path.py [--number 500] [--time-threshold 0.5] [--memory-threshold 0.2]
+"""
+
+# Imports ###########################################################
+
+import argparse
+import array
+import gc
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from types import SimpleNamespace
+
+import django
+import httpretty
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imports that need Django settings #################################
+
+if not settings.configured:
+    settings.configure(USE_I18N=True, INSTALLED_APPS=[])
+    django.setup()
+
+from xblock.field_data import DictFieldData  # pylint: disable=wrong-import-position
+
+from tests.unit.mixins.boomi import BOOMI_CONFIGURATION, CreateVmMockMixin  # pylint: disable=wrong-import-position
+from xblock_skytap.skytap import SkytapXBlock  # pylint: disable=wrong-import-position
+
+# Globals ###########################################################
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    # Every launch goes through Boomi, rather than the launch cache.
+    "launch_cache": {"enabled": False},
+}
+
+CACHED_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+}
+
+# Metrics where higher is better; for the others, lower is better.
+HIGHER_IS_BETTER = ("ops_per_sec",)
+TIME_METRICS = ("ops_per_sec",)
+# Growth in memory use (in bytes) that is never a regression, per metric: e.g. a few interned strings,
+# or for the peak of a run, a latency histogram of the metrics adding buckets.
+MEMORY_SLACK = {"peak_bytes": 16 * 1024}
+DEFAULT_MEMORY_SLACK = 1024
+
+
+# Functions #########################################################
+
+def make_block(xblock_settings):
+    """
+    Return a Skytap XBlock in a stubbed edx-platform runtime, configured with `xblock_settings`.
+
+    Unlike Mock, the stubs don't record their calls, which would show up as memory retained by every call.
+    """
+    user = SimpleNamespace(emails=["learner@example.com"])
+    service = SimpleNamespace(get_current_user=lambda: user, ugettext=lambda text: text)
+    runtime = SimpleNamespace(
+        service=lambda block, service_name: service,
+        user_is_staff=False,
+        local_resource_url=lambda block, uri: "/resource/skytap/" + uri,
+    )
+    scope_ids = SimpleNamespace(
+        block_type="skytap",
+        usage_id=SimpleNamespace(course_key=SimpleNamespace(org="Org", course="Course", run="Run")),
+    )
+    block = SkytapXBlock(runtime, DictFieldData({}), scope_ids)
+    block.get_xblock_settings = lambda default=None: xblock_settings
+    return block
+
+
+def launch(block):
+    """
+    Call the launch handler of `block`.
+    """
+    block.launch(SimpleNamespace(method="POST", body=b"{}"))
+    # httpretty keeps every request it intercepts, and every chunk sent to its fake sockets;
+    # don't count them as memory retained by the launch.
+    del httpretty.core.httpretty.latest_requests[:]
+    del httpretty.core.fakesock.socket._sent_data[:]  # pylint: disable=protected-access
+
+
+def get_benchmarks():
+    """
+    Return the benchmarks to run, as (name, callable) pairs.
+    """
+    block = make_block(XBLOCK_SETTINGS)
+    cached_block = make_block(CACHED_XBLOCK_SETTINGS)
+    return [
+        ("get_boomi_configuration", block.get_boomi_configuration),
+        ("get_boomi_url", block.get_boomi_url),
+        ("launch", lambda: launch(block)),
+        ("launch_cached", lambda: launch(cached_block)),
+        ("student_view", lambda: block.student_view({})),
+    ]
+
+
+def reset_peak():
+    """
+    Reset the peak of the memory traced by tracemalloc to the memory in use.
+
+    `tracemalloc.reset_peak` needs Python 3.9; on older versions, tracing restarts instead,
+    which also forgets the memory in use, so only compare the peak to the memory in use after the reset.
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def measure(func, number, repeat):
+    """
+    Return the throughput and memory metrics of `func`.
+    """
+    # Warm up caches (compiled configuration, templates, connection pools) before measuring.
+    for _ in range(10):
+        func()
+    ops_per_sec = number / min(timeit.repeat(func, number=number, repeat=repeat))
+
+    # Preallocated, so that recording the measurements doesn't count as memory allocated by `func`.
+    allocated = array.array("q", bytes(8 * number))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for index in range(number):
+            reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            allocated[index] = peak - before
+    finally:
+        tracemalloc.stop()
+
+    # Measured separately, as resetting the peak may restart tracing. Garbage is collected after every call,
+    # so that the peak doesn't depend on when the collector runs (httpretty leaves reference cycles behind);
+    # freezing the objects that exist already keeps these collections fast.
+    gc.collect()
+    gc.freeze()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(number):
+            func()
+            gc.collect()
+        end, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        gc.unfreeze()
+    allocated = sorted(allocated)
+    return {
+        "ops_per_sec": round(ops_per_sec, 1),
+        # The median is less sensitive to the occasional reallocation of an internal buffer.
+        "alloc_bytes_per_call": allocated[len(allocated) // 2],
+        "retained_bytes_per_call": max(end - start, 0) // number,
+        "peak_bytes": peak - start,
+    }
+
+
+def compare(results, baseline, time_threshold, memory_threshold):
+    """
+    Return the regressions of `results` with respect to `baseline`, as human-readable strings.
+    """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        for metric, value in sorted(metrics.items()):
+            expected = baseline.get(name, {}).get(metric)
+            if expected is None:
+                continue
+            threshold = time_threshold if metric in TIME_METRICS else memory_threshold
+            if metric in HIGHER_IS_BETTER:
+                regressed = value < expected * (1 - threshold)
+            else:
+                regressed = value > expected * (1 + threshold) + MEMORY_SLACK.get(metric, DEFAULT_MEMORY_SLACK)
+            if regressed:
+                regressions.append("{name}.{metric}: {value} (baseline {expected})".format(
+                    name=name, metric=metric, value=value, expected=expected,
+                ))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmarks, print their results, and compare them to the baseline. Return the exit status.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the launch path and check for regressions.")
+    parser.add_argument("--number", type=int, default=500, help="calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements; the fastest one is reported")
+    parser.add_argument("--time-threshold", type=float, default=0.5,
+                        help="tolerated relative drop in throughput")
+    parser.add_argument("--memory-threshold", type=float, default=0.2,
+                        help="tolerated relative growth in memory use")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="path of the baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    httpretty.enable()
+    try:
+        CreateVmMockMixin.mock_createvm(make_block(XBLOCK_SETTINGS).get_boomi_url())
+        results = {}
+        for name, func in get_benchmarks():
+            results[name] = measure(func, args.number, args.repeat)
+            print("{name:>24}: {ops_per_sec:10.1f} ops/s {alloc_bytes_per_call:9d} B/call allocated "
+                  "{retained_bytes_per_call:6d} B/call retained {peak_bytes:9d} B peak".format(
+                      name=name, **results[name]))
+    finally:
+        httpretty.disable()
+        httpretty.reset()
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=4, sort_keys=True)
+            baseline_file.write("\n")
+        print("Stored the baseline in {}.".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at {}; run with --update-baseline to record one.".format(args.baseline))
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
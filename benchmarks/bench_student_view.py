@@ -0,0 +1,88 @@
+"""
+Microbenchmark of rendering the student view of the Skytap XBlock.
+
+Compares rendering the template through `ResourceLoader.render_django_template` on every view
+(as the student view used to) with the cached rendering in xblock_skytap.rendering.
+
+Usage::
+
+    python benchmarks/bench_student_view.py [--number 2000]
+"""
+
+# Imports ###########################################################
+
+import argparse
+import os
+import sys
+import timeit
+from unittest.mock import Mock
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imports that need Django settings #################################
+
+if not settings.configured:
+    settings.configure(USE_I18N=True, INSTALLED_APPS=[])
+    django.setup()
+
+from xblock.field_data import DictFieldData  # pylint: disable=wrong-import-position
+from xblockutils.resources import ResourceLoader  # pylint: disable=wrong-import-position
+
+from xblock_skytap.skytap import SkytapXBlock  # pylint: disable=wrong-import-position
+
+
+# Functions #########################################################
+
+def make_block():
+    """
+    Return a Skytap XBlock in a mocked runtime.
+    """
+    runtime = Mock()
+    runtime.local_resource_url = lambda block, uri: "/resource/skytap/" + uri
+    runtime.service = Mock(return_value=None)
+    scope_ids = Mock()
+    scope_ids.block_type = "skytap"
+    block = SkytapXBlock(runtime, DictFieldData({}), scope_ids)
+    block.get_current_course = lambda: None
+    return block
+
+
+def uncached_view(block, loader):
+    """
+    Render the student view the way it was rendered before rendering was cached.
+    """
+    content = loader.render_django_template("templates/skytap.html", {"display_name": block.display_name})
+    return (
+        content,
+        block.runtime.local_resource_url(block, "public/css/skytap.css"),
+        block.runtime.local_resource_url(block, "public/js/src/skytap.js"),
+    )
+
+
+def main(argv=None):
+    """
+    Run the benchmark and print the time per view.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark rendering the student view.")
+    parser.add_argument("--number", type=int, default=2000, help="views per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements; the fastest one is reported")
+    args = parser.parse_args(argv)
+
+    block = make_block()
+    loader = ResourceLoader("xblock_skytap.skytap")
+    results = []
+    for name, view in (
+            ("uncached", lambda: uncached_view(block, loader)),
+            ("cached", lambda: block.student_view({})),
+    ):
+        best = min(timeit.repeat(view, number=args.number, repeat=args.repeat)) / args.number
+        results.append(best)
+        print("{name:>10}: {microseconds:9.1f} us/view".format(name=name, microseconds=best * 1e6))
+    print("   speedup: {speedup:9.1f}x".format(speedup=results[0] / results[1]))
+
+
+if __name__ == "__main__":
+    main()
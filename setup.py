@@ -29,9 +29,18 @@ setup(
     install_requires=[
         'XBlock',
         'xblock-utils',
+        'requests',
+        'edx-opaque-keys',
     ],
+    extras_require={
+        'async': ['httpx; python_version >= "3.8"'],
+    },
     entry_points={
         'xblock.v1': 'skytap = xblock_skytap:SkytapXBlock',
+        'console_scripts': [
+            'skytap-provision = xblock_skytap.provision:main',
+            'skytap-reap = xblock_skytap.reaper:main',
+        ],
     },
     package_data=package_data("xblock_skytap", ["public", "templates"]),
 )
@@ -91,7 +91,7 @@ class TestSkytap(StudioEditableBaseTest):
 
         def mock_post(*args, **kwargs):  # pylint: disable=unused-argument
             """
-            Function to use for patching `requests.post`.
+            Function to use for patching `BoomiClient.post`.
 
             Sleeps for a second before returning a mock response.
 
@@ -110,7 +110,7 @@ class TestSkytap(StudioEditableBaseTest):
             }
             return mock_response
 
-        with patch('xblock_skytap.skytap.requests.post', new=mock_post):
+        with patch('xblock_skytap.boomi.BoomiClient.post', new=mock_post):
             launch_button.click()
 
             # Verify that button for launching exercise environment is disabled
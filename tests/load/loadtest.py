@@ -0,0 +1,245 @@
+"""
+End-to-end load test of the `launch` handler.
+
+Drives `SkytapXBlock.launch` through the XBlock workbench runtime (as used by the integration tests)
+from a pool of concurrent workers, against a real HTTP endpoint (usually the Boomi simulator),
+and reports throughput, tail latency and the outcomes of all launches, as well as the per-phase latencies
+collected by the XBlock itself.
+
+Example::
+
+    python -m tests.load.loadtest --simulate --latency lognormal:1,0.5 --requests 500 --concurrency 25
+
+Without --simulate, launches go to the Boomi endpoint at --boomi-url. Use --learners to control how many
+distinct learners the launches are spread over (by default every launch is for a new learner, so the
+launch cache never hits), and --settings to pass a JSON file with additional Skytap XBlock settings,
+e.g. to enable launch jobs or tune the circuit breaker. The xblock-sdk must be installed (see test-requirements.txt).
+"""
+
+# Imports ###########################################################
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+from webob import Request
+
+from xblock_skytap.metrics import LatencyHistogram, get_metrics
+
+from .simulator import BoomiSimulator, SimulatorProfile, parse_latency
+
+
+# Globals ###########################################################
+
+COURSE_NAME = "LoadTest"
+COURSE_RUN = "run"
+
+SCENARIO = '<skytap url_name="load" />'
+
+
+# Classes ###########################################################
+
+class LoadResult(object):
+    """
+    Outcome of a single launch.
+    """
+
+    __slots__ = ("status", "latency")
+
+    def __init__(self, status, latency):
+        self.status = status
+        self.latency = latency
+
+
+class WorkbenchLauncher(object):
+    """
+    Launch environments through the `launch` handler of a Skytap XBlock in the workbench runtime.
+
+    The workbench provides neither XBlock settings nor learners with email addresses nor course keys,
+    so these are patched in while the launcher is in use::
+
+        with WorkbenchLauncher(xblock_settings, learners=50) as launch:
+            status, body = launch(0)
+    """
+
+    def __init__(self, xblock_settings, learners=None):
+        self.xblock_settings = xblock_settings
+        self.learners = learners
+        self._local = threading.local()
+        self._patches = []
+        self._runtime = None
+        self._usage_id = None
+
+    def __enter__(self):
+        from xblock_skytap import SkytapXBlock  # pylint: disable=import-outside-toplevel
+
+        self._runtime, self._usage_id = setup_workbench()
+        course_key = Mock(course=COURSE_NAME, run=COURSE_RUN)
+        self._patches = [
+            patch.object(SkytapXBlock, "get_xblock_settings", lambda block, default=None: self.xblock_settings),
+            patch.object(SkytapXBlock, "get_current_course", lambda block: course_key),
+            patch.object(SkytapXBlock, "get_current_user", lambda block: Mock(emails=[self._local.email])),
+        ]
+        for patcher in self._patches:
+            patcher.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for patcher in reversed(self._patches):
+            patcher.stop()
+
+    def __call__(self, index):
+        """
+        Launch the environment for the learner of launch number `index`, and return the status code and body.
+        """
+        block = getattr(self._local, "block", None)
+        if block is None:
+            # Blocks aren't meant to be shared between threads.
+            block = self._local.block = self._runtime.get_block(self._usage_id)
+        learner = index % self.learners if self.learners else index
+        self._local.email = "learner{learner}@example.com".format(learner=learner)
+        request = Request.blank("/", method="POST", body=b"{}", content_type="application/json")
+        response = self._runtime.handle(block, "launch", request)
+        return response.status_code, response.body
+
+
+# Functions #########################################################
+
+def setup_workbench():
+    """
+    Configure Django with the workbench settings, and return a workbench runtime and the usage ID of a Skytap XBlock.
+    """
+    import workbench  # pylint: disable=import-outside-toplevel
+
+    # The workbench settings file is not inside any python module (see run_tests.py).
+    sys.path.append(os.path.dirname(os.path.dirname(workbench.__file__)))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+
+    import django  # pylint: disable=import-outside-toplevel
+    from django.core.management import call_command  # pylint: disable=import-outside-toplevel
+    django.setup()
+    call_command("migrate", verbosity=0, interactive=False)
+
+    from workbench.runtime import WorkbenchRuntime  # pylint: disable=import-outside-toplevel
+    runtime = WorkbenchRuntime("load-test")
+    return runtime, runtime.parse_xml_string(SCENARIO)
+
+
+def run_load(launch, requests, concurrency):
+    """
+    Call `launch` with the numbers 0 to `requests` - 1 from `concurrency` workers.
+
+    `launch` returns the status code and the body of the response. Return a list of LoadResults and the elapsed time.
+    """
+    def timed_launch(index):
+        """
+        Launch and time launch number `index`.
+        """
+        started = time.time()
+        try:
+            status, _ = launch(index)
+        except Exception:  # pylint: disable=broad-except
+            status = "exception"
+        return LoadResult(status, time.time() - started)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_launch, range(requests)))
+    return results, time.time() - started
+
+
+def summarize(results, elapsed):
+    """
+    Return a human-readable report of the load test `results`.
+    """
+    histogram = LatencyHistogram()
+    statuses = {}
+    for result in results:
+        histogram.record(result.latency)
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    summary = histogram.summary()
+    lines = [
+        "Launches: {count}".format(count=len(results)),
+        "Elapsed: {elapsed:.1f}s".format(elapsed=elapsed),
+        "Throughput: {throughput:.2f} launches/s".format(throughput=len(results) / elapsed if elapsed else 0),
+        "Latency: p50 {p50:.3f}s, p95 {p95:.3f}s, p99 {p99:.3f}s, max {max:.3f}s".format(**summary),
+        "Responses: {statuses}".format(statuses=", ".join(
+            "{status}: {count}".format(status=status, count=count)
+            for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))
+        )),
+    ]
+    return "\n".join(lines)
+
+
+def summarize_phases(xblock_settings):
+    """
+    Return a human-readable report of the per-phase latencies recorded by the XBlock.
+    """
+    report = get_metrics(xblock_settings).memory.report(course_run="{}/{}".format(COURSE_NAME, COURSE_RUN))
+    lines = ["Phases:"]
+    for name, summary in sorted(report["timings"].items()):
+        lines.append("  {name}: p50 {p50:.3f}s, p95 {p95:.3f}s, p99 {p99:.3f}s ({count})".format(name=name, **summary))
+    lines.append("Outcomes:")
+    for name, count in sorted(report["counters"].items()):
+        lines.append("  {name}: {count}".format(name=name, count=count))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Run a load test and print its report.
+    """
+    parser = argparse.ArgumentParser(description="Load test the launch handler of the Skytap XBlock.")
+    parser.add_argument("--requests", type=int, default=100, help="number of launches")
+    parser.add_argument("--concurrency", type=int, default=10, help="number of concurrent launches")
+    parser.add_argument("--learners", type=int, help="number of distinct learners (default: one per launch)")
+    parser.add_argument("--settings", help="JSON file with additional Skytap XBlock settings")
+    parser.add_argument("--boomi-url", default="http://localhost:8090", help="base URL of the Boomi endpoint")
+    parser.add_argument("--simulate", action="store_true", help="start a Boomi simulator for the test")
+    parser.add_argument("--latency", default="constant:0.5", type=parse_latency,
+                        help="latency distribution of the simulator (see tests.load.simulator)")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of simulated HTTP errors")
+    parser.add_argument("--malformed-rate", type=float, default=0, help="share of simulated malformed responses")
+    parser.add_argument("--drip-interval", type=float, help="seconds between chunks of simulated slow bodies")
+    args = parser.parse_args(argv)
+
+    simulator = None
+    if args.simulate:
+        simulator = BoomiSimulator(SimulatorProfile(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            malformed_rate=args.malformed_rate,
+            drip_interval=args.drip_interval,
+        )).start()
+
+    xblock_settings = {}
+    if args.settings:
+        with open(args.settings) as settings_file:
+            xblock_settings = json.load(settings_file)
+    xblock_settings["boomi_configuration"] = dict({
+        "base_url": simulator.url if simulator else args.boomi_url,
+        "endpoint": "/ws/simple/createVm",
+        "username": "load-test",
+        "token": "load-test",
+    }, **xblock_settings.get("boomi_configuration", {}))
+
+    try:
+        with WorkbenchLauncher(xblock_settings, args.learners) as launch:
+            results, elapsed = run_load(launch, args.requests, args.concurrency)
+    finally:
+        if simulator:
+            simulator.stop()
+
+    print(summarize(results, elapsed))
+    print(summarize_phases(xblock_settings))
+    if simulator:
+        print("Simulator: {stats}".format(stats=json.dumps(simulator.stats.as_dict())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Local simulator of the Boomi createVm endpoint.
+
+Unlike the httpretty mocks used by the unit tests, the simulator is a real HTTP server,
+so it can model latency, concurrency and misbehaving responses the way the XBlock sees them in production.
+Every request is answered after a latency drawn from a configurable distribution, and fails with a configurable
+probability (HTTP errors, Boomi errors, malformed bodies). Bodies can also be "slow-dripped" in small chunks,
+which keeps connections busy without ever tripping the read timeout of the client.
+
+Example::
+
+    python -m tests.load.simulator --port 8090 --latency lognormal:1.5,0.6 --error-rate 0.02 --drip-interval 0.5
+
+Point the "boomi_configuration" of the XBlock to it with a "base_url" of "http://localhost:8090"
+and any "endpoint", "username" and "token". Counts of the responses sent so far can be fetched from /stats.
+"""
+
+# Imports ###########################################################
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Globals ###########################################################
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_HTTP_ERROR = "http_error"
+OUTCOME_BOOMI_ERROR = "boomi_error"
+OUTCOME_MALFORMED = "malformed"
+
+MALFORMED_BODY = "Certainly this response is not valid. It's not even valid JSON."
+
+
+# Classes ###########################################################
+
+class SimulatorProfile(object):
+    """
+    Behavior of the simulated Boomi endpoint.
+
+    `latency` is a callable returning a latency in seconds for a random.Random instance (see `parse_latency`).
+    `error_rate`, `boomi_error_rate` and `malformed_rate` are the probabilities of answering
+    with HTTP `error_status`, with a Boomi error, and with a body that isn't JSON.
+    If `drip_interval` is set, bodies are sent `drip_chunk_size` bytes at a time, `drip_interval` seconds apart.
+    """
+
+    def __init__(
+            self,
+            latency=None,
+            error_rate=0,
+            error_status=503,
+            boomi_error_rate=0,
+            malformed_rate=0,
+            drip_interval=None,
+            drip_chunk_size=16,
+            seed=None,
+    ):  # pylint: disable=too-many-arguments
+        self.latency = latency or parse_latency("constant:0")
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.boomi_error_rate = boomi_error_rate
+        self.malformed_rate = malformed_rate
+        self.drip_interval = drip_interval
+        self.drip_chunk_size = drip_chunk_size
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """
+        Return the outcome and the latency of the next response.
+        """
+        with self._lock:
+            latency = max(0.0, self.latency(self.random))
+            roll = self.random.random()
+        for outcome, rate in (
+                (OUTCOME_HTTP_ERROR, self.error_rate),
+                (OUTCOME_BOOMI_ERROR, self.boomi_error_rate),
+                (OUTCOME_MALFORMED, self.malformed_rate),
+        ):
+            if roll < rate:
+                return outcome, latency
+            roll -= rate
+        return OUTCOME_SUCCESS, latency
+
+
+class SimulatorStats(object):
+    """
+    Thread-safe counts of the requests handled by the simulator.
+    """
+
+    def __init__(self):
+        self.outcomes = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def started(self):
+        """
+        Record the start of a request.
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finished(self, outcome):
+        """
+        Record the end of a request with `outcome`.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def as_dict(self):
+        """
+        Return the counts as a dict.
+        """
+        with self._lock:
+            return {
+                "requests": sum(self.outcomes.values()),
+                "outcomes": dict(self.outcomes),
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+class BoomiRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answer createVm requests according to the profile of the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Report the stats of the simulator.
+        """
+        if self.path.rstrip("/") != "/stats":
+            self.send_body(404, "Not Found", "text/plain")
+            return
+        self.send_body(200, json.dumps(self.server.stats.as_dict()), "application/json")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Answer a createVm request.
+        """
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.stats.started()
+        outcome, latency = self.server.profile.draw()
+        try:
+            time.sleep(latency)
+            if outcome == OUTCOME_HTTP_ERROR:
+                self.send_body(self.server.profile.error_status, "Service Unavailable", "text/plain")
+            elif outcome == OUTCOME_MALFORMED:
+                self.send_body(200, MALFORMED_BODY, "application/json")
+            else:
+                self.send_body(200, json.dumps(self.boomi_response(body, outcome)), "application/json")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. because it timed out.
+            self.close_connection = True
+        finally:
+            self.server.stats.finished(outcome)
+
+    @staticmethod
+    def boomi_response(body, outcome):
+        """
+        Return the Boomi response to the request `body`.
+        """
+        if outcome == OUTCOME_BOOMI_ERROR:
+            return {
+                "ErrorExists": "true",  # Boomi does not support Boolean values in JSON responses.
+                "ErrorMessage": "Simulated Boomi error.",
+                "SkytapURL": None,
+            }
+        environment = hashlib.sha1(body).hexdigest()[:16]
+        return {
+            "ErrorExists": "false",
+            "ErrorMessage": None,
+            "SkytapURL": "https://skytap.example.com/vms/{environment}".format(environment=environment),
+        }
+
+    def send_body(self, status, body, content_type):
+        """
+        Send a response with `status` and `body`, slow-dripping the body if the profile asks for it.
+        """
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        profile = self.server.profile
+        if not profile.drip_interval or self.command != "POST":
+            self.wfile.write(payload)
+            return
+        for offset in range(0, len(payload), profile.drip_chunk_size):
+            if offset:
+                time.sleep(profile.drip_interval)
+            self.wfile.write(payload[offset:offset + profile.drip_chunk_size])
+            self.wfile.flush()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Keep quiet; use /stats to see what happened.
+        """
+
+
+class BoomiSimulator(ThreadingHTTPServer):
+    """
+    HTTP server simulating the Boomi createVm endpoint with `profile`.
+
+    The server listens on `port` (a free port if 0); use `url` to build the Boomi configuration.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, profile=None, host="localhost", port=0):
+        super().__init__((host, port), BoomiRequestHandler)
+        self.profile = profile or SimulatorProfile()
+        self.stats = SimulatorStats()
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        Return the base URL of the simulator.
+        """
+        return "http://{host}:{port}".format(host=self.server_address[0], port=self.server_address[1])
+
+    def start(self):
+        """
+        Serve requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and close the socket.
+        """
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# Functions #########################################################
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution given as "<name>:<parameters>", and return it as a function of a random.Random.
+
+    Supported distributions (all in seconds):
+
+    * constant:<latency>
+    * uniform:<low>,<high>
+    * exponential:<mean>
+    * lognormal:<median>,<sigma>, a long-tailed distribution; sigma is that of the underlying normal distribution
+    """
+    name, _, parameters = spec.partition(":")
+    try:
+        values = [float(value) for value in parameters.split(",")] if parameters else []
+    except ValueError:
+        raise ValueError("Invalid latency distribution parameters: {spec}".format(spec=spec))
+
+    distributions = {
+        "constant": (1, lambda rng, latency: latency),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1.0 / mean) if mean else 0.0),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+    }
+    if name not in distributions:
+        raise ValueError("Unknown latency distribution: {name}".format(name=name))
+    arity, draw = distributions[name]
+    if len(values) != arity or any(value < 0 for value in values) or (name == "lognormal" and not values[0]):
+        raise ValueError("Invalid latency distribution parameters: {spec}".format(spec=spec))
+    return lambda rng: draw(rng, *values)
+
+
+def main(argv=None):
+    """
+    Run the simulator until interrupted.
+    """
+    parser = argparse.ArgumentParser(description="Simulate the Boomi createVm endpoint.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="constant:0", type=parse_latency,
+                        help="latency distribution, e.g. constant:0.5, uniform:0.2,2, exponential:1, lognormal:1.5,0.6")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests failing with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--boomi-error-rate", type=float, default=0, help="share of requests with ErrorExists")
+    parser.add_argument("--malformed-rate", type=float, default=0, help="share of requests with a non-JSON body")
+    parser.add_argument("--drip-interval", type=float, help="seconds between the chunks of slow-dripped bodies")
+    parser.add_argument("--drip-chunk-size", type=int, default=16, help="bytes per chunk of slow-dripped bodies")
+    parser.add_argument("--seed", type=int, help="seed for reproducible runs")
+    args = parser.parse_args(argv)
+
+    profile = SimulatorProfile(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        boomi_error_rate=args.boomi_error_rate,
+        malformed_rate=args.malformed_rate,
+        drip_interval=args.drip_interval,
+        drip_chunk_size=args.drip_chunk_size,
+        seed=args.seed,
+    )
+    simulator = BoomiSimulator(profile, args.host, args.port)
+    print("Simulating Boomi at {url}".format(url=simulator.url))
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.server_close()
+        print(json.dumps(simulator.stats.as_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Unit test mock mixins for interactions with Boomi endpoints.
 # Imports ###########################################################
 
 import json
+import time
 import unittest
 
 import httpretty
@@ -44,6 +45,23 @@ class CreateVmMockMixin(unittest.TestCase):
             content_type="application/json",
         )
 
+    @staticmethod
+    def mock_createvm_accepted(mock_url):
+        """
+        Mock a response from the createVm endpoint acknowledging a launch whose result will be reported via callback.
+        """
+        response = {
+            "ErrorExists": 'false',  # Boomi does not support Boolean values in JSON responses.
+            "ErrorMessage": None,
+            "SkytapURL": None,
+        }
+        httpretty.register_uri(
+            method=httpretty.POST,
+            uri=mock_url,
+            body=json.dumps(response),
+            content_type="application/json",
+        )
+
     @staticmethod
     def mock_createvm_error(mock_url, error="This is an error message returned from Boomi."):
         """
@@ -72,3 +90,54 @@ class CreateVmMockMixin(unittest.TestCase):
             body='Certainly this response is not valid. It\'s not even valid JSON.',
             content_type="application/json",
         )
+
+    @staticmethod
+    def mock_createvm_slow(mock_url, delay, sharing_portal_url="https://skytap.example.com/sharing/portal/url"):
+        """
+        Mock a successful response from the createVm endpoint that takes `delay` seconds to arrive.
+        """
+        response = {
+            "ErrorExists": 'false',  # Boomi does not support Boolean values in JSON responses.
+            "ErrorMessage": None,
+            "SkytapURL": sharing_portal_url,
+        }
+
+        def slow_response(request, uri, response_headers):  # pylint: disable=unused-argument
+            """
+            Wait for `delay` seconds before returning the response.
+            """
+            time.sleep(delay)
+            return 200, response_headers, json.dumps(response)
+
+        httpretty.register_uri(
+            method=httpretty.POST,
+            uri=mock_url,
+            body=slow_response,
+            content_type="application/json",
+        )
+
+    @staticmethod
+    def mock_createvm_unavailable(mock_url, status=503, failures=None,
+                                  sharing_portal_url="https://skytap.example.com/sharing/portal/url"):
+        """
+        Mock a createVm endpoint that fails with HTTP `status`.
+
+        If `failures` is given, only the first `failures` requests fail and subsequent ones succeed.
+        """
+        failing_response = httpretty.Response(body='Service Unavailable', status=status)
+        if failures is None:
+            responses = [failing_response]
+        else:
+            response = {
+                "ErrorExists": 'false',  # Boomi does not support Boolean values in JSON responses.
+                "ErrorMessage": None,
+                "SkytapURL": sharing_portal_url,
+            }
+            responses = [failing_response] * failures + [
+                httpretty.Response(body=json.dumps(response), status=200, content_type="application/json")
+            ]
+        httpretty.register_uri(
+            method=httpretty.POST,
+            uri=mock_url,
+            responses=responses,
+        )
@@ -0,0 +1,141 @@
+"""
+Local stand-in for the Boomi endpoints, for tests that need real HTTP connections.
+"""
+
+# Imports ###########################################################
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from .boomi import BOOMI_CONFIGURATION
+
+
+# Globals ###########################################################
+
+CREATEVM_PATH = "/ws/simple/createVm"
+SUSPENDVM_PATH = "/ws/simple/suspendVm"
+
+
+# Classes ###########################################################
+
+class StandInBoomiServer(ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP server answering like the createVm and suspendVm Boomi endpoints.
+
+    Learners whose email starts with "slow" take `delay` seconds, "error" get a Boomi error, and "down" get HTTP 503;
+    batches of environments get the response of the first such learner in the batch. Launches of environment
+    templates go by the name of the template instead of the email.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.2):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StandInBoomiHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.idempotency_keys = []
+        self.batches = []
+
+    @property
+    def base_url(self):
+        """
+        Return the base URL of the server.
+        """
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+
+class StandInBoomiHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of StandInBoomiServer.
+    """
+
+    def send_json(self, status, response):
+        """
+        Send `response` as JSON, or an empty body if it is None.
+        """
+        body = json.dumps(response).encode("utf-8") if response is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Answer a createVm or suspendVm request.
+        """
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.idempotency_keys.append(self.headers["Idempotency-Key"])
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+            if self.path == CREATEVM_PATH:
+                emails = [payload.get("template", payload["email"])]
+            elif self.path == SUSPENDVM_PATH:
+                emails = [environment["email"] for environment in payload["environments"]]
+            else:
+                self.send_json(404, None)
+                return
+            time.sleep(server.delay if any(email.startswith("slow") for email in emails) else 0.01)
+            for email in emails:
+                if email.startswith("down"):
+                    self.send_json(503, None)
+                    return
+                if email.startswith("error"):
+                    self.send_json(200, {"ErrorExists": "true", "ErrorMessage": "No capacity left.", "SkytapURL": None})
+                    return
+            if self.path == SUSPENDVM_PATH:
+                with server.lock:
+                    server.batches.append(payload)
+            self.send_json(200, {
+                "ErrorExists": "false",
+                "ErrorMessage": None,
+                "SkytapURL": "https://skytap.example.com/{}".format(emails[0]),
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class StandInBoomiMixin(unittest.TestCase):
+    """
+    Start a StandInBoomiServer for every test.
+    """
+
+    def setUp(self):
+        super(StandInBoomiMixin, self).setUp()
+        self.server = start_stand_in_server(self)
+        self.boomi_configuration = stand_in_boomi_configuration(self.server)
+
+
+# Functions #########################################################
+
+def start_stand_in_server(test_case, delay=0.2):
+    """
+    Start a StandInBoomiServer that stops when `test_case` is cleaned up, and return it.
+    """
+    server = StandInBoomiServer(delay)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    test_case.addCleanup(server.server_close)
+    test_case.addCleanup(server.shutdown)
+    return server
+
+
+def stand_in_boomi_configuration(server):
+    """
+    Return a Boomi configuration for the createVm endpoint of the StandInBoomiServer `server`.
+    """
+    return dict(BOOMI_CONFIGURATION, base_url=server.base_url, endpoint=CREATEVM_PATH, max_retries=1, retry_backoff=0)
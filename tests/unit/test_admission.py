@@ -0,0 +1,142 @@
+"""
+Unit tests for admission control of launches.
+"""
+
+# Imports ###########################################################
+
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from xblock_skytap.admission import AdmissionController, get_admission_controller
+from xblock_skytap.exceptions import LaunchQueueFullError
+
+
+# Classes ###########################################################
+
+class TestAdmissionController(unittest.TestCase):
+    """
+    Unit tests for AdmissionController.
+    """
+
+    def wait_for(self, condition):
+        """
+        Helper method for waiting until `condition()` is true.
+        """
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail('Condition was not met in time.')
+
+    def test_concurrency_limits(self):
+        """
+        Test that launches are only admitted within the global and per-course concurrency limits.
+        """
+        controller = AdmissionController(global_concurrency=3, course_concurrency=2)
+        self.assertTrue(controller.admit('A/1'))
+        self.assertTrue(controller.admit('A/1'))
+        self.assertFalse(controller.admit('A/1'))
+        self.assertTrue(controller.admit('B/1'))
+        self.assertFalse(controller.admit('C/1'))
+
+        controller.release('A/1', duration=1)
+        self.assertTrue(controller.admit('C/1'))
+        self.assertFalse(controller.admit('A/1'))
+
+    def test_fair_queue(self):
+        """
+        Test that queued launches start in turns across course runs, and report their positions.
+        """
+        controller = AdmissionController(global_concurrency=1)
+        self.assertTrue(controller.admit('X/1'))
+
+        started = []
+        for ticket_id, course_run in (('a1', 'A/1'), ('a2', 'A/1'), ('a3', 'A/1'), ('b1', 'B/1')):
+            controller.enqueue(ticket_id, course_run, lambda ticket_id=ticket_id: started.append(ticket_id))
+        self.assertEqual(
+            [controller.position(ticket_id)[0] for ticket_id in ('a1', 'b1', 'a2', 'a3')],
+            [1, 2, 3, 4],
+        )
+        self.assertFalse(controller.admit('C/1'))
+
+        controller.release('X/1')
+        self.wait_for(lambda: len(started) == 4)
+        self.assertEqual(started, ['a1', 'b1', 'a2', 'a3'])
+        self.assertIsNone(controller.position('a1'))
+        self.wait_for(lambda: controller.admit('C/1'))
+
+    def test_estimated_wait(self):
+        """
+        Test that the estimated wait grows with the position in the queue and the duration of launches.
+        """
+        controller = AdmissionController(global_concurrency=2)
+        controller.admit('X/1')
+        controller.admit('X/1')
+        controller.release('X/1', duration=10)
+        controller.admit('X/1')
+        for ticket_id in ('a1', 'a2', 'a3'):
+            controller.enqueue(ticket_id, 'A/1', Mock())
+        self.assertEqual(controller.position('a1'), (1, 5))
+        self.assertEqual(controller.position('a3'), (3, 15))
+
+    def test_rate_limit(self):
+        """
+        Test that queued launches start once the rate limit allows it.
+        """
+        controller = AdmissionController(course_rate=10)
+        self.assertTrue(controller.admit('A/1'))
+        controller.release('A/1')
+        self.assertFalse(controller.admit('A/1'))
+        self.assertTrue(controller.admit('B/1'))
+
+        done = threading.Event()
+        controller.enqueue('a1', 'A/1', done.set)
+        self.assertTrue(done.wait(1))
+
+    def test_queue_limits(self):
+        """
+        Test that the queue rejects launches when it is full, and drops launches that waited for too long.
+        """
+        controller = AdmissionController(global_concurrency=1, max_queue=1, queue_timeout=0.05)
+        controller.admit('X/1')
+        on_timeout = Mock()
+        controller.enqueue('a1', 'A/1', Mock(), on_timeout=on_timeout)
+        with self.assertRaises(LaunchQueueFullError):
+            controller.enqueue('a2', 'A/1', Mock())
+
+        time.sleep(0.1)
+        controller.release('X/1')
+        on_timeout.assert_called_once_with()
+        self.assertEqual(controller.queue_length(), 0)
+
+    def test_expired_without_dispatch(self):
+        """
+        Test that launches that waited for too long are dropped when the queue is checked,
+        even if no launch finishes meanwhile.
+        """
+        controller = AdmissionController(global_concurrency=1, max_queue=1, queue_timeout=0.05)
+        controller.admit('X/1')
+        on_timeout = Mock()
+        controller.enqueue('a1', 'A/1', Mock(), on_timeout=on_timeout)
+        time.sleep(0.1)
+        self.assertIsNone(controller.position('a1'))
+        on_timeout.assert_called_once_with()
+
+        # Expired launches don't take up room in the queue.
+        controller.enqueue('a2', 'A/1', Mock(), on_timeout=on_timeout)
+        time.sleep(0.1)
+        controller.enqueue('a3', 'A/1', Mock())
+        self.assertEqual(on_timeout.call_count, 2)
+        self.assertEqual(controller.position('a3'), (1, 10))
+
+    def test_get_admission_controller(self):
+        """
+        Test that admission control is disabled by default, and that controllers are shared.
+        """
+        self.assertIsNone(get_admission_controller({}))
+        xblock_settings = {'admission_control': {'enabled': True, 'course_concurrency': 5}}
+        controller = get_admission_controller(xblock_settings)
+        self.assertEqual(controller.course_concurrency, 5)
+        self.assertIs(get_admission_controller(xblock_settings), controller)
@@ -0,0 +1,128 @@
+"""
+Unit tests for the asyncio Boomi client, against a local stand-in for the Boomi createVm endpoint.
+"""
+
+# Imports ###########################################################
+
+import asyncio
+import unittest
+
+from xblock_skytap import aioboomi
+from xblock_skytap.aioboomi import AsyncBoomiClient
+from xblock_skytap.config import compile_boomi_configuration
+from xblock_skytap.exceptions import BoomiLaunchError, BoomiUnavailableError
+
+from .mixins.server import StandInBoomiMixin
+
+
+# Classes ###########################################################
+
+class TestAsyncBoomiClient(StandInBoomiMixin):
+    """
+    Unit tests for AsyncBoomiClient, sending requests from a pool of threads.
+    """
+
+    transport = aioboomi.TRANSPORT_THREADS
+
+    def setUp(self):
+        super(TestAsyncBoomiClient, self).setUp()
+        configuration = compile_boomi_configuration(self.boomi_configuration)
+        self.endpoint = configuration.endpoints[0]
+        self.client = AsyncBoomiClient.from_configuration(configuration, transport=self.transport)
+
+    def run_with_client(self, coroutine_function):
+        """
+        Helper method for running `coroutine_function(client)` in a new event loop, closing the client afterwards.
+        """
+        async def run():
+            async with self.client as client:
+                return await coroutine_function(client)
+        # asyncio.run only exists from Python 3.7.
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+    def test_launch(self):
+        """
+        Test launching a single environment.
+        """
+        async def launch(client):
+            return await client.launch(self.endpoint, "learner@example.com", "Course", "Run")
+
+        self.assertEqual(self.run_with_client(launch), "https://skytap.example.com/learner@example.com")
+
+    def test_launch_error(self):
+        """
+        Test that Boomi errors are raised.
+        """
+        async def launch(client):
+            return await client.launch(self.endpoint, "error@example.com", "Course", "Run")
+
+        with self.assertRaises(BoomiLaunchError):
+            self.run_with_client(launch)
+
+    def test_retries(self):
+        """
+        Test that unavailable endpoints are retried with the same idempotency key.
+        """
+        async def launch(client):
+            return await client.launch(self.endpoint, "down@example.com", "Course", "Run")
+
+        with self.assertRaises(BoomiUnavailableError):
+            self.run_with_client(launch)
+        self.assertEqual(len(self.server.idempotency_keys), 2)
+        self.assertEqual(len(set(self.server.idempotency_keys)), 1)
+
+    def test_launch_many(self):
+        """
+        Test that launches run concurrently up to the limit, and that results are yielded as they complete.
+        """
+        emails = ["slow@example.com", "error@example.com", "down@example.com"] + [
+            "learner{}@example.com".format(index) for index in range(5)
+        ]
+
+        async def launch_many(client):
+            launches = ((email, "Course", "Run") for email in emails)
+            results = []
+            async for result in client.launch_many(self.endpoint, launches, concurrency=3):
+                results.append(result)
+            return results
+
+        results = self.run_with_client(launch_many)
+        self.assertEqual(sorted(result["email"] for result in results), sorted(emails))
+        # The slow launch completes last, even though it started first.
+        self.assertEqual(results[-1]["email"], "slow@example.com")
+        self.assertLessEqual(self.server.max_in_flight, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+        statuses = {result["email"]: result["status"] for result in results}
+        self.assertEqual(statuses.pop("error@example.com"), "error")
+        self.assertEqual(statuses.pop("down@example.com"), "error")
+        self.assertEqual(set(statuses.values()), {"ok"})
+        self.assertEqual(results[-1]["sharing_portal_url"], "https://skytap.example.com/slow@example.com")
+
+    def test_launch_many_stopped_early(self):
+        """
+        Test that launches in flight are cancelled when the caller stops iterating.
+        """
+        async def first_result(client):
+            launches = [("learner{}@example.com".format(index), "Course", "Run") for index in range(50)]
+            results = client.launch_many(self.endpoint, launches, concurrency=2)
+            async for result in results:
+                await results.aclose()
+                return result
+            return None
+
+        self.assertEqual(self.run_with_client(first_result)["status"], "ok")
+        self.assertLess(len(self.server.idempotency_keys), 50)
+
+
+@unittest.skipIf(aioboomi.httpx is None, "httpx is not installed")
+class TestAsyncBoomiClientHttpx(TestAsyncBoomiClient):
+    """
+    Unit tests for AsyncBoomiClient, sending requests through httpx.
+    """
+
+    transport = aioboomi.TRANSPORT_HTTPX
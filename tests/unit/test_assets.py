@@ -0,0 +1,86 @@
+"""
+Unit tests for the bundled, fingerprinted assets.
+"""
+
+# Imports ###########################################################
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from xblock_skytap import assets
+
+
+# Classes ###########################################################
+
+class TestAssets(unittest.TestCase):
+    """
+    Unit tests for building and loading the asset bundles.
+    """
+
+    def test_up_to_date(self):
+        """
+        Test that the bundles shipped with the package were built from the current sources.
+        """
+        self.assertTrue(assets.check(), "The bundles are outdated; run `python -m xblock_skytap.assets`.")
+        manifest = assets.get_manifest()
+        self.assertEqual(sorted(manifest), ["css", "js"])
+        self.assertIn("function SkytapXBlock(", assets.get_content(manifest["js"]))
+
+    def test_build(self):
+        """
+        Test that bundles are named after their content, and that outdated bundles are removed.
+        """
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        shutil.copytree(os.path.join(assets.PACKAGE_DIR, "public", "css"), os.path.join(root, "public", "css"))
+        shutil.copytree(os.path.join(assets.PACKAGE_DIR, "public", "js"), os.path.join(root, "public", "js"))
+
+        manifest = assets.build(root)
+        self.assertEqual(manifest, assets.get_manifest())
+        self.assertTrue(assets.check(root))
+
+        with open(os.path.join(root, assets.CSS_SOURCES[0]), "a") as css_file:
+            css_file.write("\n.skytap-block { color: red; }\n")
+        self.assertFalse(assets.check(root))
+        new_manifest = assets.build(root)
+        self.assertEqual(new_manifest["js"], manifest["js"])
+        self.assertNotEqual(new_manifest["css"], manifest["css"])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(root, assets.DIST_DIR))),
+            sorted(["manifest.json"] + [os.path.basename(path) for path in new_manifest.values()]),
+        )
+        with open(os.path.join(root, assets.MANIFEST_PATH)) as manifest_file:
+            self.assertEqual(json.load(manifest_file), new_manifest)
+
+    def test_minify_css(self):
+        """
+        Test that comments and whitespace are removed from CSS, but not the spaces that matter.
+        """
+        self.assertEqual(
+            assets.minify_css("/* Comment */\n.a  .b :focus,\n.c > .d {\n    margin: 0 1em;\n    color: red;\n}\n"),
+            ".a .b :focus,.c > .d{margin:0 1em;color:red}",
+        )
+
+    def test_minify_js(self):
+        """
+        Test that comment lines, indentation and blank lines are removed from JavaScript, but not line breaks.
+        """
+        source = (
+            "/* Header. */\n"
+            "function f() {\n"
+            "    // Comment.\n"
+            "    /*\n"
+            "     Block comment.\n"
+            "     */\n"
+            "\n"
+            "    var url = 'https://example.com'; // Trailing comment.\n"
+            "    return url\n"
+            "}\n"
+        )
+        self.assertEqual(
+            assets.minify_js(source),
+            "function f() {\nvar url = 'https://example.com'; // Trailing comment.\nreturn url\n}\n",
+        )
@@ -0,0 +1,147 @@
+"""
+Unit tests for the launch audit log.
+"""
+
+# Imports ###########################################################
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from xblock_skytap.audit import AuditLog, JsonLinesSink, get_audit_log, truncate
+
+
+# Classes ###########################################################
+
+class RecordingSink(object):
+    """
+    Sink that keeps the batches it is given, optionally waiting for `gate` to be set before each write.
+    """
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def write(self, events):
+        """
+        Record `events`.
+        """
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append(events)
+
+
+class FailingSink(object):
+    """
+    Sink that fails to write anything.
+    """
+
+    def write(self, events):
+        """
+        Fail.
+        """
+        raise IOError("Disk full")
+
+
+class TestAuditLog(unittest.TestCase):
+    """
+    Unit tests for AuditLog and its sinks.
+    """
+
+    def test_batches(self):
+        """
+        Test that events are written in batches of at most `batch_size` events.
+        """
+        gate = threading.Event()
+        sink = RecordingSink(gate)
+        audit_log = AuditLog(sink, batch_size=3, flush_interval=0.1)
+        # The first event is being written while the others are queued.
+        for index in range(7):
+            self.assertTrue(audit_log.emit({"index": index}))
+        gate.set()
+        audit_log.flush()
+
+        self.assertTrue(all(len(batch) <= 3 for batch in sink.batches))
+        self.assertEqual([event["index"] for batch in sink.batches for event in batch], list(range(7)))
+        self.assertEqual(audit_log.stats(), {"emitted": 7, "dropped": 0, "written": 7, "failed": 0, "queued": 0})
+
+    def test_drops_when_full(self):
+        """
+        Test that events are dropped, rather than waited for, when the queue is full.
+        """
+        gate = threading.Event()
+        audit_log = AuditLog(RecordingSink(gate), max_queue=2, batch_size=1, flush_interval=0)
+        results = [audit_log.emit({"index": index}) for index in range(10)]
+        # At most one event has been taken off the queue, and is waiting to be written.
+        self.assertIn(results.count(True), (2, 3))
+        stats = audit_log.stats()
+        self.assertEqual(stats["dropped"], results.count(False))
+
+        gate.set()
+        audit_log.flush()
+        self.assertEqual(audit_log.stats()["written"], results.count(True))
+        self.assertIn('skytap_audit_events_total{state="dropped"} ', audit_log.render_prometheus())
+
+    def test_flush_timeout(self):
+        """
+        Test that flushing gives up after the timeout if the sink hangs.
+        """
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        audit_log = AuditLog(RecordingSink(gate), flush_interval=0)
+        audit_log.emit({})
+        started = time.time()
+        self.assertFalse(audit_log.flush(timeout=0.1))
+        self.assertLess(time.time() - started, 1)
+
+        gate.set()
+        self.assertTrue(audit_log.flush(timeout=5))
+        self.assertEqual(audit_log.stats()["written"], 1)
+
+    def test_failing_sink(self):
+        """
+        Test that events that can't be written are counted, and don't stop the background thread.
+        """
+        audit_log = AuditLog(FailingSink(), flush_interval=0)
+        audit_log.emit({})
+        audit_log.flush()
+        audit_log.emit({})
+        audit_log.flush()
+        self.assertEqual(audit_log.stats()["failed"], 2)
+
+    def test_json_lines_sink(self):
+        """
+        Test that the JSON lines sink appends one line per event.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "audit.jsonl")
+        sink = JsonLinesSink(path)
+        sink.write([{"outcome": "success"}, {"outcome": "timeout"}])
+        sink.write([{"outcome": "cache_hit"}])
+        with open(path) as audit_file:
+            self.assertEqual(
+                [json.loads(line)["outcome"] for line in audit_file], ["success", "timeout", "cache_hit"]
+            )
+
+    def test_get_audit_log(self):
+        """
+        Test that the audit log is disabled by default, and shared by blocks with the same configuration.
+        """
+        self.assertIsNone(get_audit_log({}))
+        xblock_settings = {"audit_log": {"enabled": True, "sink": "tests.unit.test_audit.RecordingSink"}}
+        audit_log = get_audit_log(xblock_settings)
+        self.assertIsInstance(audit_log.sink, RecordingSink)
+        self.assertIs(get_audit_log(xblock_settings), audit_log)
+
+    def test_truncate(self):
+        """
+        Test that long error messages and response bodies are truncated.
+        """
+        self.assertIsNone(truncate(None))
+        self.assertEqual(truncate("short"), "short")
+        self.assertEqual(truncate(b"x" * 20, 10), "x" * 10 + "... (10 characters truncated)")
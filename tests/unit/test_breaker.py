@@ -0,0 +1,112 @@
+"""
+Unit tests for the circuit breaker guarding the Boomi endpoint.
+"""
+
+# Imports ###########################################################
+
+import unittest
+from unittest.mock import patch
+
+from xblock_skytap.breaker import CircuitBreaker, get_circuit_breaker
+from xblock_skytap.cache import InProcessCache
+
+
+# Classes ###########################################################
+
+@patch('xblock_skytap.breaker.time.time')
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Unit tests for CircuitBreaker.
+    """
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(
+            InProcessCache(), min_requests=4, error_rate_threshold=0.5, window=60, open_duration=30,
+            latency_threshold=10,
+        )
+
+    def test_opens_on_error_rate(self, patched_time):
+        """
+        Test that the circuit opens once enough calls failed, and rejects calls while open.
+        """
+        patched_time.return_value = 1000
+        self.breaker.record_success(1)
+        self.breaker.record_failure()
+        self.breaker.record_success(1)
+        self.assertIsNone(self.breaker.retry_after())
+        self.breaker.record_failure()
+
+        self.assertTrue(self.breaker.is_open())
+        patched_time.return_value = 1010
+        self.assertEqual(self.breaker.retry_after(), 21)
+
+    def test_slow_calls_count_as_failures(self, patched_time):
+        """
+        Test that calls slower than the latency threshold count as failures.
+        """
+        patched_time.return_value = 1000
+        for _ in range(4):
+            self.breaker.record_success(11)
+        self.assertTrue(self.breaker.is_open())
+
+    def test_window(self, patched_time):
+        """
+        Test that failures are only counted within the current window.
+        """
+        patched_time.return_value = 1000
+        for _ in range(3):
+            self.breaker.record_failure()
+        patched_time.return_value = 1061
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open())
+
+    def test_half_open(self, patched_time):
+        """
+        Test that a single probe is let through after the open period, and closes the circuit if it succeeds.
+        """
+        patched_time.return_value = 1000
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        patched_time.return_value = 1031
+        self.assertIsNone(self.breaker.retry_after())
+        self.assertEqual(self.breaker.retry_after(), 1)
+
+        self.breaker.record_success(1)
+        self.assertFalse(self.breaker.is_open())
+        self.assertIsNone(self.breaker.retry_after())
+
+    def test_failed_probe(self, patched_time):
+        """
+        Test that the circuit stays open for another period if the probe fails.
+        """
+        patched_time.return_value = 1000
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        patched_time.return_value = 1031
+        self.assertIsNone(self.breaker.retry_after())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.retry_after(), 31)
+
+    def test_released_probe(self, patched_time):
+        """
+        Test that another caller may probe once a probe that neither succeeded nor failed is released.
+        """
+        patched_time.return_value = 1000
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        patched_time.return_value = 1031
+        self.assertIsNone(self.breaker.retry_after())
+        self.breaker.release_probe()
+        self.assertTrue(self.breaker.is_open())
+        self.assertIsNone(self.breaker.retry_after())
+        self.assertEqual(self.breaker.retry_after(), 1)
+
+    def test_disabled(self, patched_time):  # pylint: disable=unused-argument
+        """
+        Test that the circuit breaker can be disabled.
+        """
+        self.assertIsNone(get_circuit_breaker({'circuit_breaker': {'enabled': False}}))
+        self.assertIsInstance(get_circuit_breaker({}), CircuitBreaker)
@@ -0,0 +1,83 @@
+"""
+Unit tests for the cache backends of the Skytap XBlock.
+"""
+
+# Imports ###########################################################
+
+import unittest
+from unittest.mock import patch
+
+from xblock_skytap.cache import NULL_CACHE, InProcessCache, NullCache, get_launch_cache, launch_cache_key
+
+
+# Classes ###########################################################
+
+class TestInProcessCache(unittest.TestCase):
+    """
+    Unit tests for the in-process LRU cache.
+    """
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used entry is evicted when the cache is full.
+        """
+        cache = InProcessCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    @patch('xblock_skytap.cache.time.time')
+    def test_ttl(self, patched_time):
+        """
+        Test that entries expire after their time to live.
+        """
+        patched_time.return_value = 1000
+        cache = InProcessCache(ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2, timeout=120)
+
+        patched_time.return_value = 1061
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_delete(self):
+        """
+        Test explicit invalidation of an entry.
+        """
+        cache = InProcessCache()
+        cache.set('a', 1)
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertIsNone(cache.get('a'))
+
+
+class TestLaunchCache(unittest.TestCase):
+    """
+    Unit tests for the launch cache helpers.
+    """
+
+    def test_get_launch_cache(self):
+        """
+        Test that the launch cache is shared per configuration, and can be disabled.
+        """
+        self.assertIs(get_launch_cache({}), get_launch_cache({'launch_cache': {'backend': 'auto'}}))
+        self.assertIsInstance(get_launch_cache({'launch_cache': {'backend': 'memory', 'ttl': 10}}), InProcessCache)
+        self.assertIsInstance(get_launch_cache({'launch_cache': {'enabled': False}}), NullCache)
+        self.assertIs(get_launch_cache({'launch_cache': {'enabled': False}}), NULL_CACHE)
+        with self.assertRaises(ValueError):
+            get_launch_cache({'launch_cache': {'backend': 'redis'}})
+
+    def test_launch_cache_key(self):
+        """
+        Test that launch cache keys are distinct per learner and course run.
+        """
+        key = launch_cache_key('testuser@example.com', 'TestCourse', '201704')
+        self.assertNotIn('@', key)
+        self.assertNotEqual(key, launch_cache_key('testuser@example.com', 'TestCourse', '201705'))
+        self.assertEqual(key, launch_cache_key('testuser@example.com', 'TestCourse', '201704'))
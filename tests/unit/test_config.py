@@ -0,0 +1,82 @@
+"""
+Unit tests for the compiled Boomi configuration of the Skytap XBlock.
+"""
+
+# Imports ###########################################################
+
+import unittest
+
+from xblock_skytap.config import compile_boomi_configuration
+from xblock_skytap.exceptions import BoomiConfigurationInvalidError
+
+from .mixins.boomi import BOOMI_CONFIGURATION
+
+
+# Classes ###########################################################
+
+class TestBoomiConfiguration(unittest.TestCase):
+    """
+    Unit tests for compiling the "boomi_configuration" setting.
+    """
+
+    def test_compile(self):
+        """
+        Test that the compiled configuration carries the endpoint URL, auth header and client options.
+        """
+        configuration = compile_boomi_configuration(dict(BOOMI_CONFIGURATION, read_timeout=5))
+        self.assertEqual(configuration.url, "https://connect.boomi.example.com/ws/simple/createVm")
+        self.assertEqual(
+            configuration.headers["Authorization"],
+            "Basic Zm9vOmI4ZWFhZGQ3OC00ZWJkLTQ0MDQtYTI2MS02OTBjODE1MWU1NTY=",
+        )
+        self.assertEqual(dict(configuration.client_options)["read_timeout"], 5)
+        self.assertNotIn(BOOMI_CONFIGURATION["token"], repr(configuration))
+
+    def test_memoized(self):
+        """
+        Test that configurations are compiled once, and recompiled when the settings change.
+        """
+        settings = dict(BOOMI_CONFIGURATION)
+        configuration = compile_boomi_configuration(settings)
+        self.assertIs(compile_boomi_configuration(dict(BOOMI_CONFIGURATION)), configuration)
+
+        settings["endpoint"] = "/ws/simple/createVm2"
+        recompiled = compile_boomi_configuration(settings)
+        self.assertIsNot(recompiled, configuration)
+        self.assertTrue(recompiled.url.endswith("/createVm2"))
+
+        # Changes to nested settings are picked up as well.
+        settings = dict(BOOMI_CONFIGURATION, endpoints=[{"name": "us"}, {"name": "eu"}], routes={"Org": ["us"]})
+        self.assertEqual(compile_boomi_configuration(settings).routes, {"Org": ("us",)})
+        settings["routes"]["Org"].append("eu")
+        self.assertEqual(compile_boomi_configuration(settings).routes, {"Org": ("us", "eu")})
+
+    def test_immutable(self):
+        """
+        Test that compiled configurations can't be modified.
+        """
+        configuration = compile_boomi_configuration(BOOMI_CONFIGURATION)
+        with self.assertRaises(AttributeError):
+            configuration.url = "https://evil.example.com"
+        with self.assertRaises(AttributeError):
+            configuration.extra = True  # pylint: disable=assigning-non-slot
+        with self.assertRaises(TypeError):
+            configuration.headers["Authorization"] = "Basic ZXZpbA=="
+        with self.assertRaises(TypeError):
+            configuration.routes["Org"] = ("evil",)
+
+    def test_all_errors_reported(self):
+        """
+        Test that all problems with the configuration are reported at once.
+        """
+        with self.assertRaises(BoomiConfigurationInvalidError) as context:
+            compile_boomi_configuration({
+                "base_url": "",
+                "endpoint": "/ws/simple/createVm",
+                "read_timeout": -1,
+                "max_retries": "3",
+                "auth_method": "cookie",
+            })
+        message = str(context.exception)
+        for expected in ("username, token", "base_url", "read_timeout", "max_retries", "auth_method"):
+            self.assertIn(expected, message)
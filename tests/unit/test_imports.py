@@ -0,0 +1,31 @@
+"""
+Unit tests for the modules imported along with the Skytap XBlock.
+"""
+
+# Imports ###########################################################
+
+import subprocess
+import sys
+import unittest
+
+
+# Classes ###########################################################
+
+class TestImports(unittest.TestCase):
+    """
+    Unit tests for the modules imported along with the Skytap XBlock.
+    """
+
+    def test_launch_dependencies_deferred(self):
+        """
+        Test that importing the XBlock class does not import the modules that only launches need.
+        """
+        deferred_modules = ("requests", "urllib3", "sqlite3", "xblock_skytap.boomi", "xblock_skytap.routing")
+        output = subprocess.check_output([
+            sys.executable,
+            "-c",
+            "import sys; from xblock_skytap import SkytapXBlock; print(' '.join(sorted(sys.modules)))",
+        ], universal_newlines=True)
+        imported = set(output.split())
+        self.assertIn("xblock_skytap.skytap", imported)
+        self.assertEqual([module for module in deferred_modules if module in imported], [])
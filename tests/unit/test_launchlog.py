@@ -0,0 +1,104 @@
+"""
+Unit tests for the launch log.
+"""
+
+# Imports ###########################################################
+
+import unittest
+
+from xblock_skytap.launchlog import LaunchLog, SQLiteLaunchLog, get_launch_log, get_launch_log_writer
+
+
+# Classes ###########################################################
+
+class TestSQLiteLaunchLog(unittest.TestCase):
+    """
+    Unit tests for SQLiteLaunchLog.
+    """
+
+    def setUp(self):
+        self.launch_log = SQLiteLaunchLog(":memory:")
+        for user, launched_at, outcome, latency in (
+                ("alice@example.com", 100, "error", 30),
+                ("alice@example.com", 200, "ready", 2),
+                ("bob@example.com", 150, "ready", 5),
+                ("carol_1@example.com", 300, "queued", 0.1),
+        ):
+            self.launch_log.append("course-v1:Org+Course+Run", user, outcome, latency=latency, url_issued_at=90,
+                                   launched_at=launched_at)
+        self.launch_log.append("course-v1:OtherOrg+Course+Run", "dave@example.com", "ready", launched_at=400)
+
+    def test_latest_launches(self):
+        """
+        Test that the latest launch of every learner of the course run is returned, most recent first.
+        """
+        launches, total = self.launch_log.latest_launches("course-v1:Org+Course+Run")
+        self.assertEqual(total, 3)
+        self.assertEqual(
+            [(launch["user"], launch["launched_at"], launch["outcome"], launch["latency"], launch["launches"])
+             for launch in launches],
+            [
+                ("carol_1@example.com", 300, "queued", 0.1, 1),
+                ("alice@example.com", 200, "ready", 2, 2),
+                ("bob@example.com", 150, "ready", 5, 1),
+            ],
+        )
+        self.assertEqual(launches[0]["url_issued_at"], 90)
+
+    def test_filters(self):
+        """
+        Test filtering by learner and by the outcome of their latest launch, and paginating.
+        """
+        launches, total = self.launch_log.latest_launches(
+            "course-v1:Org+Course+Run", outcome="ready", offset=1, limit=1
+        )
+        self.assertEqual(total, 2)
+        self.assertEqual([launch["user"] for launch in launches], ["bob@example.com"])
+
+        launches, total = self.launch_log.latest_launches("course-v1:Org+Course+Run", outcome="error")
+        self.assertEqual((launches, total), ([], 0))
+
+        launches, _ = self.launch_log.latest_launches("course-v1:Org+Course+Run", user="ALICE")
+        self.assertEqual([launch["user"] for launch in launches], ["alice@example.com"])
+        # Wildcards in the filter match literally.
+        launches, _ = self.launch_log.latest_launches("course-v1:Org+Course+Run", user="_1")
+        self.assertEqual([launch["user"] for launch in launches], ["carol_1@example.com"])
+
+    def test_get_launch_log(self):
+        """
+        Test that launch logs are shared per configuration.
+        """
+        xblock_settings = {"launch_log": {"enabled": True, "backend_options": {"path": ":memory:"}}}
+        launch_log = get_launch_log(xblock_settings)
+        self.assertIsInstance(launch_log, SQLiteLaunchLog)
+        self.assertIs(get_launch_log(xblock_settings), launch_log)
+
+    def test_launch_log_writer(self):
+        """
+        Test that launches emitted to the writer are appended to the launch log in the background.
+        """
+        xblock_settings = {"launch_log": {"enabled": True, "backend_options": {"path": ":memory:"}, "batch_size": 2}}
+        writer = get_launch_log_writer(xblock_settings)
+        self.assertIs(get_launch_log_writer(xblock_settings), writer)
+        for index in range(3):
+            writer.emit({"course_run": "course-v1:Org+Writer+Run", "user": "user{}@example.com".format(index),
+                         "outcome": "ready", "launched_at": 100 + index})
+        self.assertTrue(writer.flush(timeout=5))
+        launches, total = get_launch_log(xblock_settings).latest_launches("course-v1:Org+Writer+Run")
+        self.assertEqual(total, 3)
+        self.assertEqual([launch["launched_at"] for launch in launches], [102, 101, 100])
+
+    def test_interface(self):
+        """
+        Test that backends must implement the whole interface.
+        """
+        class PartialLaunchLog(LaunchLog):  # pylint: disable=abstract-method
+            """
+            Backend that can only append launches.
+            """
+
+            def append(self, course_run, user, outcome, latency=None, url_issued_at=None, launched_at=None):
+                pass
+
+        with self.assertRaises(TypeError):
+            PartialLaunchLog()  # pylint: disable=abstract-class-instantiated
@@ -0,0 +1,89 @@
+"""
+Unit tests for the latency and outcome metrics of the Skytap XBlock.
+"""
+
+# Imports ###########################################################
+
+import random
+import unittest
+from unittest.mock import patch
+
+from xblock_skytap.metrics import InMemoryMetrics, LatencyHistogram, Metrics, StatsdMetrics
+
+
+# Classes ###########################################################
+
+class TestLatencyHistogram(unittest.TestCase):
+    """
+    Unit tests for LatencyHistogram.
+    """
+
+    def test_percentiles(self):
+        """
+        Test that percentiles are accurate to a few percent.
+        """
+        rng = random.Random(42)
+        latencies = sorted(rng.expovariate(2) for _ in range(10000))
+        histogram = LatencyHistogram()
+        for latency in latencies:
+            histogram.record(latency)
+
+        for percent in (50, 95, 99):
+            expected = latencies[int(len(latencies) * percent / 100.0) - 1]
+            self.assertAlmostEqual(histogram.percentile(percent), expected, delta=expected * 0.05)
+        self.assertEqual(histogram.percentile(100), latencies[-1])
+        self.assertEqual(histogram.count, 10000)
+
+    def test_empty(self):
+        """
+        Test the summary of an empty histogram.
+        """
+        self.assertEqual(LatencyHistogram().summary()['p99'], 0.0)
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Unit tests for the metrics sinks.
+    """
+
+    def test_report(self):
+        """
+        Test that the in-memory sink reports metrics per course run.
+        """
+        metrics = InMemoryMetrics()
+        metrics.timing('launch.boomi', 0.5, {'course_run': 'A/1'})
+        metrics.timing('launch.boomi', 1.5, {'course_run': 'B/1'})
+        metrics.increment('launch.outcome', {'course_run': 'A/1', 'outcome': 'success'})
+        metrics.increment('launch.outcome', {'course_run': 'A/1', 'outcome': 'success'})
+
+        report = metrics.report(course_run='A/1')
+        self.assertEqual(report['timings']['launch.boomi']['count'], 1)
+        self.assertAlmostEqual(report['timings']['launch.boomi']['p50'], 0.5, delta=0.02)
+        self.assertEqual(report['counters'], {'launch.outcome[outcome=success]': 2})
+
+    def test_render_prometheus(self):
+        """
+        Test rendering metrics in the Prometheus text format.
+        """
+        metrics = InMemoryMetrics()
+        metrics.timing('launch.boomi', 0.5, {'course_run': 'A/1'})
+        metrics.increment('launch.outcome', {'course_run': 'A/1', 'outcome': 'timeout'})
+
+        text = metrics.render_prometheus(course_run='A/1')
+        self.assertIn('skytap_launch_boomi_seconds_count{course_run="A/1"} 1', text)
+        self.assertIn('skytap_launch_boomi_seconds{course_run="A/1",quantile="0.99"}', text)
+        self.assertIn('skytap_launch_outcome_total{course_run="A/1",outcome="timeout"} 1', text)
+
+    def test_statsd(self):
+        """
+        Test that measurements are sent to statsd, and to the in-memory sink.
+        """
+        statsd = StatsdMetrics(prefix='lms.skytap', tags=True)
+        metrics = Metrics([statsd])
+        with patch.object(statsd, '_socket') as patched_socket:
+            metrics.increment('launch.outcome', {'outcome': 'success'})
+            metrics.timing('launch.boomi', 0.25)
+
+        sent = [call[0][0] for call in patched_socket.sendto.call_args_list]
+        self.assertEqual(sent, [b'lms.skytap.launch.outcome:1|c|#outcome:success', b'lms.skytap.launch.boomi:250|ms'])
+        self.assertEqual(metrics.memory.report()['counters'], {'launch.outcome[outcome=success]': 1})
@@ -0,0 +1,90 @@
+"""
+Unit tests for launching several environments per block.
+"""
+
+# Imports ###########################################################
+
+import threading
+import time
+import unittest
+
+from xblock.exceptions import JsonHandlerError
+
+from xblock_skytap.multilaunch import MultiLauncher, get_multi_launcher, parse_environments
+
+
+# Classes ###########################################################
+
+class TestMultiLauncher(unittest.TestCase):
+    """
+    Unit tests for MultiLauncher.
+    """
+
+    def setUp(self):
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def test_run(self):
+        """
+        Test that launches run concurrently, and that results and errors are returned in order.
+        """
+        def launch(url):
+            time.sleep(0.2)
+            return url
+
+        def fail():
+            raise JsonHandlerError(500, "No capacity left.")
+
+        started = time.time()
+        results = MultiLauncher(max_workers=3, deadline=5).run([
+            ("a", lambda: launch("https://a.example.com")),
+            ("b", fail),
+            ("c", lambda: launch("https://c.example.com")),
+        ])
+        self.assertLess(time.time() - started, 0.35)
+        self.assertEqual(results, [
+            {"name": "a", "sharing_portal_url": "https://a.example.com"},
+            {"name": "b", "error": "No capacity left."},
+            {"name": "c", "sharing_portal_url": "https://c.example.com"},
+        ])
+
+    def test_deadline(self):
+        """
+        Test that launches still running or waiting for a worker at the deadline are reported as timed out.
+        """
+        def stuck():
+            self.gate.wait(5)
+            return "https://stuck.example.com"
+
+        results = MultiLauncher(max_workers=1, deadline=0.1).run(
+            [("a", stuck), ("b", lambda: "https://b.example.com")], "Too slow."
+        )
+        self.assertEqual(results, [{"name": "a", "error": "Too slow."}, {"name": "b", "error": "Too slow."}])
+
+        # The deadline of the request wins if it is earlier.
+        started = time.time()
+        results = MultiLauncher(deadline=5).run([("a", stuck)], "Too slow.", deadline=time.time() + 0.1)
+        self.assertEqual(results, [{"name": "a", "error": "Too slow."}])
+        self.assertLess(time.time() - started, 1)
+
+    def test_parse_environments(self):
+        """
+        Test that environments are either template names, or dicts with a template and an optional name.
+        """
+        self.assertEqual(
+            parse_environments(["cluster", {"template": "client"}, {"name": "Edge", "template": "edge-vm"}]),
+            [("cluster", "cluster"), ("client", "client"), ("Edge", "edge-vm")],
+        )
+        self.assertEqual(parse_environments([]), [])
+        for environments in ("cluster", [{"name": "Client"}], [""], [None], ["a", {"template": "a"}]):
+            with self.assertRaises(ValueError):
+                parse_environments(environments)
+
+    def test_get_multi_launcher(self):
+        """
+        Test that blocks with the same configuration share a launcher.
+        """
+        xblock_settings = {"multi_launch": {"max_workers": 3, "deadline": 10}}
+        launcher = get_multi_launcher(xblock_settings)
+        self.assertEqual((launcher.max_workers, launcher.deadline), (3, 10))
+        self.assertIs(get_multi_launcher(xblock_settings), launcher)
@@ -0,0 +1,102 @@
+"""
+Unit tests for prewarming environments.
+"""
+
+# Imports ###########################################################
+
+import threading
+import unittest
+
+from xblock_skytap.prewarm import Prewarmer, get_prewarmer
+
+
+# Classes ###########################################################
+
+class TestPrewarmer(unittest.TestCase):
+    """
+    Unit tests for Prewarmer.
+    """
+
+    def setUp(self):
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+        self.calls = []
+
+    def prewarm(self):
+        """
+        Helper function standing for a prewarm that waits for `gate`.
+        """
+        self.calls.append(threading.current_thread())
+        self.gate.wait(5)
+
+    def wait_for_prewarms(self, prewarmer):
+        """
+        Helper method for letting the prewarms in flight finish, and waiting for them.
+        """
+        self.gate.set()
+        prewarmer._executor.shutdown(wait=True)  # pylint: disable=protected-access
+        self.assertEqual(prewarmer.in_flight(), 0)
+
+    def test_deduplicated(self):
+        """
+        Test that a prewarm is skipped while a prewarm for the same key is in flight.
+        """
+        prewarmer = Prewarmer(max_concurrent=2, rate=0)
+        self.assertEqual(prewarmer.schedule("a", self.prewarm), "scheduled")
+        self.assertEqual(prewarmer.schedule("a", self.prewarm), "duplicate")
+        self.assertEqual(prewarmer.schedule("b", self.prewarm), "scheduled")
+        self.assertEqual(prewarmer.in_flight(), 2)
+        self.wait_for_prewarms(prewarmer)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_max_concurrent(self):
+        """
+        Test that prewarms beyond the concurrency cap are skipped, not queued.
+        """
+        prewarmer = Prewarmer(max_concurrent=2, rate=0)
+        outcomes = [prewarmer.schedule(key, self.prewarm) for key in "abcd"]
+        self.assertEqual(outcomes, ["scheduled", "scheduled", "busy", "busy"])
+        self.wait_for_prewarms(prewarmer)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_rate_limited(self):
+        """
+        Test that at most `rate` prewarms start per second.
+        """
+        prewarmer = Prewarmer(max_concurrent=10, rate=2)
+        outcomes = [prewarmer.schedule(key, self.prewarm) for key in "abcd"]
+        self.assertEqual(outcomes, ["scheduled", "scheduled", "rate_limited", "rate_limited"])
+        self.wait_for_prewarms(prewarmer)
+
+    def test_failures(self):
+        """
+        Test that failed prewarms are done, so the environment can be prewarmed again.
+        """
+        def fail():
+            raise RuntimeError("Boomi is down")
+
+        prewarmer = Prewarmer(rate=0)
+        self.assertEqual(prewarmer.schedule("a", fail), "scheduled")
+        self.wait_for_prewarms(prewarmer)
+
+    def test_courses(self):
+        """
+        Test that prewarming can be enabled for some orgs, courses and course runs only.
+        """
+        prewarmer = Prewarmer(courses=["Org", "Other/Course", "Third/Course/Run"])
+        self.assertTrue(prewarmer.enabled_for(("Org", "Any", "Run")))
+        self.assertTrue(prewarmer.enabled_for(("Other", "Course", "Run")))
+        self.assertFalse(prewarmer.enabled_for(("Other", "Other", "Run")))
+        self.assertTrue(prewarmer.enabled_for(("Third", "Course", "Run")))
+        self.assertFalse(prewarmer.enabled_for(("Third", "Course", "Other")))
+        self.assertTrue(Prewarmer().enabled_for(("Any", "Course", "Run")))
+
+    def test_get_prewarmer(self):
+        """
+        Test that prewarming is disabled by default, and that blocks with the same configuration share a prewarmer.
+        """
+        self.assertIsNone(get_prewarmer({}))
+        xblock_settings = {"prewarm": {"enabled": True, "courses": ["Org"], "max_concurrent": 3}}
+        prewarmer = get_prewarmer(xblock_settings)
+        self.assertEqual(prewarmer.max_concurrent, 3)
+        self.assertIs(get_prewarmer(xblock_settings), prewarmer)
@@ -0,0 +1,124 @@
+"""
+Unit tests for bulk pre-provisioning of Skytap environments.
+"""
+
+# Imports ###########################################################
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import httpretty
+
+from xblock_skytap.cache import get_launch_cache, launch_cache_key
+from xblock_skytap.config import compile_boomi_configuration
+from xblock_skytap.provision import ProvisionState, Provisioner, main, read_roster, summarize
+
+from .mixins.boomi import BOOMI_CONFIGURATION, CreateVmMockMixin
+
+
+# Globals ###########################################################
+
+XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+}
+
+ROSTER = """email,course_name
+learner1@example.com,TestCourse
+learner2@example.com,TestCourse
+learner1@example.com,TestCourse
+learner3@example.com,OtherCourse
+"""
+
+
+# Classes ###########################################################
+
+class TestProvision(CreateVmMockMixin):
+    """
+    Unit tests for the skytap-provision command.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.boomi_url = compile_boomi_configuration(BOOMI_CONFIGURATION).url
+        get_launch_cache({}).clear()
+        self.addCleanup(get_launch_cache({}).clear)
+
+    def test_read_roster(self):
+        """
+        Test reading a roster, falling back to defaults and dropping duplicates.
+        """
+        roster = read_roster(io.StringIO(ROSTER), course_run="201704")
+        self.assertEqual(roster, [
+            ("learner1@example.com", "TestCourse", "201704"),
+            ("learner2@example.com", "TestCourse", "201704"),
+            ("learner3@example.com", "OtherCourse", "201704"),
+        ])
+        with self.assertRaises(ValueError):
+            read_roster(io.StringIO(ROSTER))
+
+    @httpretty.activate
+    def test_provision(self):
+        """
+        Test that environments are provisioned for every roster entry, and their URLs are cached.
+        """
+        sharing_portal_url = "https://skytap.example.com/sharing/portal/url"
+        self.mock_createvm(self.boomi_url, sharing_portal_url)
+        roster = read_roster(io.StringIO(ROSTER), course_run="201704")
+
+        results, skipped = Provisioner(XBLOCK_SETTINGS, concurrency=2, rate=0).run(roster)
+
+        self.assertEqual(skipped, 0)
+        self.assertEqual(sorted(result["status"] for result in results), ["ok"] * 3)
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+        self.assertEqual(
+            get_launch_cache({}).get(launch_cache_key("learner3@example.com", "OtherCourse", "201704")),
+            sharing_portal_url,
+        )
+        self.assertIn("Provisioned: 3", summarize(results, skipped, 1.0))
+
+    @httpretty.activate
+    def test_resume(self):
+        """
+        Test that an interrupted run can be resumed, retrying only entries that failed.
+        """
+        roster = read_roster(io.StringIO(ROSTER), course_run="201704")
+        state = ProvisionState(os.path.join(self.directory, "state.jsonl"))
+        with open(state.path, "w") as state_file:
+            state_file.write(json.dumps({
+                "email": "learner1@example.com", "course_name": "TestCourse", "course_run": "201704", "status": "ok",
+            }) + "\n")
+            state_file.write('{"email": "learner2@example.com", "cou')
+
+        self.mock_createvm_error(self.boomi_url, "No capacity left.")
+        results, skipped = Provisioner(XBLOCK_SETTINGS, rate=0).run(roster, state=state)
+        self.assertEqual(skipped, 1)
+        self.assertEqual([result["status"] for result in results], ["error"] * 2)
+        self.assertIn("No capacity left.", summarize(results, skipped, 1.0))
+
+        httpretty.reset()
+        self.mock_createvm(self.boomi_url)
+        results, skipped = Provisioner(XBLOCK_SETTINGS, rate=0).run(roster, state=state)
+        self.assertEqual(skipped, 1)
+        self.assertEqual([result["status"] for result in results], ["ok"] * 2)
+        self.assertEqual(len(state.completed()), 3)
+
+    def test_requires_shared_cache(self):
+        """
+        Test that the command refuses to provision into a launch cache that is not shared with the LMS.
+        """
+        roster_path = os.path.join(self.directory, "roster.csv")
+        with open(roster_path, "w") as roster_file:
+            roster_file.write(ROSTER)
+        for launch_cache in ({"backend": "memory"}, {"enabled": False}):
+            settings_path = os.path.join(self.directory, "skytap.json")
+            with open(settings_path, "w") as settings_file:
+                json.dump(dict(XBLOCK_SETTINGS, launch_cache=launch_cache), settings_file)
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit):
+                main([roster_path, "--settings", settings_path, "--course-run", "201704"])
+            self.assertIn("The launch cache is not shared with the LMS", stderr.getvalue())
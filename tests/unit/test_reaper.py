@@ -0,0 +1,162 @@
+"""
+Unit tests for the idle environment reaper, against a local stand-in for the Boomi endpoints.
+"""
+
+# Imports ###########################################################
+
+import os
+import shutil
+import tempfile
+import time
+
+from xblock_skytap.config import compile_boomi_configuration
+from xblock_skytap.launchlog import get_launch_log
+from xblock_skytap.reaper import Reaper, reaper_boomi_configuration, summarize
+
+from .mixins.server import SUSPENDVM_PATH, StandInBoomiMixin
+
+# Globals ###########################################################
+
+COURSE_KEY = "course-v1:Org+Course+Run"
+OTHER_COURSE_KEY = "course-v1:OtherOrg+Course+Run"
+
+
+# Classes ###########################################################
+
+class TestReaper(StandInBoomiMixin):
+    """
+    Unit tests for Reaper.
+    """
+
+    def setUp(self):
+        super(TestReaper, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.now = time.time()
+        self.xblock_settings = {
+            "boomi_configuration": self.boomi_configuration,
+            "launch_log": {"enabled": True, "backend_options": {"path": os.path.join(directory, "launches.sqlite3")}},
+            "reaper": {"idle_timeout": 3600, "batch_size": 2, "concurrency": 2, "rate": 0},
+        }
+        self.launch_log = get_launch_log(self.xblock_settings)
+
+    def launch(self, user, ago, outcome="ready", course_run=COURSE_KEY):
+        """
+        Helper method for recording a launch by `user` `ago` seconds ago.
+        """
+        self.launch_log.append(course_run, user, outcome, launched_at=self.now - ago)
+
+    def test_reclaim(self):
+        """
+        Test that environments idle for longer than the idle timeout are reclaimed in batches, once.
+        """
+        self.launch("alice@example.com", 7200)
+        self.launch("bob@example.com", 60)
+        self.launch("carol@example.com", 7200)
+        self.launch("carol@example.com", 100, "error")
+        self.launch("dave@example.com", 7200)
+        self.launch("dave@example.com", 3000, "reclaimed")
+        self.launch("erin@example.com", 10000)
+        self.launch("erin@example.com", 9000, "reclaimed")
+        self.launch("erin@example.com", 5000)
+        self.launch("frank@example.com", 4000, course_run=OTHER_COURSE_KEY)
+        reaper = Reaper(self.xblock_settings)
+
+        self.assertEqual(
+            [(environment["course_run"], environment["user"]) for environment in reaper.idle_environments(self.now)],
+            [(COURSE_KEY, "alice@example.com"), (COURSE_KEY, "carol@example.com"),
+             (COURSE_KEY, "erin@example.com"), (OTHER_COURSE_KEY, "frank@example.com")],
+        )
+        report = reaper.run(self.now)
+        self.assertEqual((report["idle"], report["reclaimed"], report["failed"]), (4, 4, 0))
+        self.assertEqual((report["batches"], report["failed_batches"]), (2, 0))
+        # Course runs with the same name in different organizations are reported separately.
+        self.assertEqual(report["course_runs"], {COURSE_KEY: 3, OTHER_COURSE_KEY: 1})
+        self.assertAlmostEqual(report["idle_hours"], (7200 + 7200 + 5000 + 4000) / 3600.0)
+        self.assertIn("Reclaimed (suspend): 4", summarize(report))
+
+        self.assertEqual({batch["action"] for batch in self.server.batches}, {"suspend"})
+        self.assertEqual(
+            sorted(
+                (environment["email"], environment["course_name"], environment["course_run"])
+                for batch in self.server.batches for environment in batch["environments"]
+            ),
+            [("alice@example.com", "Course", "Run"), ("carol@example.com", "Course", "Run"),
+             ("erin@example.com", "Course", "Run"), ("frank@example.com", "Course", "Run")],
+        )
+        self.assertEqual(reaper.idle_environments(self.now), [])
+        self.assertEqual(reaper.run(self.now)["reclaimed"], 0)
+
+        # Launching the environment again makes it eligible again.
+        self.launch("alice@example.com", -10)
+        self.assertEqual([environment["user"] for environment in reaper.idle_environments(self.now + 3700)],
+                         ["bob@example.com", "alice@example.com"])
+
+    def test_failed_batches(self):
+        """
+        Test that environments of failed batches are reported, and not recorded as reclaimed.
+        """
+        self.launch("alice@example.com", 9000)
+        self.launch("error@example.com", 8000)
+        self.launch("down@example.com", 7000)
+        reaper = Reaper(self.xblock_settings, batch_size=1, action="shutdown")
+
+        report = reaper.run(self.now)
+        self.assertEqual((report["reclaimed"], report["failed"], report["failed_batches"]), (1, 2, 2))
+        self.assertEqual(len(report["errors"]), 2)
+        self.assertIn("No capacity left.", report["errors"])
+        self.assertEqual(self.server.batches[0]["action"], "shutdown")
+        self.assertEqual(
+            sorted(environment["user"] for environment in reaper.idle_environments(self.now)),
+            ["down@example.com", "error@example.com"],
+        )
+
+        # Batches with environments whose course key can't be parsed are not sent.
+        self.launch("legacy@example.com", 6000, course_run="Course/Run")
+        report = Reaper(self.xblock_settings, batch_size=3).run(self.now)
+        self.assertEqual((report["reclaimed"], report["failed"]), (0, 3))
+        self.assertIn("invalid course key", report["errors"][0])
+
+    def test_concurrency(self):
+        """
+        Test that no more than `concurrency` batches are in flight at the same time.
+        """
+        for index in range(6):
+            self.launch("slow{}@example.com".format(index), 7200)
+        reaper = Reaper(self.xblock_settings, batch_size=1, concurrency=2)
+
+        self.assertEqual(reaper.run(self.now)["reclaimed"], 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_dry_run(self):
+        """
+        Test that a dry run only reports the idle environments.
+        """
+        self.launch("alice@example.com", 7200)
+        report = Reaper(self.xblock_settings).run(self.now, dry_run=True)
+        self.assertEqual((report["idle"], report["reclaimed"], report["batches"]), (1, 0, 0))
+        self.assertEqual(self.server.batches, [])
+
+    def test_configuration(self):
+        """
+        Test that the reaper posts to its endpoint with the credentials of the block's Boomi configuration,
+        and that it needs the launch log.
+        """
+        boomi_configuration = dict(
+            self.boomi_configuration, endpoints=[{"name": "us"}, {"name": "eu", "base_url": "https://eu.example.com"}]
+        )
+        launch_configuration = compile_boomi_configuration(boomi_configuration)
+        configuration = compile_boomi_configuration(reaper_boomi_configuration(boomi_configuration, SUSPENDVM_PATH))
+        self.assertEqual(
+            [endpoint.url for endpoint in configuration.endpoints],
+            [self.server.base_url + SUSPENDVM_PATH, "https://eu.example.com" + SUSPENDVM_PATH],
+        )
+        self.assertEqual(
+            [endpoint.headers for endpoint in configuration.endpoints],
+            [endpoint.headers for endpoint in launch_configuration.endpoints],
+        )
+
+        with self.assertRaises(ValueError):
+            Reaper({"boomi_configuration": self.boomi_configuration})
+        with self.assertRaises(ValueError):
+            Reaper(self.xblock_settings, action="delete")
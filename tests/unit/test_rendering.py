@@ -0,0 +1,130 @@
+"""
+Unit tests for the cached rendering of the student view.
+"""
+
+# Imports ###########################################################
+
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.template import Template
+from django.utils import translation
+
+from xblock.field_data import DictFieldData
+
+from xblock_skytap import rendering
+from xblock_skytap.assets import get_content, get_manifest
+from xblock_skytap.skytap import SkytapXBlock
+
+
+# Globals ###########################################################
+
+MODULE_NAME = "xblock_skytap.skytap"
+TEMPLATE_PATH = "templates/skytap.html"
+
+
+# Classes ###########################################################
+
+@unittest.skipUnless(settings.configured, "Rendering templates requires Django settings (see run_tests.py).")
+class TestRendering(unittest.TestCase):
+    """
+    Unit tests for the cached rendering of the student view.
+    """
+
+    def setUp(self):
+        rendering.clear_caches()
+        self.addCleanup(rendering.clear_caches)
+        patcher = patch.object(Template, "render", autospec=True, side_effect=Template.render)
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_render_template(self):
+        """
+        Test that rendered templates are cached per context and language.
+        """
+        first = rendering.render_template(MODULE_NAME, TEMPLATE_PATH, {"display_name": "Skytap"})
+        second = rendering.render_template(MODULE_NAME, TEMPLATE_PATH, {"display_name": "Skytap"})
+        self.assertIn("skytap-launch", first)
+        self.assertEqual(first, second)
+        self.assertEqual(self.render.call_count, 1)
+
+        rendering.render_template(MODULE_NAME, TEMPLATE_PATH, {"display_name": "Other"})
+        self.assertEqual(self.render.call_count, 2)
+
+        with translation.override("fr"):
+            rendering.render_template(MODULE_NAME, TEMPLATE_PATH, {"display_name": "Skytap"})
+        self.assertEqual(self.render.call_count, 3)
+
+    def test_template_changed(self):
+        """
+        Test that templates are compiled once, and compiled again when the template file changes.
+        """
+        compiled = rendering.get_template(MODULE_NAME, TEMPLATE_PATH)
+        self.assertIs(rendering.get_template(MODULE_NAME, TEMPLATE_PATH), compiled)
+
+        with patch("xblock_skytap.rendering._template_mtime", return_value=0):
+            self.assertIsNot(rendering.get_template(MODULE_NAME, TEMPLATE_PATH), compiled)
+
+    def test_student_view(self):
+        """
+        Test that the student view renders its template and resolves resource URLs only once.
+        """
+        runtime_mock = Mock()
+        runtime_mock.local_resource_url = Mock(side_effect=lambda block, uri: "/resource/skytap/" + uri)
+        runtime_mock.service = Mock(return_value=None)
+        block = SkytapXBlock(runtime_mock, DictFieldData({}), Mock())
+
+        manifest = get_manifest()
+        for _ in range(2):
+            fragment = block.student_view({})
+            self.assertIn("skytap-block", fragment.content)
+            self.assertEqual(
+                [resource.data for resource in fragment.resources],
+                ["/resource/skytap/" + manifest["css"], "/resource/skytap/" + manifest["js"]],
+            )
+        self.assertEqual(self.render.call_count, 1)
+        self.assertEqual(runtime_mock.local_resource_url.call_count, 2)
+        self.assertEqual(fragment.json_init_args, {"prefetch": False, "prefetch_ttl": None, "multi_launch": False})
+
+    def test_student_view_assets(self):
+        """
+        Test that the CSS can be inlined, and that the sources can be used instead of the bundles.
+        """
+        runtime_mock = Mock()
+        runtime_mock.local_resource_url = Mock(side_effect=lambda block, uri: "/resource/skytap/" + uri)
+        runtime_mock.service = Mock(return_value=None)
+        block = SkytapXBlock(runtime_mock, DictFieldData({}), Mock())
+
+        block.get_xblock_settings = Mock(return_value={"assets": {"inline_css": True}})
+        resources = block.student_view({}).resources
+        self.assertEqual([resource.kind for resource in resources], ["text", "url"])
+        self.assertEqual(resources[0].data, get_content(get_manifest()["css"]))
+        self.assertNotIn("\n", resources[0].data)
+
+        block.get_xblock_settings = Mock(return_value={"assets": {"bundled": False}})
+        self.assertEqual(
+            [resource.data for resource in block.student_view({}).resources],
+            ["/resource/skytap/public/css/skytap.css", "/resource/skytap/public/js/src/skytap.js"],
+        )
+
+    def test_student_view_resume_link(self):
+        """
+        Test that the student view links to the last sharing portal URL until it expires, without caching it.
+        """
+        runtime_mock = Mock()
+        runtime_mock.local_resource_url = Mock(side_effect=lambda block, uri: "/resource/skytap/" + uri)
+        runtime_mock.service = Mock(return_value=None)
+        block = SkytapXBlock(runtime_mock, DictFieldData({
+            "sharing_portal_url": "https://skytap.example.com/sharing/portal/url",
+            "launch_expires_at": time.time() + 60,
+        }), Mock())
+
+        fragment = block.student_view({})
+        self.assertIn('href="https://skytap.example.com/sharing/portal/url"', fragment.content)
+        self.assertIn("skytap-refresh", fragment.content)
+        self.assertEqual(len(rendering._fragments), 0)  # pylint: disable=protected-access
+
+        block.launch_expires_at = time.time() - 1
+        self.assertNotIn("skytap-resume-link", block.student_view({}).content)
@@ -0,0 +1,235 @@
+"""
+Unit tests for routing Boomi requests across several endpoints.
+"""
+
+# Imports ###########################################################
+
+import json
+import time
+
+import httpretty
+
+from xblock_skytap.boomi import get_boomi_client
+from xblock_skytap.config import compile_boomi_configuration
+from xblock_skytap.exceptions import (BoomiConfigurationInvalidError, BoomiTimeoutError, BoomiUnavailableError,
+                                      DeadlineExceededError)
+from xblock_skytap.routing import BoomiRouter
+
+from .mixins.boomi import BOOMI_CONFIGURATION, CreateVmMockMixin
+
+
+# Globals ###########################################################
+
+MULTI_ENDPOINT_CONFIGURATION = dict(
+    BOOMI_CONFIGURATION,
+    endpoints=[
+        {"name": "us", "base_url": "https://us.boomi.example.com"},
+        {"name": "eu", "base_url": "https://eu.boomi.example.com", "username": "bar"},
+    ],
+    routes={"EuOrg": ["eu"]},
+    max_retries=0,
+)
+
+US_URL = "https://us.boomi.example.com/ws/simple/createVm"
+EU_URL = "https://eu.boomi.example.com/ws/simple/createVm"
+
+PAYLOAD = {"email": "learner@example.com", "course_name": "Course", "course_run": "Run"}
+
+
+# Classes ###########################################################
+
+class TestRouting(CreateVmMockMixin):
+    """
+    Unit tests for BoomiRouter.
+    """
+
+    def make_router(self, **options):
+        """
+        Helper method for returning a new router for the multi-endpoint configuration with the given `options`.
+        """
+        configuration = compile_boomi_configuration(dict(MULTI_ENDPOINT_CONFIGURATION, **options))
+        return BoomiRouter(configuration, get_boomi_client(configuration))
+
+    @staticmethod
+    def sharing_portal_url(response):
+        """
+        Helper method for returning the sharing portal URL from a Boomi response.
+        """
+        return json.loads(response.text)["SkytapURL"]
+
+    def test_configuration(self):
+        """
+        Test compiling a configuration with several endpoints, which inherit settings from the top level.
+        """
+        configuration = compile_boomi_configuration(MULTI_ENDPOINT_CONFIGURATION)
+        self.assertEqual([endpoint.name for endpoint in configuration.endpoints], ["us", "eu"])
+        self.assertEqual([endpoint.url for endpoint in configuration.endpoints], [US_URL, EU_URL])
+        self.assertEqual(configuration.url, US_URL)
+        self.assertNotEqual(configuration.endpoints[0].headers, configuration.endpoints[1].headers)
+        self.assertEqual(configuration.routes, {"EuOrg": ("eu",)})
+
+        with self.assertRaises(BoomiConfigurationInvalidError) as context:
+            compile_boomi_configuration(dict(
+                MULTI_ENDPOINT_CONFIGURATION,
+                endpoints=[{"name": "us", "base_url": ""}, {"name": "us"}, "eu"],
+                routes={"EuOrg": ["eu"]},
+                hedge_percentile=10,
+            ))
+        message = str(context.exception)
+        for expected in ("us: base_url", "endpoint names must be unique", "endpoints[2] must be a dict",
+                         "routes[EuOrg]", "hedge_percentile"):
+            self.assertIn(expected, message)
+
+    @httpretty.activate
+    def test_latency_aware(self):
+        """
+        Test that requests go to the endpoint with the lowest average latency.
+        """
+        self.mock_createvm(US_URL, "https://skytap.example.com/us")
+        self.mock_createvm(EU_URL, "https://skytap.example.com/eu")
+        router = self.make_router()
+        router.health["us"].record_success(2)
+        router.health["eu"].record_success(1)
+
+        self.assertEqual(self.sharing_portal_url(router.post(PAYLOAD)), "https://skytap.example.com/eu")
+        router.health["eu"].record_success(10)
+        self.assertEqual(self.sharing_portal_url(router.post(PAYLOAD)), "https://skytap.example.com/us")
+
+    @httpretty.activate
+    def test_routes(self):
+        """
+        Test that routes restrict course runs to some endpoints.
+        """
+        self.mock_createvm(US_URL, "https://skytap.example.com/us")
+        self.mock_createvm(EU_URL, "https://skytap.example.com/eu")
+        router = self.make_router()
+        router.health["eu"].record_success(5)
+
+        response = router.post(PAYLOAD, course_key=("EuOrg", "Course", "Run"))
+        self.assertEqual(self.sharing_portal_url(response), "https://skytap.example.com/eu")
+        response = router.post(PAYLOAD, course_key=("OtherOrg", "Course", "Run"))
+        self.assertEqual(self.sharing_portal_url(response), "https://skytap.example.com/us")
+
+    @httpretty.activate
+    def test_failover(self):
+        """
+        Test that requests fail over to the next endpoint, and that failing endpoints are avoided for a while.
+        """
+        self.mock_createvm_unavailable(US_URL)
+        self.mock_createvm(EU_URL, "https://skytap.example.com/eu")
+        router = self.make_router(failure_threshold=1, routes={"UsOrg": ["us"]})
+        router.health["eu"].record_success(5)
+
+        response = router.post(PAYLOAD, idempotency_key="key")
+        self.assertEqual(self.sharing_portal_url(response), "https://skytap.example.com/eu")
+        self.assertEqual(
+            [request.headers["Idempotency-Key"] for request in httpretty.latest_requests()], ["key", "key"]
+        )
+        self.assertEqual([endpoint.name for endpoint in router.candidates()], ["eu", "us"])
+
+        # Unhealthy endpoints are still used as a last resort.
+        with self.assertRaises(BoomiUnavailableError):
+            router.post(PAYLOAD, course_key=("UsOrg", "Course", "Run"))
+
+    @httpretty.activate
+    def test_hedging(self):
+        """
+        Test that slow requests are hedged to the next endpoint once the latency percentile is exceeded.
+        """
+        self.mock_createvm_slow(US_URL, delay=1, sharing_portal_url="https://skytap.example.com/us")
+        self.mock_createvm(EU_URL, "https://skytap.example.com/eu")
+        router = self.make_router(hedge_percentile=95, hedge_min_delay=0.1)
+        for _ in range(20):
+            router.health["us"].record_success(0.05)
+        router.health["eu"].record_success(5)
+        self.assertEqual(router.hedge_delay(router.candidates()[0]), 0.1)
+
+        started = time.time()
+        response = router.post(PAYLOAD, idempotency_key="key")
+        self.assertLess(time.time() - started, 0.9)
+        self.assertEqual(self.sharing_portal_url(response), "https://skytap.example.com/eu")
+        self.assertEqual(
+            [request.headers["Idempotency-Key"] for request in httpretty.latest_requests()], ["key", "key"]
+        )
+
+    def test_no_hedging_without_samples(self):
+        """
+        Test that requests are not hedged until the latency percentiles are known.
+        """
+        router = self.make_router(hedge_percentile=95)
+        self.assertIsNone(router.hedge_delay(router.candidates()[0]))
+
+    def test_adaptive_read_timeout(self):
+        """
+        Test that the read timeout is a multiple of the latency percentile of the endpoint, within bounds.
+        """
+        router = self.make_router(timeout_multiplier=2, min_read_timeout=1, read_timeout=10)
+        us_endpoint, eu_endpoint = self.make_router().configuration.endpoints
+        self.assertIsNone(router.read_timeout(us_endpoint))
+        for _ in range(20):
+            router.health["us"].record_success(2)
+            router.health["eu"].record_success(0.01)
+        self.assertAlmostEqual(router.read_timeout(us_endpoint), 4, delta=0.01)
+        self.assertEqual(router.read_timeout(eu_endpoint), 1)
+        router.health["us"].record_success(60)
+        router.health["us"].record_success(60)
+        self.assertEqual(router.read_timeout(us_endpoint), 10)
+        self.assertIsNone(self.make_router(timeout_percentile=None).read_timeout(us_endpoint))
+
+        # Timed out requests count with their timeout, so the timeout grows again once Boomi gets slower.
+        for _ in range(20):
+            router.health["eu"].record_timeout(router.read_timeout(eu_endpoint))
+        self.assertGreater(router.read_timeout(eu_endpoint), 1)
+        self.assertEqual(router.health["eu"].consecutive_failures, 20)
+
+    @httpretty.activate
+    def test_adaptive_read_timeout_exceeded(self):
+        """
+        Test that requests much slower than usual time out before the configured read timeout.
+        """
+        self.mock_createvm_slow(US_URL, delay=0.5)
+        router = self.make_router(min_read_timeout=0.1, routes={"UsOrg": ["us"]})
+        for _ in range(20):
+            router.health["us"].record_success(0.01)
+        with self.assertRaises(BoomiTimeoutError):
+            router.post(PAYLOAD, course_key=("UsOrg", "Course", "Run"), deadline=time.time() + 5)
+
+    @httpretty.activate
+    def test_deadline(self):
+        """
+        Test that requests stop at the deadline without failing over, but count as a timeout of the endpoint.
+        """
+        self.mock_createvm_slow(US_URL, delay=1)
+        self.mock_createvm(EU_URL)
+        router = self.make_router(max_retries=2)
+
+        started = time.time()
+        with self.assertRaises(BoomiTimeoutError) as context:
+            router.post(PAYLOAD, deadline=time.time() + 0.2)
+        self.assertNotIsInstance(context.exception, DeadlineExceededError)
+        self.assertLess(time.time() - started, 0.6)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+        self.assertEqual(router.health["us"].consecutive_failures, 1)
+        self.assertEqual(router.health["eu"].consecutive_failures, 0)
+
+        with self.assertRaises(DeadlineExceededError):
+            router.post(PAYLOAD, deadline=time.time() - 1)
+
+    @httpretty.activate
+    def test_deadline_not_a_latency_sample(self):
+        """
+        Test that requests cut short by the deadline don't count as latency samples, so they don't shrink the timeout.
+        """
+        self.mock_createvm_slow(US_URL, delay=1)
+        router = self.make_router(routes={"UsOrg": ["us"]})
+        us_endpoint = router.configuration.endpoints[0]
+        for _ in range(19):
+            router.health["us"].record_success(0.5)
+
+        with self.assertRaises(BoomiTimeoutError):
+            router.post(PAYLOAD, course_key=("UsOrg", "Course", "Run"), deadline=time.time() + 0.1)
+        self.assertEqual(router.health["us"].consecutive_failures, 1)
+        self.assertIsNone(router.read_timeout(us_endpoint))
+
+        router.health["us"].record_timeout(router.max_read_timeout)
+        self.assertIsNotNone(router.read_timeout(us_endpoint))
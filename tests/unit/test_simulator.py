@@ -0,0 +1,107 @@
+"""
+Unit tests for the Boomi simulator and the load test harness.
+"""
+
+# Imports ###########################################################
+
+import json
+import time
+import unittest
+
+import requests
+
+from xblock_skytap.boomi import BoomiClient, decode_response, get_sharing_portal_url, launch_payload
+from xblock_skytap.exceptions import (BoomiLaunchError, BoomiMalformedResponseError,
+                                     BoomiTimeoutError, BoomiUnavailableError)
+
+from ..load.loadtest import run_load, summarize
+from ..load.simulator import BoomiSimulator, SimulatorProfile, parse_latency
+
+
+# Classes ###########################################################
+
+class TestSimulator(unittest.TestCase):
+    """
+    Unit tests for the Boomi simulator.
+    """
+
+    def post(self, simulator, client=None):
+        """
+        Helper method for sending a createVm request to `simulator` and returning the response.
+        """
+        client = client or BoomiClient(max_retries=0)
+        return client.post(simulator.url + "/ws/simple/createVm", launch_payload("learner@example.com", "A", "1"))
+
+    def test_success(self):
+        """
+        Test that the simulator answers with a sharing portal URL that is stable per learner.
+        """
+        with BoomiSimulator() as simulator:
+            first = get_sharing_portal_url(decode_response(self.post(simulator)))
+            second = get_sharing_portal_url(decode_response(self.post(simulator)))
+            stats = requests.get(simulator.url + "/stats").json()
+        self.assertTrue(first.startswith("https://skytap.example.com/vms/"))
+        self.assertEqual(first, second)
+        self.assertEqual(stats["outcomes"], {"success": 2})
+
+    def test_failures(self):
+        """
+        Test simulating HTTP errors, Boomi errors and malformed responses.
+        """
+        for profile, exception in (
+                (SimulatorProfile(error_rate=1), BoomiUnavailableError),
+                (SimulatorProfile(boomi_error_rate=1), BoomiLaunchError),
+                (SimulatorProfile(malformed_rate=1), BoomiMalformedResponseError),
+        ):
+            with BoomiSimulator(profile) as simulator:
+                with self.assertRaises(exception):
+                    get_sharing_portal_url(decode_response(self.post(simulator)))
+
+    def test_latency_and_drip(self):
+        """
+        Test that responses are delayed, and that slow-dripped bodies take longer than the read timeout to arrive.
+        """
+        with BoomiSimulator(SimulatorProfile(latency=parse_latency("constant:0.2"))) as simulator:
+            with self.assertRaises(BoomiTimeoutError):
+                self.post(simulator, BoomiClient(read_timeout=0.1, max_retries=0))
+
+        with BoomiSimulator(SimulatorProfile(drip_interval=0.05, drip_chunk_size=16)) as simulator:
+            started = time.time()
+            response = self.post(simulator, BoomiClient(read_timeout=0.1, max_retries=0))
+            self.assertIn("SkytapURL", json.loads(response.text))
+        self.assertGreater(time.time() - started, 0.1)
+
+    def test_parse_latency(self):
+        """
+        Test parsing latency distributions.
+        """
+        distribution = parse_latency("uniform:0.5,1")
+        rng = SimulatorProfile(seed=1).random
+        self.assertTrue(all(0.5 <= distribution(rng) <= 1 for _ in range(100)))
+        for spec in ("gaussian:1", "constant:", "uniform:1", "lognormal:0,1", "exponential:x"):
+            with self.assertRaises(ValueError):
+                parse_latency(spec)
+
+
+class TestLoadTest(unittest.TestCase):
+    """
+    Unit tests for the load test harness.
+    """
+
+    def test_run_load(self):
+        """
+        Test running launches concurrently and summarizing the results.
+        """
+        def launch(index):
+            """
+            Fail every fourth launch.
+            """
+            if index % 4 == 3:
+                raise RuntimeError("Boom")
+            return (500 if index % 4 == 2 else 200), b"{}"
+
+        results, elapsed = run_load(launch, 40, 8)
+        report = summarize(results, elapsed)
+        self.assertEqual(len(results), 40)
+        self.assertIn("Launches: 40", report)
+        self.assertIn("Responses: 200: 20, 500: 10, exception: 10", report)
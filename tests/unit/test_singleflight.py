@@ -0,0 +1,230 @@
+"""
+Unit tests for single-flight coalescing of concurrent launches.
+"""
+
+# Imports ###########################################################
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import ddt
+from xblock.exceptions import JsonHandlerError
+
+from xblock_skytap.cache import InProcessCache, get_launch_cache
+from xblock_skytap.exceptions import LaunchInProgressError
+from xblock_skytap.singleflight import CacheLockBackend, FileLockBackend, SingleFlight, get_single_flight
+
+
+# Functions #########################################################
+
+def run_concurrently(functions):
+    """
+    Call `functions` in parallel threads, and return their results (or raised exceptions) in order.
+    """
+    results = [None] * len(functions)
+
+    def run(index, function):
+        """
+        Store the outcome of `function` in `results`.
+        """
+        try:
+            results[index] = function()
+        except Exception as exc:  # pylint: disable=broad-except
+            results[index] = exc
+
+    threads = [threading.Thread(target=run, args=(index, function)) for index, function in enumerate(functions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# Classes ###########################################################
+
+@ddt.ddt
+class TestSingleFlight(unittest.TestCase):
+    """
+    Unit tests for SingleFlight.
+    """
+
+    def setUp(self):
+        self.calls = []
+
+    def slow_call(self, value='url', delay=0.2):
+        """
+        Return a function that records its invocation, sleeps for `delay` seconds and returns `value`.
+        """
+        def call():
+            """
+            Record the call and return `value` after `delay` seconds.
+            """
+            self.calls.append(value)
+            time.sleep(delay)
+            return value
+        return call
+
+    def failing_call(self):
+        """
+        Return a function that records its invocation and raises a JsonHandlerError.
+        """
+        def call():
+            """
+            Record the call and fail.
+            """
+            self.calls.append('error')
+            time.sleep(0.2)
+            raise JsonHandlerError(500, 'Boomi error')
+        return call
+
+    def make_backend(self, kind):
+        """
+        Return a lock/result backend of the given `kind`.
+        """
+        if kind == 'memory':
+            return CacheLockBackend(InProcessCache())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return FileLockBackend(directory)
+
+    def test_local_coalescing(self):
+        """
+        Test that concurrent calls in one process share a single call.
+        """
+        single_flight = SingleFlight()
+        results = run_concurrently([lambda: single_flight.do('key', self.slow_call())] * 5)
+        self.assertEqual(results, ['url'] * 5)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_local_error(self):
+        """
+        Test that followers receive the error raised by the leader.
+        """
+        single_flight = SingleFlight()
+        results = run_concurrently([lambda: single_flight.do('key', self.failing_call())] * 3)
+        self.assertEqual(len(self.calls), 1)
+        for result in results:
+            self.assertIsInstance(result, JsonHandlerError)
+
+    def test_sequential_calls(self):
+        """
+        Test that results are not reused once the call finished.
+        """
+        single_flight = SingleFlight()
+        single_flight.do('key', self.slow_call(delay=0))
+        single_flight.do('key', self.slow_call(delay=0))
+        self.assertEqual(len(self.calls), 2)
+
+    @ddt.data('memory', 'file')
+    def test_shared_coalescing(self, kind):
+        """
+        Test that calls from separate SingleFlight instances (standing in for separate workers)
+        sharing a backend are coalesced.
+        """
+        backend = self.make_backend(kind)
+        workers = [SingleFlight(backend=backend, poll_interval=0.01) for _ in range(4)]
+        results = run_concurrently([
+            lambda worker=worker: worker.do('key', self.slow_call()) for worker in workers
+        ])
+        self.assertEqual(results, ['url'] * 4)
+        self.assertEqual(len(self.calls), 1)
+
+    @ddt.data('memory', 'file')
+    def test_shared_error(self, kind):
+        """
+        Test that followers in other workers receive the error raised by the leader.
+        """
+        backend = self.make_backend(kind)
+        workers = [SingleFlight(backend=backend, poll_interval=0.01) for _ in range(3)]
+        results = run_concurrently([
+            lambda worker=worker: worker.do('key', self.failing_call()) for worker in workers
+        ])
+        self.assertEqual(len(self.calls), 1)
+        for result in results:
+            self.assertIsInstance(result, JsonHandlerError)
+            self.assertEqual(result.message, 'Boomi error')
+
+    def test_wait_timeout(self):
+        """
+        Test that followers give up waiting after `wait_timeout` seconds.
+        """
+        backend = self.make_backend('memory')
+        leader = SingleFlight(backend=backend)
+        follower = SingleFlight(backend=backend, wait_timeout=0.05, poll_interval=0.01)
+        leader_started = threading.Event()
+
+        def lead():
+            """
+            Signal that the leader took the lock, then take a while to finish.
+            """
+            leader_started.set()
+            time.sleep(0.3)
+            return 'url'
+
+        results = run_concurrently([
+            lambda: leader.do('key', lead),
+            lambda: leader_started.wait() and follower.do('key', self.slow_call()),
+        ])
+        self.assertEqual(results[0], 'url')
+        self.assertIsInstance(results[1], LaunchInProgressError)
+
+    def test_deadline(self):
+        """
+        Test that followers don't wait for the leader past their deadline.
+        """
+        single_flight = SingleFlight()
+        leader_started = threading.Event()
+
+        def lead():
+            """
+            Signal that the leader started, then take a while to finish.
+            """
+            leader_started.set()
+            time.sleep(0.3)
+            return 'url'
+
+        started = time.time()
+        results = run_concurrently([
+            lambda: single_flight.do('key', lead),
+            lambda: leader_started.wait() and single_flight.do('key', self.slow_call(), deadline=time.time() + 0.05),
+        ])
+        self.assertEqual(results[0], 'url')
+        self.assertIsInstance(results[1], LaunchInProgressError)
+        self.assertLess(time.time() - started, 1)
+
+    def test_file_lock(self):
+        """
+        Test that file locks are exclusive until they expire, and that unreadable lock files count as held
+        until they are older than the lock timeout.
+        """
+        backend = self.make_backend('file')
+        self.assertTrue(backend.acquire('key', 'a', 60))
+        self.assertFalse(backend.acquire('key', 'b', 60))
+        self.assertTrue(backend.is_locked('key'))
+        backend.release('key', 'a')
+        self.assertTrue(backend.acquire('key', 'b', 0))
+        # Expired locks are taken over.
+        self.assertTrue(backend.acquire('key', 'c', 60))
+        backend.release('key', 'c')
+
+        path = backend._path('lock', 'key')  # pylint: disable=protected-access
+        open(path, 'w').close()
+        self.assertFalse(backend.acquire('key', 'd', 60))
+        os.utime(path, (time.time() - 120, time.time() - 120))
+        self.assertTrue(backend.acquire('key', 'd', 60))
+        # No temporary files are left behind.
+        self.assertEqual(os.listdir(backend.directory), [os.path.basename(path)])
+
+    def test_get_single_flight(self):
+        """
+        Test that blocks with the same configuration share a SingleFlight, even with a disabled launch cache.
+        """
+        xblock_settings = {'launch_cache': {'enabled': False}, 'single_flight': {'backend': 'local'}}
+        single_flight = get_single_flight(xblock_settings, get_launch_cache(xblock_settings))
+        self.assertIs(get_single_flight(xblock_settings, get_launch_cache(xblock_settings)), single_flight)
+        other_settings = {'single_flight': {'backend': 'local'}}
+        self.assertIsNot(get_single_flight(other_settings, get_launch_cache(other_settings)), single_flight)
@@ -5,17 +5,33 @@ Unit tests for the Skytap XBlock.
 # Imports ###########################################################
 
 import json
-from unittest.mock import Mock
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import Mock, patch
 
 import ddt
 import httpretty
+from opaque_keys.edx.keys import CourseKey
+from webob import Request
 
+from xblock.exceptions import JsonHandlerError
 from xblock.field_data import DictFieldData
 
+from xblock_skytap.admission import get_admission_controller
+from xblock_skytap.audit import get_audit_log
+from xblock_skytap.breaker import get_circuit_breaker
+from xblock_skytap.cache import get_launch_cache, launch_cache_key
 from xblock_skytap.exceptions import BoomiConfigurationInvalidError, BoomiConfigurationMissingError
+from xblock_skytap.jobs import get_job_store
+from xblock_skytap.launchlog import get_launch_log_writer
+from xblock_skytap.prewarm import get_prewarmer
 from xblock_skytap.skytap import SkytapXBlock
 
 from .mixins.boomi import BOOMI_CONFIGURATION, CreateVmMockMixin
+from .mixins.server import stand_in_boomi_configuration, start_stand_in_server
 
 
 # Globals ###########################################################
@@ -24,6 +40,48 @@ XBLOCK_SETTINGS = {
     "boomi_configuration": BOOMI_CONFIGURATION,
 }
 
+ASYNC_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "launch_jobs": {"enabled": True},
+}
+
+CALLBACK_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "launch_callbacks": {"enabled": True, "secret": "callback-secret"},
+}
+
+ADMISSION_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "admission_control": {"enabled": True, "global_concurrency": 1, "max_queue": 1},
+}
+
+ADMISSION_JOB_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "launch_jobs": {"enabled": True},
+    "admission_control": {"enabled": True, "global_concurrency": 1, "max_queue": 2},
+}
+
+LAUNCH_LOG_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "launch_log": {"enabled": True, "backend_options": {"path": ":memory:"}},
+}
+
+AUDIT_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "audit_log": {"enabled": True, "sink": "tests.unit.test_audit.RecordingSink", "flush_interval": 0},
+}
+
+PREWARM_XBLOCK_SETTINGS = {
+    "boomi_configuration": BOOMI_CONFIGURATION,
+    "prewarm": {"enabled": True, "courses": ["TestOrg/TestCourse"], "rate": 0},
+}
+
+TIMEOUT_MESSAGE = u'Your exercise environment could not be launched in time. Please try again.'
+
+FAST_FAILING_XBLOCK_SETTINGS = {
+    "boomi_configuration": dict(BOOMI_CONFIGURATION, read_timeout=0.1, retry_backoff=0),
+}
+
 
 # Classes ###########################################################
 
@@ -44,13 +102,31 @@ class TestSkytap(CreateVmMockMixin):
 
         self.runtime_mock = Mock()
         self.runtime_mock.service = Mock(return_value=self.service_mock)
+        self.runtime_mock.user_is_staff = False
+        self.runtime_mock.handler_url = Mock(
+            side_effect=lambda block, handler_name, suffix='', query='', thirdparty=False:
+            'https://lms.example.com/handler_noauth/{}?{}'.format(handler_name, query)
+        )
 
         self.scope_ids_mock = Mock()
+        self.scope_ids_mock.usage_id.course_key.org = "TestOrg"
         self.scope_ids_mock.usage_id.course_key.course = "TestCourse"
         self.scope_ids_mock.usage_id.course_key.run = "201704"
 
         self.block = SkytapXBlock(self.runtime_mock, DictFieldData({}), self.scope_ids_mock)
 
+        get_launch_cache({}).clear()
+        self.addCleanup(get_launch_cache({}).clear)
+        get_circuit_breaker({}).cache.clear()
+        self.addCleanup(get_circuit_breaker({}).cache.clear)
+
+    def call_handler(self, handler_name, data=None):
+        """
+        Helper method for calling the JSON handler `handler_name` with `data` and returning the response.
+        """
+        handler = getattr(self.block, handler_name)
+        return handler(request=Mock(method='POST', body=json.dumps(data or {}).encode()))
+
     def assert_launch_response(self, expected, code=500):
         """
         Helper method for calling the launch method and asserting an expected response dict.
@@ -73,16 +149,21 @@ class TestSkytap(CreateVmMockMixin):
         with self.assertRaises(exception):
             self.block.get_boomi_configuration()
 
-    def test_get_boomi_url(self):
+    @ddt.unpack
+    @ddt.data(
+        ({}, "https://connect.boomi.example.com/ws/simple/createVm"),
+        ({"auth_method": "url"}, (
+            "https://connect.boomi.example.com/ws/simple/createVm"
+            ";boomi_auth=Zm9vOmI4ZWFhZGQ3OC00ZWJkLTQ0MDQtYTI2MS02OTBjODE1MWU1NTY="
+        )),
+    )
+    def test_get_boomi_url(self, extra_configuration, expected_url):
         """
         Test constructing the Boomi endpoint URL.
         """
-        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
-
-        expected_url = (
-            "https://connect.boomi.example.com/ws/simple/createVm"
-            ";boomi_auth=Zm9vOmI4ZWFhZGQ3OC00ZWJkLTQ0MDQtYTI2MS02OTBjODE1MWU1NTY="
-        )
+        self.block.get_xblock_settings = Mock(return_value={
+            "boomi_configuration": dict(BOOMI_CONFIGURATION, **extra_configuration),
+        })
         returned = self.block.get_boomi_url()
         self.assertEqual(
             returned,
@@ -98,6 +179,10 @@ class TestSkytap(CreateVmMockMixin):
         sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
         self.mock_createvm(self.block.get_boomi_url(), sharing_portal_url)
         self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+        self.assertEqual(
+            httpretty.last_request().headers['Authorization'],
+            'Basic Zm9vOmI4ZWFhZGQ3OC00ZWJkLTQ0MDQtYTI2MS02OTBjODE1MWU1NTY=',
+        )
 
     @httpretty.activate
     def test_launch_handled_error(self):
@@ -118,6 +203,637 @@ class TestSkytap(CreateVmMockMixin):
         self.mock_createvm_malformed(self.block.get_boomi_url())
         self.assert_launch_response({u'error': u'The Skytap launch service returned a malformed response.'})
 
+    @ddt.data({'ErrorExists': 'false'}, {'SkytapURL': 'https://skytap.example.com/sharing/portal/url'}, [])
+    @httpretty.activate
+    def test_launch_incomplete_response(self, response):
+        """
+        Test that a response lacking fields results in a generic error message rather than a server error.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        httpretty.register_uri(
+            httpretty.POST, self.block.get_boomi_url(), body=json.dumps(response), content_type='application/json'
+        )
+        self.assert_launch_response({u'error': u'The Skytap launch service returned a malformed response.'})
+
+    @httpretty.activate
+    def test_launch_timeout(self):
+        """
+        Test that launch method gracefully fails if Boomi does not respond in time.
+        """
+        self.block.get_xblock_settings = Mock(return_value=FAST_FAILING_XBLOCK_SETTINGS)
+        self.mock_createvm_slow(self.block.get_boomi_url(), delay=0.2)
+        self.assert_launch_response({u'error': u'The Skytap launch service did not respond in time.'})
+
+    @httpretty.activate
+    def test_launch_deadline(self):
+        """
+        Test that the launch stops waiting for Boomi once the client's deadline, capped by the server, has passed.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        self.mock_createvm_slow(self.block.get_boomi_url(), delay=0.5)
+
+        started = time.time()
+        response = self.call_handler('launch', {'timeout': 0.2})
+        self.assertLess(time.time() - started, 0.45)
+        self.assertEqual(response.status_code, 500)  # pylint: disable=no-member
+        self.assertEqual(
+            response.json,  # pylint: disable=no-member
+            {u'error': u'The Skytap launch service did not respond in time.'},
+        )
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+        # Boomi did not answer in the time it had, which counts as a Boomi failure.
+        circuit_breaker = get_circuit_breaker({})
+        self.assertEqual(circuit_breaker.cache.get(circuit_breaker.state_key)['failures'], 1)
+
+        self.block.get_xblock_settings = Mock(return_value=dict(XBLOCK_SETTINGS, launch_deadline={'max_timeout': 0.2}))
+        started = time.time()
+        self.assertEqual(self.call_handler('launch', {'timeout': 30}).status_code, 500)  # pylint: disable=no-member
+        self.assertLess(time.time() - started, 0.45)
+
+    def test_probe_deadline_exceeded(self):
+        """
+        Test that a half-open probe whose deadline passed before Boomi was asked lets the next launch probe.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        circuit_breaker = get_circuit_breaker({})
+        circuit_breaker.cache.set(
+            circuit_breaker.state_key,
+            {'opened_at': time.time() - 1000, 'window_start': time.time() - 1000, 'requests': 10, 'failures': 10},
+        )
+        payload = {'email': 'testuser@example.com', 'course_name': 'TestCourse', 'course_run': '201704'}
+
+        with self.assertRaises(JsonHandlerError):
+            self.block.get_launcher().request_boomi(payload, deadline=time.time() - 1)
+        self.assertTrue(circuit_breaker.is_open())
+        self.assertIsNone(circuit_breaker.retry_after())
+
+    def test_get_launch_deadline(self):
+        """
+        Test that the client's deadline is capped by the server's maximum, which also applies to clients without one.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        self.assertEqual(self.block.get_launch_deadline({'timeout': 10}, 1000), 1010)
+        self.assertEqual(self.block.get_launch_deadline({'timeout': 100}, 1000), 1055)
+        for data in ({}, {'timeout': 'soon'}, {'timeout': -1}, {'timeout': True}, 'de'):
+            self.assertEqual(self.block.get_launch_deadline(data, 1000), 1055)
+        self.block.get_xblock_settings = Mock(return_value=dict(XBLOCK_SETTINGS, launch_deadline={'max_timeout': None}))
+        self.assertIsNone(self.block.get_launch_deadline({}, 1000))
+        self.assertEqual(self.block.get_launch_deadline({'timeout': 100}, 1000), 1100)
+
+    @httpretty.activate
+    def test_launch_unavailable(self):
+        """
+        Test that launch method gracefully fails if Boomi keeps failing after all retries.
+        """
+        self.block.get_xblock_settings = Mock(return_value=FAST_FAILING_XBLOCK_SETTINGS)
+        self.mock_createvm_unavailable(self.block.get_boomi_url())
+        self.assert_launch_response({u'error': u'The Skytap launch service is currently unavailable.'})
+
+    @httpretty.activate
+    def test_launch_retries_transient_errors(self):
+        """
+        Test that transient Boomi failures are retried with the same idempotency key.
+        """
+        self.block.get_xblock_settings = Mock(return_value=FAST_FAILING_XBLOCK_SETTINGS)
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        self.mock_createvm_unavailable(self.block.get_boomi_url(), failures=2, sharing_portal_url=sharing_portal_url)
+        self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+
+        requests = httpretty.latest_requests()
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(len({request.headers['Idempotency-Key'] for request in requests}), 1)
+
+    @httpretty.activate
+    def test_launch_cached(self):
+        """
+        Test that relaunching the same environment is served from the launch cache.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        self.mock_createvm(self.block.get_boomi_url(), sharing_portal_url)
+        self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+        self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+
+    @httpretty.activate
+    def test_launch_cache_disabled(self):
+        """
+        Test that every launch goes to Boomi if the launch cache is disabled.
+        """
+        self.block.get_xblock_settings = Mock(return_value=dict(XBLOCK_SETTINGS, launch_cache={'enabled': False}))
+        self.mock_createvm(self.block.get_boomi_url())
+        self.call_handler('launch')
+        self.call_handler('launch')
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+
+    @httpretty.activate
+    def test_launch_remembered(self):
+        """
+        Test that the last sharing portal URL is kept in user state until it expires, and that refreshing relaunches.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        self.mock_createvm(self.block.get_boomi_url(), sharing_portal_url)
+        self.assertIsNone(self.block.get_resume_link())
+
+        self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+        self.assertEqual(self.block.sharing_portal_url, sharing_portal_url)
+        self.assertEqual(self.block.get_resume_link(), (sharing_portal_url, 299))
+        launched_at = self.block.launched_at
+
+        response = self.call_handler('launch', {'refresh': True})
+        self.assertEqual(response.json, {u'sharing_portal_url': sharing_portal_url})  # pylint: disable=no-member
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+        self.assertGreater(self.block.launched_at, launched_at)
+
+        self.block.launch_expires_at = time.time() - 1
+        self.assertIsNone(self.block.get_resume_link())
+
+        self.block.get_xblock_settings = Mock(return_value=dict(XBLOCK_SETTINGS, resume_link={'enabled': False}))
+        self.block.forget_launch()
+        self.call_handler('launch')
+        self.assertIsNone(self.block.sharing_portal_url)
+
+    def test_launch_environments(self):
+        """
+        Test that the environments of a block are launched concurrently, and that partial failures are reported.
+        """
+        server = start_stand_in_server(self, delay=0.4)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        launch_log = {"enabled": True, "backend_options": {"path": os.path.join(directory, "launches.sqlite3")}}
+        self.block.get_xblock_settings = Mock(return_value={
+            "boomi_configuration": stand_in_boomi_configuration(server), "launch_log": launch_log,
+        })
+        self.block.environments = ["slow-cluster", {"name": "Client", "template": "slow-client"}, "error-vm"]
+
+        started = time.time()
+        response = self.call_handler('launch')
+        self.assertLess(time.time() - started, 0.7)
+        self.assertEqual(response.json, {u'environments': [  # pylint: disable=no-member
+            {u'name': u'slow-cluster', u'sharing_portal_url': u'https://skytap.example.com/slow-cluster'},
+            {u'name': u'Client', u'sharing_portal_url': u'https://skytap.example.com/slow-client'},
+            {u'name': u'error-vm', u'error': u'No capacity left.'},
+        ]})
+        self.assertEqual(server.max_in_flight, 3)
+        self.runtime_mock.user_is_staff = True
+        get_launch_log_writer(self.block.get_xblock_settings()).flush()
+        launches = self.call_handler('launch_history').json['launches']  # pylint: disable=no-member
+        self.assertEqual(launches[0]['outcome'], 'error')
+        self.assertIsNone(self.block.sharing_portal_url)
+
+        # Launched environments are cached; only the failed one is launched again.
+        self.call_handler('launch')
+        self.assertEqual(len(server.idempotency_keys), 4)
+
+        self.block.environments = ["error-vm"]
+        response = self.call_handler('launch')
+        self.assertEqual(response.status_code, 500)  # pylint: disable=no-member
+        self.assertEqual(response.json, {u'error': u'No capacity left.'})  # pylint: disable=no-member
+
+    def test_launch_environments_deadline(self):
+        """
+        Test that environments that don't launch before the deadline are reported as errors.
+        """
+        server = start_stand_in_server(self, delay=0.5)
+        self.block.get_xblock_settings = Mock(return_value={
+            "boomi_configuration": stand_in_boomi_configuration(server),
+            "multi_launch": {"max_workers": 2, "deadline": 0.2},
+        })
+        self.block.environments = ["cluster", "slow-vm"]
+
+        response = self.call_handler('launch')
+        self.assertEqual(response.json, {u'environments': [  # pylint: disable=no-member
+            {u'name': u'cluster', u'sharing_portal_url': u'https://skytap.example.com/cluster'},
+            {u'name': u'slow-vm', u'error': TIMEOUT_MESSAGE},
+        ]})
+
+    def test_validate_environments(self):
+        """
+        Test that invalid environments are reported when editing the block.
+        """
+        self.block.environments = ["cluster", {"name": "Client", "template": "client"}]
+        self.assertTrue(self.block.validate())
+        for environments in ([{"name": "Client"}], ["cluster", "cluster"], [42]):
+            self.block.environments = environments
+            self.assertFalse(self.block.validate())
+
+    def test_prefetch_ttl(self):
+        """
+        Test that prefetching is disabled by default.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        self.assertIsNone(self.block.get_prefetch_ttl())
+        self.block.get_xblock_settings = Mock(return_value=dict(XBLOCK_SETTINGS, prefetch={'enabled': True}))
+        self.assertEqual(self.block.get_prefetch_ttl(), 300)
+
+    @httpretty.activate
+    def test_prewarm(self):
+        """
+        Test that prewarming launches the environment in the background, so the launch is answered from the cache.
+        """
+        self.block.get_xblock_settings = Mock(return_value=PREWARM_XBLOCK_SETTINGS)
+        self.mock_createvm(self.block.get_boomi_url(), 'https://skytap.example.com/sharing/portal/url')
+        prewarmer = get_prewarmer(PREWARM_XBLOCK_SETTINGS)
+
+        self.block.prewarm()
+        deadline = time.time() + 5
+        while prewarmer.in_flight() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(
+            get_launch_cache({}).get(launch_cache_key('testuser@example.com', 'TestCourse', '201704')),
+            'https://skytap.example.com/sharing/portal/url',
+        )
+        # Cached environments are not prewarmed again, and the launch doesn't call Boomi.
+        self.block.prewarm()
+        sharing_portal_url = self.call_handler('launch').json['sharing_portal_url']  # pylint: disable=no-member
+        self.assertEqual(sharing_portal_url, 'https://skytap.example.com/sharing/portal/url')
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+
+        # Prewarming is only enabled for some courses.
+        get_launch_cache({}).clear()
+        self.scope_ids_mock.usage_id.course_key.course = "OtherCourse"
+        self.block.prewarm()
+        self.assertEqual(prewarmer.in_flight(), 0)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+
+    @httpretty.activate
+    def test_launch_history(self):
+        """
+        Test that launches are recorded in the launch log, and that staff members can list them.
+        """
+        self.scope_ids_mock.usage_id.course_key = CourseKey.from_string('course-v1:TestOrg+TestCourse+201704')
+        self.block.get_xblock_settings = Mock(return_value=LAUNCH_LOG_XBLOCK_SETTINGS)
+        self.mock_createvm(self.block.get_boomi_url(), 'https://skytap.example.com/sharing/portal/url')
+        self.call_handler('launch')
+        get_launch_log_writer(LAUNCH_LOG_XBLOCK_SETTINGS).flush()
+        self.assertEqual(self.call_handler('launch_history').status_code, 403)  # pylint: disable=no-member
+
+        self.runtime_mock.user_is_staff = True
+        response = self.call_handler('launch_history', {'outcome': 'ready', 'page': 1})
+        self.assertEqual(response.status_code, 200)  # pylint: disable=no-member
+        self.assertEqual(response.json['total'], 1)  # pylint: disable=no-member
+        launch = response.json['launches'][0]  # pylint: disable=no-member
+        self.assertEqual((launch['user'], launch['outcome'], launch['launches']), ('testuser@example.com', 'ready', 1))
+        self.assertGreater(launch['latency'], 0)
+        self.assertGreaterEqual(launch['url_age'], 0)
+
+        # Course runs with the same name in other organizations have their own launches.
+        self.scope_ids_mock.usage_id.course_key = CourseKey.from_string('course-v1:OtherOrg+TestCourse+201704')
+        self.assertEqual(self.call_handler('launch_history').json['total'], 0)  # pylint: disable=no-member
+        self.scope_ids_mock.usage_id.course_key = CourseKey.from_string('course-v1:TestOrg+TestCourse+201704')
+        self.assertEqual(self.call_handler('launch_history').json['total'], 1)  # pylint: disable=no-member
+
+        response = self.call_handler('launch_history', {'outcome': 'bogus'})
+        self.assertEqual(response.status_code, 400)  # pylint: disable=no-member
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        self.assertEqual(self.call_handler('launch_history').status_code, 404)  # pylint: disable=no-member
+
+    @httpretty.activate
+    def test_launch_audited(self):
+        """
+        Test that launches are recorded in the audit log, along with the endpoint, latency and error.
+        """
+        self.block.get_xblock_settings = Mock(return_value=AUDIT_XBLOCK_SETTINGS)
+        audit_log = get_audit_log(AUDIT_XBLOCK_SETTINGS)
+        del audit_log.sink.batches[:]
+        self.mock_createvm(self.block.get_boomi_url(), 'https://skytap.example.com/sharing/portal/url')
+        self.call_handler('launch')
+        self.call_handler('launch')
+        get_launch_cache({}).clear()
+        self.mock_createvm_malformed(self.block.get_boomi_url())
+        self.call_handler('launch')
+        audit_log.flush()
+
+        events = [event for batch in audit_log.sink.batches for event in batch]
+        self.assertEqual([event['outcome'] for event in events], ['success', 'cache_hit', 'malformed'])
+        self.assertEqual({event['user'] for event in events}, {'testuser@example.com'})
+        self.assertEqual({event['course_run'] for event in events}, {'TestCourse/201704'})
+        self.assertEqual(events[0]['endpoint'], 'default')
+        self.assertGreater(events[0]['latency'], 0)
+        self.assertIsNone(events[0]['error'])
+        self.assertEqual(events[2]['error'], 'The Skytap launch service returned a malformed response.')
+
+        self.runtime_mock.user_is_staff = True
+        report = json.loads(self.block.launch_metrics(Request.blank('/')).text)
+        self.assertEqual(report['audit']['dropped'], 0)
+
+    @httpretty.activate
+    def test_concurrent_launches(self):
+        """
+        Test that concurrent launches for the same learner and course run share a single Boomi call.
+        """
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        self.mock_createvm_slow(self.block.get_boomi_url(), delay=0.2, sharing_portal_url=sharing_portal_url)
+
+        responses = []
+
+        def launch():
+            """
+            Launch the environment and record the response.
+            """
+            responses.append(self.call_handler('launch'))
+
+        threads = [threading.Thread(target=launch) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([response.json for response in responses], [{u'sharing_portal_url': sharing_portal_url}] * 3)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+
+    @httpretty.activate
+    def test_concurrent_callback_launches(self):
+        """
+        Test that concurrent launches in callback mode share a single Boomi call and the job that tracks it.
+        """
+        self.block.get_xblock_settings = Mock(return_value=CALLBACK_XBLOCK_SETTINGS)
+        self.mock_createvm_slow(self.block.get_boomi_url(), delay=0.2, sharing_portal_url=None)
+
+        responses = []
+
+        def launch():
+            """
+            Launch the environment and record the response.
+            """
+            responses.append(self.call_handler('launch'))
+
+        threads = [threading.Thread(target=launch) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        job_id = json.loads(httpretty.last_request().body.decode('utf-8'))['correlation_id']
+        self.assertEqual([response.json for response in responses], [{'job_id': job_id, 'status': 'pending'}] * 3)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+
+    @httpretty.activate
+    def test_callback_launch_deadline(self):
+        """
+        Test that launches in callback mode stop waiting for Boomi once the client's deadline has passed.
+        """
+        self.block.get_xblock_settings = Mock(return_value=CALLBACK_XBLOCK_SETTINGS)
+        self.mock_createvm_slow(self.block.get_boomi_url(), delay=0.5, sharing_portal_url=None)
+
+        started = time.time()
+        response = self.call_handler('launch', {'timeout': 0.2})
+        self.assertLess(time.time() - started, 0.45)
+        self.assertEqual(response.status_code, 500)  # pylint: disable=no-member
+
+    @ddt.unpack
+    @ddt.data(
+        (True, {'email': 'testuser@example.com'}, 200),
+        (True, {}, 400),
+        (False, {'email': 'testuser@example.com'}, 403),
+    )
+    def test_clear_launch_cache(self, is_staff, data, code):
+        """
+        Test that staff members can evict cached sharing portal URLs.
+        """
+        self.runtime_mock.user_is_staff = is_staff
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        cache_key = launch_cache_key('testuser@example.com', 'TestCourse', '201704')
+        get_launch_cache({}).set(cache_key, 'https://skytap.example.com/sharing/portal/url')
+
+        response = self.call_handler('clear_launch_cache', data)
+
+        self.assertEqual(response.status_code, code)  # pylint: disable=no-member
+        self.assertEqual(get_launch_cache({}).get(cache_key) is None, code == 200)
+
+    def wait_for_launch_job(self, job_id):
+        """
+        Helper method for polling the launch_status handler until the job with the given ID is done.
+        """
+        for _ in range(100):
+            response = self.call_handler('launch_status', {'job_id': job_id})
+            if response.status_code != 200 or response.json['status'] != 'pending':  # pylint: disable=no-member
+                return response
+            time.sleep(0.05)
+        self.fail('Launch job did not finish in time.')
+
+    @httpretty.activate
+    def test_launch_async(self):
+        """
+        Test that launches run as background jobs whose result can be fetched via the launch_status handler.
+        """
+        self.block.get_xblock_settings = Mock(return_value=ASYNC_XBLOCK_SETTINGS)
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        self.mock_createvm_slow(self.block.get_boomi_url(), delay=0.1, sharing_portal_url=sharing_portal_url)
+
+        response = self.call_handler('launch')
+        self.assertEqual(response.status_code, 200)  # pylint: disable=no-member
+        self.assertEqual(response.json['status'], 'pending')  # pylint: disable=no-member
+
+        response = self.wait_for_launch_job(response.json['job_id'])  # pylint: disable=no-member
+        self.assertEqual(response.status_code, 200)  # pylint: disable=no-member
+        self.assertEqual(response.json['sharing_portal_url'], sharing_portal_url)  # pylint: disable=no-member
+        self.assertEqual(self.block.sharing_portal_url, sharing_portal_url)
+
+        # Relaunching is served from the launch cache without creating another job.
+        self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+
+    @httpretty.activate
+    def test_launch_async_error(self):
+        """
+        Test that errors of background launch jobs are reported by the launch_status handler.
+        """
+        self.block.get_xblock_settings = Mock(return_value=ASYNC_XBLOCK_SETTINGS)
+        error = u'A handled error.'
+        self.mock_createvm_error(self.block.get_boomi_url(), error)
+
+        response = self.call_handler('launch')
+        response = self.wait_for_launch_job(response.json['job_id'])  # pylint: disable=no-member
+        self.assertEqual(response.status_code, 500)  # pylint: disable=no-member
+        self.assertDictEqual(response.json, {u'error': error})  # pylint: disable=no-member
+
+    @httpretty.activate
+    def test_launch_queued(self):
+        """
+        Test that launches wait in the queue while admission control holds them back,
+        reporting their position in the queue via the launch_status handler.
+        """
+        self.block.get_xblock_settings = Mock(return_value=ADMISSION_XBLOCK_SETTINGS)
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        self.mock_createvm(self.block.get_boomi_url(), sharing_portal_url)
+        admission = get_admission_controller(ADMISSION_XBLOCK_SETTINGS)
+        self.assertTrue(admission.admit('Other/run'))
+
+        response = self.call_handler('launch')
+        self.assertEqual(response.status_code, 200)  # pylint: disable=no-member
+        job_id = response.json['job_id']  # pylint: disable=no-member
+        self.assertDictEqual(response.json, {  # pylint: disable=no-member
+            'job_id': job_id, 'status': 'queued', 'position': 1, 'eta': 10,
+        })
+        response = self.call_handler('launch_status', {'job_id': job_id})
+        self.assertEqual(response.json['status'], 'queued')  # pylint: disable=no-member
+        self.assertEqual(len(httpretty.latest_requests()), 0)
+
+        # The queue is full, and the job of the rejected launch isn't left pending.
+        self.current_user_mock.emails = ['otheruser@example.com']
+        job_store = get_job_store(ADMISSION_XBLOCK_SETTINGS)
+        create = job_store.create
+        job_ids = []
+        with patch.object(job_store, 'create', side_effect=lambda owner: job_ids.append(create(owner)) or job_ids[-1]):
+            response = self.call_handler('launch')
+        self.assertEqual(response.status_code, 503)  # pylint: disable=no-member
+        self.assertEqual(job_store.get(job_ids[0])['status'], 'error')
+        self.current_user_mock.emails = ['testuser@example.com']
+
+        admission.release('Other/run')
+        response = self.wait_for_launch_job(job_id)
+        self.assertEqual(response.json['sharing_portal_url'], sharing_portal_url)  # pylint: disable=no-member
+
+    def test_launch_job_creation_error(self):
+        """
+        Test that an admitted launch releases its admission slot if its job can't be created.
+        """
+        self.block.get_xblock_settings = Mock(return_value=ADMISSION_JOB_XBLOCK_SETTINGS)
+        admission = get_admission_controller(ADMISSION_JOB_XBLOCK_SETTINGS)
+
+        with patch('xblock_skytap.skytap.get_job_store', side_effect=OSError('The job store is unavailable.')):
+            with self.assertRaises(OSError):
+                self.call_handler('launch')
+        self.assertTrue(admission.admit('Other/run'))
+        admission.release('Other/run')
+
+    @ddt.data({}, {'job_id': 'unknown'})
+    def test_launch_status_unknown_job(self, data):
+        """
+        Test that querying the status of an unknown launch job results in a 404 response.
+        """
+        self.block.get_xblock_settings = Mock(return_value=ASYNC_XBLOCK_SETTINGS)
+        response = self.call_handler('launch_status', data)
+        self.assertEqual(response.status_code, 404)  # pylint: disable=no-member
+
+    @httpretty.activate
+    def test_launch_circuit_open(self):
+        """
+        Test that launches fail fast with a 503 response while the circuit breaker for Boomi is open.
+        """
+        self.block.get_xblock_settings = Mock(return_value=FAST_FAILING_XBLOCK_SETTINGS)
+        self.mock_createvm_unavailable(self.block.get_boomi_url())
+        for _ in range(10):
+            self.call_handler('launch')
+        self.assertEqual(len(httpretty.latest_requests()), 30)
+
+        response = self.call_handler('launch')
+        self.assertEqual(response.status_code, 503)  # pylint: disable=no-member
+        self.assertEqual(int(response.headers['Retry-After']), 30)  # pylint: disable=no-member
+        self.assertEqual(len(httpretty.latest_requests()), 30)
+
+    @httpretty.activate
+    def test_launch_metrics(self):
+        """
+        Test that staff can retrieve launch latency percentiles and outcomes for the course run.
+        """
+        self.scope_ids_mock.usage_id.course_key.run = "metrics"
+        self.block.get_xblock_settings = Mock(return_value=XBLOCK_SETTINGS)
+        self.mock_createvm(self.block.get_boomi_url(), 'https://skytap.example.com/sharing/portal/url')
+        self.call_handler('launch')
+
+        response = self.block.launch_metrics(Request.blank('/'))
+        self.assertEqual(response.status_code, 403)
+
+        self.runtime_mock.user_is_staff = True
+        report = json.loads(self.block.launch_metrics(Request.blank('/')).text)
+        self.assertEqual((report['course_run'], report['org']), ('TestCourse/metrics', 'TestOrg'))
+        self.assertEqual(report['counters'], {'launch.outcome[outcome=success]': 1})
+        for phase in ('launch.runtime', 'launch.config', 'launch.boomi', 'launch.decode', 'launch.total'):
+            self.assertEqual(report['timings'][phase]['count'], 1)
+            self.assertLessEqual(report['timings'][phase]['p50'], report['timings'][phase]['p99'])
+
+        response = self.block.launch_metrics(Request.blank('/?format=prometheus'))
+        self.assertIn(
+            'skytap_launch_outcome_total{course_run="TestCourse/metrics",org="TestOrg",outcome="success"} 1',
+            response.text,
+        )
+
+    def launch_with_callback(self):
+        """
+        Helper method for launching in callback mode and returning the job ID and the callback URL sent to Boomi.
+        """
+        self.block.get_xblock_settings = Mock(return_value=CALLBACK_XBLOCK_SETTINGS)
+        self.mock_createvm_accepted(self.block.get_boomi_url())
+
+        response = self.call_handler('launch')
+        self.assertEqual(response.json['status'], 'pending')  # pylint: disable=no-member
+        boomi_request = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual(boomi_request['correlation_id'], response.json['job_id'])  # pylint: disable=no-member
+        return response.json['job_id'], boomi_request['callback_url']  # pylint: disable=no-member
+
+    def call_launch_callback(self, callback_url, payload):
+        """
+        Helper method for simulating Boomi posting `payload` to `callback_url`.
+        """
+        request = Request.blank(
+            '/?' + callback_url.split('?', 1)[1], method='POST', body=json.dumps(payload).encode('utf-8')
+        )
+        return self.block.launch_callback(request)
+
+    @httpretty.activate
+    def test_launch_callback(self):
+        """
+        Test that Boomi can report the result of a launch via the launch_callback handler.
+        """
+        self.scope_ids_mock.usage_id.course_key.run = "callback"
+        sharing_portal_url = u'https://skytap.example.com/sharing/portal/url'
+        job_id, callback_url = self.launch_with_callback()
+        self.assertEqual(self.call_handler('launch_status', {'job_id': job_id}).json['status'], 'pending')
+        # Nothing has launched until Boomi calls back.
+        memory = self.block.get_metrics().memory
+        self.assertEqual(memory.report(course_run='TestCourse/callback')['counters'], {
+            'launch.outcome[org=TestOrg,outcome=accepted]': 1,
+        })
+
+        response = self.call_launch_callback(callback_url, {'ErrorExists': 'false', 'SkytapURL': sharing_portal_url})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(memory.report(course_run='TestCourse/callback')['counters'], {
+            'launch.outcome[org=TestOrg,outcome=accepted]': 1,
+            'launch.outcome[org=TestOrg,outcome=success]': 1,
+        })
+        response = self.call_handler('launch_status', {'job_id': job_id})
+        self.assertEqual(response.json['sharing_portal_url'], sharing_portal_url)  # pylint: disable=no-member
+
+        # The result can only be reported once, and is cached for relaunches.
+        response = self.call_launch_callback(callback_url, {'ErrorExists': 'false', 'SkytapURL': sharing_portal_url})
+        self.assertEqual(response.status_code, 409)
+        self.assert_launch_response({u'sharing_portal_url': sharing_portal_url}, code=200)
+
+    @httpretty.activate
+    def test_launch_callback_error(self):
+        """
+        Test that errors reported via the launch_callback handler are passed back to the client.
+        """
+        error = u'A handled error.'
+        job_id, callback_url = self.launch_with_callback()
+        response = self.call_launch_callback(callback_url, {'ErrorExists': 'true', 'ErrorMessage': error})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.call_handler('launch_status', {'job_id': job_id})
+        self.assertEqual(response.status_code, 500)  # pylint: disable=no-member
+        self.assertDictEqual(response.json, {u'error': error})  # pylint: disable=no-member
+
+    @httpretty.activate
+    def test_launch_callback_invalid_signature(self):
+        """
+        Test that the launch_callback handler rejects requests that are not signed with the callback secret.
+        """
+        job_id, callback_url = self.launch_with_callback()
+        forged_url = callback_url.replace('signature=', 'signature=0')
+        response = self.call_launch_callback(forged_url, {'ErrorExists': 'false', 'SkytapURL': 'https://evil.com'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.call_handler('launch_status', {'job_id': job_id}).json['status'], 'pending')
+
+    @httpretty.activate
+    def test_launch_callback_malformed(self):
+        """
+        Test that the launch_callback handler rejects malformed payloads.
+        """
+        _, callback_url = self.launch_with_callback()
+        response = self.call_launch_callback(callback_url, 'Not a Boomi response')
+        self.assertEqual(response.status_code, 400)
+
     def test_launch_improperly_configured(self):
         """
         Test that launch method gracefully fails if Boomi configuration is missing or invalid.
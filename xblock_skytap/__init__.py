@@ -1,5 +1,22 @@
 """
 Imports SkytabXBlock
+
+The XBlock class is only imported when it is first accessed, so that submodules (e.g. the skytap-provision command)
+can be imported without loading the XBlock runtime.
 """
 
-from .skytap import SkytapXBlock
+import sys
+
+if sys.version_info < (3, 7):  # Module __getattr__ (PEP 562) is not available.
+    from .skytap import SkytapXBlock
+else:
+    def __getattr__(name):
+        """
+        Import SkytapXBlock on first access.
+        """
+        if name == "SkytapXBlock":
+            from .skytap import SkytapXBlock  # pylint: disable=import-outside-toplevel
+            return SkytapXBlock
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+__all__ = ["SkytapXBlock"]
@@ -0,0 +1,371 @@
+"""
+Admission control for launches.
+
+When a cohort starts a lab together, sending every launch straight to Boomi overruns Skytap capacity
+and produces errors for everyone. The admission controller limits the number of concurrent launches
+(globally and per course run) and the launch rate (token buckets, globally and per course run).
+Launches that cannot be admitted right away wait in a fair queue: course runs take turns,
+so one big class can't starve the others. Queued launches report their position and an estimate
+of the time until they start.
+
+Admission control happens per process: limits apply to each LMS worker separately,
+and the queue position of a launch is only known to the worker that queued it.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import LaunchQueueFullError
+from .utils import TokenBucket
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+DEFAULT_GLOBAL_CONCURRENCY = 20
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_QUEUE_TIMEOUT = 900
+
+# Until launches have been timed, assume that a launch takes this many seconds.
+DEFAULT_SERVICE_TIME = 10
+# Weight of the latest launch in the moving average of launch durations.
+SERVICE_TIME_SMOOTHING = 0.2
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class Ticket(object):
+    """
+    A launch waiting in the queue.
+    """
+
+    __slots__ = ("ticket_id", "course_run", "func", "on_timeout", "enqueued_at")
+
+    def __init__(self, ticket_id, course_run, func, on_timeout):
+        self.ticket_id = ticket_id
+        self.course_run = course_run
+        self.func = func
+        self.on_timeout = on_timeout
+        self.enqueued_at = time.time()
+
+
+class AdmissionController(object):
+    """
+    Concurrency and rate limits for launches, with a fair queue across course runs.
+
+    At most `global_concurrency` launches run at the same time, at most `course_concurrency` of them
+    for the same course run (no limit if None). Launches start at a rate of at most `global_rate` per second,
+    and at most `course_rate` per second for the same course run (no limit if None).
+    At most `max_queue` launches wait in the queue; launches that waited for `queue_timeout` seconds are dropped.
+    """
+
+    def __init__(
+            self,
+            global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+            course_concurrency=None,
+            global_rate=None,
+            course_rate=None,
+            max_queue=DEFAULT_MAX_QUEUE,
+            queue_timeout=DEFAULT_QUEUE_TIMEOUT,
+    ):  # pylint: disable=too-many-arguments
+        self.global_concurrency = global_concurrency
+        self.course_concurrency = course_concurrency
+        self.global_rate = global_rate
+        self.course_rate = course_rate
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.service_time = DEFAULT_SERVICE_TIME
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._running_per_course = {}
+        # Queues per course run, in the order in which the course runs get their next turn.
+        self._queues = OrderedDict()
+        self._tickets = {}
+        self._global_bucket = TokenBucket(global_rate, capacity=1) if global_rate else None
+        self._course_buckets = {}
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=global_concurrency)
+
+    def _course_bucket(self, course_run):
+        """
+        Return the token bucket of `course_run`, or None if there is no rate limit per course run.
+        """
+        if not self.course_rate:
+            return None
+        bucket = self._course_buckets.get(course_run)
+        if bucket is None:
+            bucket = self._course_buckets[course_run] = TokenBucket(self.course_rate, capacity=1)
+        return bucket
+
+    def _rate_wait(self, course_run):
+        """
+        Return the number of seconds until the rate limits allow a launch for `course_run`.
+        """
+        buckets = (self._global_bucket, self._course_bucket(course_run))
+        return max([bucket.wait_time() for bucket in buckets if bucket is not None] or [0])
+
+    def _has_capacity(self, course_run):
+        """
+        Return True if the concurrency limits allow another launch for `course_run`. The caller must hold the lock.
+        """
+        return (
+            self._running < self.global_concurrency and
+            (self.course_concurrency is None or
+             self._running_per_course.get(course_run, 0) < self.course_concurrency)
+        )
+
+    def _start(self, course_run):
+        """
+        Take the tokens and the slot for a launch for `course_run`. The caller must hold the lock.
+        """
+        for bucket in (self._global_bucket, self._course_bucket(course_run)):
+            if bucket is not None:
+                bucket.try_acquire()
+        self._running += 1
+        self._running_per_course[course_run] = self._running_per_course.get(course_run, 0) + 1
+
+    def admit(self, course_run):
+        """
+        Admit a launch for `course_run` right away if the limits allow it, and return True if it was admitted.
+
+        Launches are not admitted ahead of queued launches that they would compete with.
+        The caller must call `release` once the launch is done.
+        """
+        with self._lock:
+            if self._queues.get(course_run) or (self._global_bucket is not None and self._tickets):
+                return False
+            if not self._has_capacity(course_run) or self._rate_wait(course_run):
+                return False
+            self._start(course_run)
+            return True
+
+    def release(self, course_run, duration=None):
+        """
+        Release the slot of a launch for `course_run` that took `duration` seconds, and start queued launches.
+        """
+        with self._lock:
+            self._running -= 1
+            self._running_per_course[course_run] -= 1
+            if not self._running_per_course[course_run]:
+                del self._running_per_course[course_run]
+            if duration is not None:
+                self.service_time += SERVICE_TIME_SMOOTHING * (duration - self.service_time)
+        self._dispatch()
+
+    def run_admitted(self, course_run, func, *args, **kwargs):
+        """
+        Call `func` for a launch for `course_run` that was admitted, releasing its slot afterwards.
+        """
+        started = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.release(course_run, time.time() - started)
+
+    def enqueue(self, ticket_id, course_run, func, on_timeout=None):
+        """
+        Queue a launch for `course_run`, which calls `func` once it is admitted,
+        or `on_timeout` if it is dropped from the queue after `queue_timeout` seconds.
+
+        Raise LaunchQueueFullError if the queue is full.
+        """
+        expired = []
+        try:
+            with self._lock:
+                # Launches that waited for too long don't take up room in the queue.
+                self._sweep(time.time(), expired)
+                if len(self._tickets) >= self.max_queue:
+                    raise LaunchQueueFullError("The launch queue is full.")
+                ticket = Ticket(ticket_id, course_run, func, on_timeout)
+                self._tickets[ticket_id] = ticket
+                if course_run not in self._queues:
+                    self._queues[course_run] = deque()
+                self._queues[course_run].append(ticket)
+        finally:
+            self._drop(expired)
+        self._dispatch()
+
+    def _sweep(self, now, expired):
+        """
+        Remove the tickets that waited for too long from the queue, and add them to `expired`.
+        The caller must hold the lock.
+        """
+        for course_run in list(self._queues):
+            queue = self._queues[course_run]
+            while queue and now - queue[0].enqueued_at > self.queue_timeout:
+                expired.append(self._remove(queue.popleft()))
+            if not queue:
+                del self._queues[course_run]
+
+    @staticmethod
+    def _drop(expired):
+        """
+        Report the `expired` tickets as timed out. The caller must not hold the lock.
+        """
+        for ticket in expired:
+            log.warning("Dropping launch %s, which waited in the queue for too long.", ticket.ticket_id)
+            if ticket.on_timeout is not None:
+                ticket.on_timeout()
+
+    def _next_ticket(self):
+        """
+        Remove the next ticket that may be started from the queue, and return it along with None;
+        or return None along with the number of seconds after which the rate limits allow another launch
+        (None if starting a launch depends on a running launch finishing). The caller must hold the lock.
+        """
+        if self._running >= self.global_concurrency:
+            return None, None
+        wait = None
+        for course_run in list(self._queues):
+            queue = self._queues[course_run]
+            if not self._has_capacity(course_run):
+                continue
+            rate_wait = self._rate_wait(course_run)
+            if rate_wait:
+                wait = rate_wait if wait is None else min(wait, rate_wait)
+                continue
+            ticket = self._remove(queue.popleft())
+            # The course run had its turn; the others go first next time.
+            if queue:
+                self._queues.move_to_end(course_run)
+            else:
+                del self._queues[course_run]
+            return ticket, None
+        return None, wait
+
+    def _remove(self, ticket):
+        """
+        Forget `ticket`, and return it. The caller must hold the lock.
+        """
+        del self._tickets[ticket.ticket_id]
+        return ticket
+
+    def _dispatch(self):
+        """
+        Start as many queued launches as the limits allow, in turns across course runs.
+        """
+        started = []
+        expired = []
+        with self._lock:
+            self._sweep(time.time(), expired)
+            while True:
+                ticket, wait = self._next_ticket()
+                if ticket is None:
+                    break
+                self._start(ticket.course_run)
+                started.append(ticket)
+            if wait is not None and self._timer is None:
+                # Only the rate limits hold the queue back; check again once they allow another launch.
+                self._timer = threading.Timer(wait, self._wake_up)
+                self._timer.daemon = True
+                self._timer.start()
+
+        for ticket in started:
+            self._executor.submit(self.run_admitted, ticket.course_run, ticket.func)
+        self._drop(expired)
+
+    def _wake_up(self):
+        """
+        Start queued launches after waiting for the rate limits.
+        """
+        with self._lock:
+            self._timer = None
+        self._dispatch()
+
+    def position(self, ticket_id):
+        """
+        Return the position of the queued launch `ticket_id` (1 for the next launch to start),
+        and an estimate of the number of seconds until it starts; or None if it is not queued (anymore).
+
+        Launches that waited for too long are dropped first, even if no launch started or finished meanwhile.
+        """
+        expired = []
+        try:
+            with self._lock:
+                self._sweep(time.time(), expired)
+                return self._position(ticket_id)
+        finally:
+            self._drop(expired)
+
+    def _position(self, ticket_id):
+        """
+        Return the position of the queued launch `ticket_id` and the estimated wait, or None if it is not queued.
+        The caller must hold the lock.
+        """
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None:
+            return None
+        index = self._queues[ticket.course_run].index(ticket)
+        position = index + 1
+        seen_own_course = False
+        for course_run, queue in self._queues.items():
+            if course_run == ticket.course_run:
+                seen_own_course = True
+                continue
+            # Course runs ahead in the rotation get one more turn before this one.
+            position += min(len(queue), index if seen_own_course else index + 1)
+        return position, self._estimate_wait(position, index + 1)
+
+    def _estimate_wait(self, position, course_position):
+        """
+        Return the estimated number of seconds until the launch at `position` in the queue
+        (and at `course_position` among the launches of its course run) starts. The caller must hold the lock.
+        """
+        interval = self.service_time / self.global_concurrency
+        if self.global_rate:
+            interval = max(interval, 1.0 / self.global_rate)
+        course_interval = 0
+        if self.course_concurrency is not None:
+            course_interval = self.service_time / self.course_concurrency
+        if self.course_rate:
+            course_interval = max(course_interval, 1.0 / self.course_rate)
+        return int(math.ceil(max(position * interval, course_position * course_interval)))
+
+    def queue_length(self):
+        """
+        Return the number of queued launches.
+        """
+        return len(self._tickets)
+
+
+# Functions #########################################################
+
+def get_admission_controller(xblock_settings):
+    """
+    Return the process-wide admission controller configured by the "admission_control" entry of `xblock_settings`,
+    or None if admission control is disabled.
+
+    Supported options are "enabled", "global_concurrency", "course_concurrency", "global_rate", "course_rate"
+    (in launches per second), "max_queue" and "queue_timeout" (in seconds).
+    """
+    admission_configuration = xblock_settings.get("admission_control", {})
+    if not admission_configuration.get("enabled", False):
+        return None
+    key = tuple(sorted(admission_configuration.items()))
+    controller = _controllers.get(key)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(key)
+            if controller is None:
+                controller = AdmissionController(
+                    global_concurrency=admission_configuration.get("global_concurrency", DEFAULT_GLOBAL_CONCURRENCY),
+                    course_concurrency=admission_configuration.get("course_concurrency"),
+                    global_rate=admission_configuration.get("global_rate"),
+                    course_rate=admission_configuration.get("course_rate"),
+                    max_queue=admission_configuration.get("max_queue", DEFAULT_MAX_QUEUE),
+                    queue_timeout=admission_configuration.get("queue_timeout", DEFAULT_QUEUE_TIMEOUT),
+                )
+                _controllers[key] = controller
+    return controller
@@ -0,0 +1,240 @@
+"""
+asyncio client for the Boomi Listener endpoints, for services and batch tools running an event loop.
+
+The XBlock itself uses the synchronous BoomiClient (see boomi.py). AsyncBoomiClient speaks the same protocol
+(idempotency keys, retries of transient errors with exponential backoff, the same exceptions), and adds
+`launch_many`, which provisions environments for many learners concurrently and yields each result as soon as
+it is known::
+
+    async with AsyncBoomiClient.from_configuration(configuration) as client:
+        async for result in client.launch_many(configuration.endpoints[0], roster, concurrency=20):
+            print(result["email"], result["status"])
+
+Requests go through an httpx connection pool if httpx is installed (`pip install httpx`). Otherwise, they are
+sent by the synchronous client from a pool of threads, which works everywhere but costs a thread per request
+in flight.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .boomi import (IDEMPOTENCY_KEY_HEADER, BoomiClient, RetryPolicy,
+                    decode_response, get_sharing_portal_url, launch_payload,
+                    make_idempotency_key)
+from .config import (DEFAULT_CONNECT_TIMEOUT, DEFAULT_MAX_RETRIES,
+                     DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE,
+                     DEFAULT_READ_TIMEOUT, DEFAULT_RETRY_BACKOFF)
+from .exceptions import (BoomiLaunchError, BoomiMalformedResponseError,
+                         BoomiTimeoutError, BoomiUnavailableError)
+from .provision import STATUS_ERROR, STATUS_OK
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 10
+
+TRANSPORT_HTTPX = "httpx"
+TRANSPORT_THREADS = "threads"
+
+# Classes ###########################################################
+
+
+class AsyncBoomiClient(object):
+    """
+    Pooled keep-alive asyncio client for posting JSON payloads to Boomi.
+
+    `transport` is "httpx", "threads", or None to use httpx if it is installed. Close the client with `aclose`,
+    or use it as an async context manager.
+    """
+
+    def __init__(
+            self,
+            connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+            read_timeout=DEFAULT_READ_TIMEOUT,
+            pool_connections=DEFAULT_POOL_CONNECTIONS,
+            pool_maxsize=DEFAULT_POOL_MAXSIZE,
+            max_retries=DEFAULT_MAX_RETRIES,
+            retry_backoff=DEFAULT_RETRY_BACKOFF,
+            transport=None,
+    ):  # pylint: disable=too-many-arguments
+        if transport is None:
+            transport = TRANSPORT_HTTPX if httpx is not None else TRANSPORT_THREADS
+        if transport == TRANSPORT_HTTPX and httpx is None:
+            raise ImportError("The httpx transport needs httpx; install it with `pip install httpx`.")
+        self.transport = transport
+        self.retry_policy = RetryPolicy(max_retries, retry_backoff)
+        if transport == TRANSPORT_HTTPX:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            )
+        else:
+            # The synchronous client retries by itself.
+            self._client = BoomiClient(
+                connect_timeout, read_timeout, pool_connections, pool_maxsize, max_retries, retry_backoff
+            )
+            self._executor = ThreadPoolExecutor(max_workers=pool_maxsize)
+
+    @classmethod
+    def from_configuration(cls, configuration, transport=None):
+        """
+        Return a new client with the client options of the compiled BoomiConfiguration `configuration`.
+        """
+        return cls(transport=transport, **dict(configuration.client_options))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Close the connections of the client.
+        """
+        if self.transport == TRANSPORT_HTTPX:
+            await self._client.aclose()
+        else:
+            self._executor.shutdown(wait=False)
+            self._client.session.close()
+
+    async def post(self, url, payload, idempotency_key=None, headers=None):
+        """
+        POST `payload` as JSON to `url` and return the response.
+
+        Connection errors, timeouts and transient gateway errors are retried like BoomiClient.post does.
+        Raise BoomiTimeoutError or BoomiUnavailableError if the last attempt still fails.
+        """
+        idempotency_key = idempotency_key or make_idempotency_key()
+        if self.transport == TRANSPORT_THREADS:
+            return await get_running_loop().run_in_executor(
+                self._executor, lambda: self._client.post(url, payload, idempotency_key, headers)
+            )
+
+        request_headers = {"Accept": "application/json"}
+        request_headers.update(headers or {})
+        request_headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._client.post(url, json=payload, headers=request_headers)
+            except httpx.TimeoutException as exc:
+                error = BoomiTimeoutError("Boomi did not respond in time: {}".format(exc))
+            except httpx.TransportError as exc:
+                error = BoomiUnavailableError("Unable to connect to Boomi: {}".format(exc))
+            else:
+                error = self.retry_policy.response_error(response.status_code)
+                if error is None:
+                    return response
+
+            delay = self.retry_policy.retry_delay(attempt, error, idempotency_key)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def launch(self, endpoint, email, course_name, course_run):
+        """
+        Ask the BoomiEndpoint `endpoint` to launch the environment of a learner for a course run,
+        and return the resulting sharing portal URL.
+
+        Raise BoomiUnavailableError, BoomiMalformedResponseError or BoomiLaunchError if the launch fails.
+        """
+        response = await self.post(
+            endpoint.url, launch_payload(email, course_name, course_run), headers=endpoint.headers
+        )
+        return get_sharing_portal_url(decode_response(response))
+
+    async def _launch_result(self, endpoint, email, course_name, course_run):
+        """
+        Launch the environment of a learner for a course run, and return the result.
+        """
+        result = {"email": email, "course_name": course_name, "course_run": course_run}
+        started = time.time()
+        try:
+            sharing_portal_url = await self.launch(endpoint, email, course_name, course_run)
+        except (BoomiUnavailableError, BoomiMalformedResponseError, BoomiLaunchError) as exc:
+            result.update(status=STATUS_ERROR, error=str(exc))
+        else:
+            result.update(status=STATUS_OK, sharing_portal_url=sharing_portal_url)
+        result["latency"] = time.time() - started
+        return result
+
+    def launch_many(self, endpoint, launches, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Launch the environments of the (email, course_name, course_run) tuples `launches` through the
+        BoomiEndpoint `endpoint`, at most `concurrency` at a time, and return an async iterator
+        over the result of each launch, in the order in which the launches complete.
+
+        Results are dicts with "email", "course_name", "course_run", "status" ("ok" or "error"), "latency",
+        and either "sharing_portal_url" or "error", like the results of `skytap-provision`. Failed launches
+        do not stop the others. `launches` is consumed as launches complete, so it can be a long generator.
+        Callers that stop iterating early should `aclose` the iterator to cancel the launches in flight.
+        """
+        return LaunchResults(functools.partial(self._launch_result, endpoint), launches, concurrency)
+
+
+class LaunchResults(object):
+    """
+    Async iterator over the results of AsyncBoomiClient.launch_many, in the order in which the launches complete.
+
+    This is an iterator class rather than an async generator, which Python 3.5 does not support.
+    """
+
+    def __init__(self, launch_result, launches, concurrency):
+        self._launch_result = launch_result
+        self._launches = iter(launches)
+        self._concurrency = concurrency
+        self._pending = set()
+        self._done = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._done:
+            # Bounding the launches in flight also bounds the memory used for large rosters.
+            for launch in self._launches:
+                self._pending.add(asyncio.ensure_future(self._launch_result(*launch)))
+                if len(self._pending) >= self._concurrency:
+                    break
+            if not self._pending:
+                raise StopAsyncIteration
+            done, self._pending = await asyncio.wait(self._pending, return_when=asyncio.FIRST_COMPLETED)
+            self._done.extend(done)
+        return self._done.pop().result()
+
+    async def aclose(self):
+        """
+        Cancel the launches in flight.
+        """
+        for task in self._pending:
+            task.cancel()
+        self._pending = set()
+        self._done = []
+
+
+# Functions #########################################################
+
+def get_running_loop():
+    """
+    Return the event loop running the current coroutine.
+
+    asyncio.get_running_loop only exists from Python 3.7; before, asyncio.get_event_loop returns the running loop
+    when it is called from a coroutine.
+    """
+    if hasattr(asyncio, "get_running_loop"):
+        return asyncio.get_running_loop()
+    return asyncio.get_event_loop()
@@ -0,0 +1,207 @@
+"""
+Bundled, fingerprinted static assets of the Skytap XBlock.
+
+The build step minifies the block's CSS and JavaScript sources, bundles each of them into a single file
+whose name contains a hash of its content (e.g. `public/dist/skytap.3f2a9c1b7d4e.js`), and records the bundles
+in `public/dist/manifest.json`. Since the content of a bundle never changes without its name changing,
+the bundles can be served with `Cache-Control: public, max-age=31536000, immutable`.
+
+Rebuild the bundles whenever the sources change (the unit tests check that they are up to date)::
+
+    python -m xblock_skytap.assets
+    python -m xblock_skytap.assets --check
+
+The minifiers are deliberately conservative: they remove comments, indentation and blank lines,
+and whitespace around CSS punctuation, but keep the line breaks of JavaScript sources, so automatic
+semicolon insertion keeps working. Trailing `//` comments after code are kept, as are template literals,
+which the sources don't use.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+
+import pkg_resources
+
+# Globals ###########################################################
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Sources of each bundle, relative to the package, in the order they are bundled.
+CSS_SOURCES = ("public/css/skytap.css",)
+JS_SOURCES = ("public/js/src/skytap.js",)
+
+DIST_DIR = "public/dist"
+MANIFEST_PATH = DIST_DIR + "/manifest.json"
+BUNDLE_NAME = "skytap"
+HASH_LENGTH = 12
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_WHITESPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{};,])\s*")
+CSS_COLON = re.compile(r":\s+")
+
+_manifest = {}
+_manifest_lock = threading.Lock()
+_contents = {}
+
+# Functions #########################################################
+
+def minify_css(source):
+    """
+    Return `source` without comments and unnecessary whitespace.
+    """
+    css = CSS_COMMENT.sub("", source)
+    css = CSS_WHITESPACE.sub(" ", css)
+    css = CSS_PUNCTUATION.sub(r"\1", css)
+    # Only after colons: a space before a colon separates a selector from a pseudo-class.
+    css = CSS_COLON.sub(":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_js(source):
+    """
+    Return `source` without comment lines, block comments starting a line, indentation and blank lines.
+    """
+    lines = []
+    in_comment = False
+    for line in source.splitlines():
+        line = line.strip()
+        if in_comment:
+            in_comment = "*/" not in line
+            continue
+        if line.startswith("/*"):
+            in_comment = "*/" not in line[2:]
+            continue
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def bundle(root, sources, minify, separator):
+    """
+    Return the minified contents of the `sources` (paths relative to `root`), joined by `separator`.
+    """
+    contents = []
+    for source in sources:
+        with open(os.path.join(root, source)) as source_file:
+            contents.append(minify(source_file.read()))
+    return separator.join(contents)
+
+
+def build_bundles(root=PACKAGE_DIR):
+    """
+    Return the manifest of the bundles of the sources under `root`, and the content of each bundle by path.
+    """
+    manifest = {}
+    contents = {}
+    for kind, sources, minify, separator in (
+            ("css", CSS_SOURCES, minify_css, "\n"),
+            # Guard against sources that don't end with a semicolon.
+            ("js", JS_SOURCES, minify_js, ";\n"),
+    ):
+        content = bundle(root, sources, minify, separator)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+        path = "{dist}/{name}.{digest}.{kind}".format(dist=DIST_DIR, name=BUNDLE_NAME, digest=digest, kind=kind)
+        manifest[kind] = path
+        contents[path] = content
+    return manifest, contents
+
+
+def build(root=PACKAGE_DIR):
+    """
+    Write the bundles of the sources under `root` and their manifest, remove outdated bundles,
+    and return the manifest.
+    """
+    manifest, contents = build_bundles(root)
+    dist = os.path.join(root, DIST_DIR)
+    if not os.path.isdir(dist):
+        os.makedirs(dist)
+    for path in glob.glob(os.path.join(dist, BUNDLE_NAME + ".*")):
+        if os.path.relpath(path, root).replace(os.sep, "/") not in contents:
+            os.remove(path)
+    for path, content in contents.items():
+        with open(os.path.join(root, path), "w") as bundle_file:
+            bundle_file.write(content)
+    with open(os.path.join(root, MANIFEST_PATH), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4, sort_keys=True)
+        manifest_file.write("\n")
+    return manifest
+
+
+def check(root=PACKAGE_DIR):
+    """
+    Return True if the bundles and manifest under `root` are up to date with the sources.
+    """
+    manifest, contents = build_bundles(root)
+    try:
+        with open(os.path.join(root, MANIFEST_PATH)) as manifest_file:
+            if json.load(manifest_file) != manifest:
+                return False
+        for path, content in contents.items():
+            with open(os.path.join(root, path)) as bundle_file:
+                if bundle_file.read() != content:
+                    return False
+    except (IOError, ValueError):
+        return False
+    return True
+
+
+def get_manifest(module_name=__name__):
+    """
+    Return the manifest of the bundles shipped with the package, mapping "css" and "js" to the paths of the bundles,
+    or None if the bundles were not built. The manifest is only loaded once per process.
+    """
+    if module_name not in _manifest:
+        with _manifest_lock:
+            if module_name not in _manifest:
+                try:
+                    manifest = json.loads(pkg_resources.resource_string(module_name, MANIFEST_PATH).decode("utf-8"))
+                except (IOError, OSError, ValueError):
+                    manifest = None
+                _manifest[module_name] = manifest
+    return _manifest[module_name]
+
+
+def get_content(path, module_name=__name__):
+    """
+    Return the content of the asset at `path`, e.g. to inline it. Assets are only read once per process.
+    """
+    key = (module_name, path)
+    content = _contents.get(key)
+    if content is None:
+        content = pkg_resources.resource_string(module_name, path).decode("utf-8")
+        _contents[key] = content
+    return content
+
+
+def main(argv=None):
+    """
+    Build the bundles, or check that they are up to date. Return the exit status.
+    """
+    parser = argparse.ArgumentParser(description="Build the bundled, fingerprinted assets of the Skytap XBlock.")
+    parser.add_argument("--check", action="store_true", help="only check that the bundles are up to date")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if check():
+            print("The bundles are up to date.")
+            return 0
+        print("The bundles are outdated; run `python -m xblock_skytap.assets`.")
+        return 1
+    for kind, path in sorted(build().items()):
+        print("{kind}: {path}".format(kind=kind, path=path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Asynchronous audit log of launches.
+
+Every launch produces a structured audit event (learner, course run, Boomi endpoint, latency, outcome and error).
+Events go through a bounded in-memory queue to a background thread, which writes them to a sink in batches,
+so handlers never wait for log I/O. When the queue is full, e.g. because the sink is slow, new events are dropped
+(and counted) rather than slowing down launches.
+
+Sinks provide a `write(events)` method taking a list of event dicts. Besides the built-in sinks
+(JSON lines appended to a file, or records of the "xblock_skytap.audit" logger), custom sinks can be configured
+by the dotted path of their class.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import atexit
+import importlib
+import json
+import logging
+import queue
+import threading
+import time
+
+from .metrics import DEFAULT_PREFIX
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Seconds the worker waits for queued events to be written when it exits; a hung sink must not hang the shutdown.
+EXIT_FLUSH_TIMEOUT = 5
+
+# Longer error messages (e.g. non-JSON Boomi responses) are truncated to this many characters.
+MAX_ERROR_LENGTH = 500
+
+_audit_logs = {}
+_audit_logs_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class JsonLinesSink(object):
+    """
+    Append events as JSON lines to the file at `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, events):
+        """
+        Append `events` to the file, in a single write.
+        """
+        lines = "".join(json.dumps(event, sort_keys=True) + "\n" for event in events)
+        with open(self.path, "a") as audit_file:
+            audit_file.write(lines)
+
+
+class LoggingSink(object):
+    """
+    Log events as JSON with the logger `logger_name`, so they end up wherever the LMS sends its logs.
+    """
+
+    def __init__(self, logger_name="xblock_skytap.audit"):
+        self.logger = logging.getLogger(logger_name)
+
+    def write(self, events):
+        """
+        Log each of `events`.
+        """
+        for event in events:
+            self.logger.info(json.dumps(event, sort_keys=True))
+
+
+class AuditLog(object):
+    """
+    Bounded queue of audit events, written to `sink` in batches by a background thread.
+
+    At most `max_queue` events wait to be written; batches hold up to `batch_size` events,
+    and events wait at most `flush_interval` seconds for a batch to fill up.
+    """
+
+    def __init__(self, sink, max_queue=DEFAULT_MAX_QUEUE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, thread_name="skytap-audit-log"):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=thread_name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def emit(self, event):
+        """
+        Queue `event` to be written, without waiting. Return False if the queue was full and the event was dropped.
+        """
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.emitted += 1
+        return True
+
+    def _next_batch(self):
+        """
+        Wait for the next event, and return it along with the events that follow within the flush interval.
+        """
+        batch = [self._queue.get()]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """
+        Write batches of events to the sink, forever.
+        """
+        while True:
+            batch = self._next_batch()
+            try:
+                self.sink.write(batch)
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Unable to write %d events with %r.", len(batch), self.sink)
+                with self._lock:
+                    self.failed += len(batch)
+            else:
+                with self._lock:
+                    self.written += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued events have been written (or failed to be written), for at most `timeout` seconds
+        if given. Return False if events were still waiting at the timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        """
+        Return the number of events emitted, dropped because the queue was full, written, failed to be written,
+        and waiting in the queue.
+        """
+        with self._lock:
+            return {
+                "emitted": self.emitted,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "queued": self._queue.qsize(),
+            }
+
+    def render_prometheus(self, prefix=DEFAULT_PREFIX):
+        """
+        Return the event counters in the Prometheus text exposition format.
+        """
+        stats = self.stats()
+        queued = stats.pop("queued")
+        lines = [
+            '{prefix}_audit_events_total{{state="{state}"}} {value}'.format(prefix=prefix, state=state, value=value)
+            for state, value in sorted(stats.items())
+        ]
+        lines.append("{prefix}_audit_events_queued {value}".format(prefix=prefix, value=queued))
+        return "\n".join(lines) + "\n"
+
+
+# Functions #########################################################
+
+def truncate(text, max_length=MAX_ERROR_LENGTH):
+    """
+    Return `text` (a string or bytes), decoded and truncated to `max_length` characters.
+    """
+    if text is None:
+        return None
+    if isinstance(text, bytes):
+        text = text[:max_length * 4].decode("utf-8", "replace")
+    if len(text) <= max_length:
+        return text
+    return text[:max_length] + "... ({} characters truncated)".format(len(text) - max_length)
+
+
+def create_sink(sink_path, sink_options):
+    """
+    Return a new sink: "jsonl" (which needs a "path" option), "logging", or the dotted path of a custom sink class,
+    instantiated with the keyword arguments `sink_options`.
+    """
+    if sink_path == "jsonl":
+        sink_class = JsonLinesSink
+    elif sink_path == "logging":
+        sink_class = LoggingSink
+    else:
+        module_name, class_name = sink_path.rsplit(".", 1)
+        sink_class = getattr(importlib.import_module(module_name), class_name)
+    return sink_class(**sink_options)
+
+
+def get_audit_log(xblock_settings):
+    """
+    Return the process-wide audit log configured by the "audit_log" entry of `xblock_settings`,
+    or None if it is disabled (the default).
+
+    Supported options are "enabled", "sink" ("logging", "jsonl", or the dotted path of a sink class),
+    "sink_options" (keyword arguments for the sink), "max_queue", "batch_size" and "flush_interval" (in seconds).
+    """
+    audit_configuration = xblock_settings.get("audit_log", {})
+    if not audit_configuration.get("enabled", False):
+        return None
+    sink_path = audit_configuration.get("sink", "logging")
+    sink_options = audit_configuration.get("sink_options", {})
+    key = (
+        sink_path,
+        tuple(sorted(sink_options.items())),
+        audit_configuration.get("max_queue", DEFAULT_MAX_QUEUE),
+        audit_configuration.get("batch_size", DEFAULT_BATCH_SIZE),
+        audit_configuration.get("flush_interval", DEFAULT_FLUSH_INTERVAL),
+    )
+    audit_log = _audit_logs.get(key)
+    if audit_log is None:
+        with _audit_logs_lock:
+            audit_log = _audit_logs.get(key)
+            if audit_log is None:
+                audit_log = AuditLog(create_sink(sink_path, sink_options), *key[2:])
+                # Give queued events a chance to be written when the worker exits.
+                atexit.register(audit_log.flush, EXIT_FLUSH_TIMEOUT)
+                _audit_logs[key] = audit_log
+    return audit_log
@@ -0,0 +1,242 @@
+"""
+HTTP client for the Boomi Listener endpoints used by the Skytap XBlock.
+
+A single client (and thus a single pool of keep-alive connections) is shared by all
+Skytap XBlock instances living in the same process, so consecutive launches do not
+need to go through a fresh TCP and TLS handshake.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (DEFAULT_CONNECT_TIMEOUT, DEFAULT_MAX_RETRIES,
+                     DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE,
+                     DEFAULT_READ_TIMEOUT, DEFAULT_RETRY_BACKOFF)
+from .exceptions import (BoomiLaunchError, BoomiMalformedResponseError,
+                         BoomiTimeoutError, BoomiUnavailableError,
+                         DeadlineExceededError)
+from .utils import time_left
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+# Boomi answers with one of these while an atom is restarting or overloaded;
+# the request did not get processed, so it is safe to send it again.
+RETRY_STATUS_CODES = frozenset((502, 503, 504))
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class RetryPolicy(object):
+    """
+    Retries of failed Boomi requests, shared by BoomiClient and AsyncBoomiClient.
+
+    A request is retried at most `max_retries` times, with exponential backoff starting at `retry_backoff` seconds.
+    """
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, retry_backoff=DEFAULT_RETRY_BACKOFF):
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    @staticmethod
+    def response_error(status_code):
+        """
+        Return the BoomiUnavailableError of a response with a transient gateway error `status_code`, or None.
+        """
+        if status_code not in RETRY_STATUS_CODES:
+            return None
+        return BoomiUnavailableError("Boomi responded with HTTP {status_code}.".format(status_code=status_code))
+
+    def retry_delay(self, attempt, error, idempotency_key, deadline=None):
+        """
+        Return the number of seconds to wait before retrying the request `idempotency_key`,
+        whose attempt number `attempt` (0 for the first one) failed with `error`.
+
+        Raise `error` if the request must not be retried: it used up its retries,
+        or the `deadline` (in seconds since the epoch) would pass before the retry.
+        """
+        if attempt >= self.max_retries:
+            raise error
+        delay = self.retry_backoff * (2 ** attempt)
+        if deadline is not None and time.time() + delay >= deadline:
+            # Nobody would wait for the retry.
+            raise error
+        log.warning(
+            "Boomi request %s failed (%s), retrying in %.2fs (attempt %d of %d).",
+            idempotency_key, error, delay, attempt + 1, self.max_retries
+        )
+        return delay
+
+
+class BoomiClient(object):
+    """
+    Pooled keep-alive client for posting JSON payloads to Boomi.
+
+    Every request is sent with an idempotency key. The same key is reused when a request
+    is retried, which allows Boomi to recognize the retry and avoid provisioning twice.
+    """
+
+    def __init__(
+            self,
+            connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+            read_timeout=DEFAULT_READ_TIMEOUT,
+            pool_connections=DEFAULT_POOL_CONNECTIONS,
+            pool_maxsize=DEFAULT_POOL_MAXSIZE,
+            max_retries=DEFAULT_MAX_RETRIES,
+            retry_backoff=DEFAULT_RETRY_BACKOFF,
+    ):  # pylint: disable=too-many-arguments
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_policy = RetryPolicy(max_retries, retry_backoff)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url, payload, idempotency_key=None, headers=None, read_timeout=None, deadline=None):
+        """
+        POST `payload` as JSON to `url` and return the response.
+
+        Connection errors, timeouts and transient gateway errors are retried according to the RetryPolicy
+        of the client. Raise BoomiTimeoutError or BoomiUnavailableError if the last attempt still fails.
+
+        `read_timeout` overrides the read timeout of the client. If a `deadline` (in seconds since the epoch)
+        is given, the timeouts of every attempt are capped by the time left, and no attempt starts after it.
+        DeadlineExceededError is only raised if the deadline passed before the first attempt; an attempt that
+        times out at the deadline raises BoomiTimeoutError, since Boomi did not answer within the time it had.
+        """
+        request_headers = {"Accept": "application/json"}
+        request_headers.update(headers or {})
+        request_headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key or make_idempotency_key()
+
+        attempt = 0
+        while True:
+            timeout = self.get_timeout(read_timeout, deadline)
+            try:
+                response = self.session.post(url, json=payload, headers=request_headers, timeout=timeout)
+            except requests.exceptions.Timeout as exc:
+                error = BoomiTimeoutError("Boomi did not respond in time: {}".format(exc))
+            except requests.exceptions.ConnectionError as exc:
+                error = BoomiUnavailableError("Unable to connect to Boomi: {}".format(exc))
+            else:
+                error = self.retry_policy.response_error(response.status_code)
+                if error is None:
+                    return response
+
+            delay = self.retry_policy.retry_delay(attempt, error, request_headers[IDEMPOTENCY_KEY_HEADER], deadline)
+            attempt += 1
+            time.sleep(delay)
+
+    def get_timeout(self, read_timeout=None, deadline=None):
+        """
+        Return the (connect, read) timeouts of the next attempt, capped by the time left until `deadline`.
+
+        Raise DeadlineExceededError if the deadline has passed.
+        """
+        connect_timeout, default_read_timeout = self.timeout
+        read_timeout = default_read_timeout if read_timeout is None else read_timeout
+        left = time_left(deadline)
+        if left is None:
+            return connect_timeout, read_timeout
+        if not left:
+            raise DeadlineExceededError("The launch deadline passed before the request was sent.")
+        return min(connect_timeout, left), min(read_timeout, left)
+
+
+# Functions #########################################################
+
+def get_boomi_client(configuration):
+    """
+    Return the process-wide client for the client options of the compiled BoomiConfiguration `configuration`.
+
+    Clients are shared between threads; a new one is only created when the options change.
+    """
+    key = configuration.client_options
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = BoomiClient(**dict(key))
+                _clients[key] = client
+    return client
+
+
+def make_idempotency_key():
+    """
+    Return a new random key identifying a single logical Boomi request.
+    """
+    return uuid.uuid4().hex
+
+
+def launch_payload(email, course_name, course_run, template=None):
+    """
+    Return the payload that asks Boomi to launch the environment of a learner for a course run.
+
+    `template` names the environment template to launch, for blocks that launch several environments;
+    Boomi picks the environment of the course run otherwise.
+    """
+    payload = {
+        "email": email,
+        "course_name": course_name,
+        "course_run": course_run,
+    }
+    if template is not None:
+        payload["template"] = template
+    return payload
+
+
+def decode_response(response):
+    """
+    Return the decoded JSON content of a Boomi `response`.
+
+    Raise BoomiMalformedResponseError if the content is not valid JSON.
+    """
+    try:
+        return response.json()
+    except ValueError:
+        # Raised by the JSON decoders of both requests (json or simplejson) and httpx.
+        raise BoomiMalformedResponseError("The Boomi endpoint returned a non-JSON response.", response.content)
+
+
+def raise_for_boomi_error(response_json):
+    """
+    Raise BoomiLaunchError if the decoded Boomi response reports an error.
+
+    Raise BoomiMalformedResponseError if the response does not say whether there was an error.
+    """
+    error_exists = response_json.get("ErrorExists") if isinstance(response_json, dict) else None
+    if not isinstance(error_exists, str):
+        raise BoomiMalformedResponseError("The Boomi response lacks ErrorExists.", repr(response_json))
+    # Note that Boomi does not support Boolean values in JSON responses,
+    # so the check needs to compare string values.
+    if error_exists.lower() == "true":
+        raise BoomiLaunchError(response_json.get("ErrorMessage") or "Boomi reported an unknown error.")
+
+
+def get_sharing_portal_url(response_json):
+    """
+    Return the sharing portal URL from a decoded Boomi response.
+
+    Raise BoomiLaunchError if Boomi reported an error,
+    and BoomiMalformedResponseError if the response lacks the sharing portal URL.
+    """
+    raise_for_boomi_error(response_json)
+    sharing_portal_url = response_json.get("SkytapURL")
+    if not sharing_portal_url or not isinstance(sharing_portal_url, str):
+        raise BoomiMalformedResponseError("The Boomi response lacks SkytapURL.", repr(response_json))
+    return sharing_portal_url
@@ -0,0 +1,191 @@
+"""
+Circuit breaker for the Boomi endpoint.
+
+When Boomi is degraded, waiting for every launch to fail only adds load (learners click again).
+The circuit breaker tracks the error rate and latency of recent Boomi calls; once they exceed the
+configured thresholds, the circuit opens and launches fail fast for a while. After that, a single
+probe request is let through (half-open state): if it succeeds, the circuit closes again,
+otherwise it stays open for another period.
+
+State is kept in a cache, so workers sharing a Django cache also share the state of the circuit.
+Updates are not atomic across workers, which is acceptable for the coarse counts used here.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+from .cache import create_cache
+
+# Globals ###########################################################
+
+DEFAULT_ERROR_RATE_THRESHOLD = 0.5
+DEFAULT_LATENCY_THRESHOLD = None
+DEFAULT_MIN_REQUESTS = 10
+DEFAULT_WINDOW = 60
+DEFAULT_OPEN_DURATION = 30
+DEFAULT_PROBE_TIMEOUT = 60
+
+# The circuit breaker sets explicit timeouts for all entries; this is only used by the cache itself.
+BREAKER_CACHE_TTL = 3600
+BREAKER_CACHE_MAX_SIZE = 100
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker whose state is kept in `cache`.
+
+    A call counts as failed if it raised a transport error, or took longer than `latency_threshold` seconds.
+    The circuit opens if at least `min_requests` calls were made in the current window of `window` seconds,
+    and the share of failed calls reached `error_rate_threshold`.
+    """
+
+    def __init__(
+            self,
+            cache,
+            name="boomi",
+            error_rate_threshold=DEFAULT_ERROR_RATE_THRESHOLD,
+            latency_threshold=DEFAULT_LATENCY_THRESHOLD,
+            min_requests=DEFAULT_MIN_REQUESTS,
+            window=DEFAULT_WINDOW,
+            open_duration=DEFAULT_OPEN_DURATION,
+            probe_timeout=DEFAULT_PROBE_TIMEOUT,
+    ):  # pylint: disable=too-many-arguments
+        self.cache = cache
+        self.state_key = "circuit:{name}:state".format(name=name)
+        self.probe_key = "circuit:{name}:probe".format(name=name)
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.min_requests = min_requests
+        self.window = window
+        self.open_duration = open_duration
+        self.probe_timeout = probe_timeout
+
+    def _get_state(self, now):
+        """
+        Return the current state, starting a new window if the current one is over.
+        """
+        state = self.cache.get(self.state_key)
+        if state is None or (state["opened_at"] is None and now - state["window_start"] >= self.window):
+            state = {"opened_at": None, "window_start": now, "requests": 0, "failures": 0}
+        return state
+
+    def _set_state(self, state):
+        """
+        Store `state`, keeping it at least as long as the window or the open period lasts.
+        """
+        self.cache.set(self.state_key, state, max(self.window, self.open_duration) * 2)
+
+    def retry_after(self):
+        """
+        Return None if a call may be made now, or the number of seconds after which to retry otherwise.
+
+        Once the circuit has been open for `open_duration` seconds, a single caller is allowed to probe Boomi.
+        """
+        now = time.time()
+        state = self.cache.get(self.state_key)
+        if state is None or state["opened_at"] is None:
+            return None
+        remaining = state["opened_at"] + self.open_duration - now
+        if remaining > 0:
+            return int(remaining) + 1
+        if self.cache.add(self.probe_key, now, self.probe_timeout):
+            return None
+        # Somebody else is probing; check back shortly.
+        return 1
+
+    def release_probe(self):
+        """
+        Let another caller probe Boomi, after a probe that neither succeeded nor failed.
+        """
+        self.cache.delete(self.probe_key)
+
+    def is_open(self):
+        """
+        Return True if the circuit is open (or half-open).
+        """
+        state = self.cache.get(self.state_key)
+        return state is not None and state["opened_at"] is not None
+
+    def record_success(self, latency):
+        """
+        Record a call that reached Boomi and took `latency` seconds.
+        """
+        if self.latency_threshold is not None and latency > self.latency_threshold:
+            self.record_failure()
+            return
+        now = time.time()
+        state = self._get_state(now)
+        if state["opened_at"] is not None:
+            # The probe succeeded, close the circuit.
+            state = {"opened_at": None, "window_start": now, "requests": 0, "failures": 0}
+            self.cache.delete(self.probe_key)
+        state["requests"] += 1
+        self._set_state(state)
+
+    def record_failure(self):
+        """
+        Record a call that failed, opening the circuit if the thresholds are exceeded.
+        """
+        now = time.time()
+        state = self._get_state(now)
+        if state["opened_at"] is not None:
+            # The probe failed, keep the circuit open for another period.
+            state["opened_at"] = now
+            self.cache.delete(self.probe_key)
+        else:
+            state["requests"] += 1
+            state["failures"] += 1
+            if (state["requests"] >= self.min_requests and
+                    state["failures"] >= self.error_rate_threshold * state["requests"]):
+                state["opened_at"] = now
+        self._set_state(state)
+
+
+# Functions #########################################################
+
+def get_circuit_breaker(xblock_settings):
+    """
+    Return the process-wide circuit breaker configured by the "circuit_breaker" entry of `xblock_settings`,
+    or None if the circuit breaker is disabled.
+
+    Supported options are "enabled", "error_rate_threshold", "latency_threshold" (in seconds),
+    "min_requests", "window", "open_duration" and "probe_timeout" (in seconds), as well as
+    "backend" and "django_cache_alias" (see "launch_cache").
+    """
+    breaker_configuration = xblock_settings.get("circuit_breaker", {})
+    if not breaker_configuration.get("enabled", True):
+        return None
+    key = tuple(sorted(breaker_configuration.items()))
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                cache = create_cache(
+                    breaker_configuration.get("backend", "auto"),
+                    BREAKER_CACHE_TTL,
+                    BREAKER_CACHE_MAX_SIZE,
+                    breaker_configuration.get("django_cache_alias", "default"),
+                )
+                breaker = CircuitBreaker(
+                    cache,
+                    error_rate_threshold=breaker_configuration.get(
+                        "error_rate_threshold", DEFAULT_ERROR_RATE_THRESHOLD
+                    ),
+                    latency_threshold=breaker_configuration.get("latency_threshold", DEFAULT_LATENCY_THRESHOLD),
+                    min_requests=breaker_configuration.get("min_requests", DEFAULT_MIN_REQUESTS),
+                    window=breaker_configuration.get("window", DEFAULT_WINDOW),
+                    open_duration=breaker_configuration.get("open_duration", DEFAULT_OPEN_DURATION),
+                    probe_timeout=breaker_configuration.get("probe_timeout", DEFAULT_PROBE_TIMEOUT),
+                )
+                _breakers[key] = breaker
+    return breaker
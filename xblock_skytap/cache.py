@@ -0,0 +1,269 @@
+"""
+Cache backends for the Skytap XBlock.
+
+The launch cache remembers the sharing portal URL that Boomi returned for a given learner and course run,
+so relaunching the same environment does not require another Boomi round trip.
+Two backends are available: a bounded in-process LRU cache, and a thin wrapper around the Django cache
+that allows sharing entries between workers.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Globals ###########################################################
+
+DEFAULT_LAUNCH_CACHE_TTL = 300
+DEFAULT_LAUNCH_CACHE_MAX_SIZE = 10000
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class InProcessCache(object):
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+
+    The API mirrors the subset of the Django cache API used by the Skytap XBlock.
+    """
+
+    def __init__(self, max_size=DEFAULT_LAUNCH_CACHE_MAX_SIZE, ttl=DEFAULT_LAUNCH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value stored for `key`, or `default` if there is no such entry or it has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        """
+        Store `value` for `key` for `timeout` seconds (defaults to the TTL of the cache),
+        evicting the least recently used entry if the cache is full.
+        """
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        """
+        Store `value` for `key` unless there already is an unexpired entry for `key`.
+        Return True if the value was stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return False
+            self._store(key, value, timeout)
+            return True
+
+    def _store(self, key, value, timeout):
+        """
+        Store `value` for `key`. The caller must hold the lock.
+        """
+        timeout = self.ttl if timeout is None else timeout
+        expires_at = time.time() + timeout if timeout else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Evict the entry stored for `key`, if any.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Evict all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCache(object):
+    """
+    Adapter that stores entries in one of the caches configured in the Django settings.
+
+    Size limits and eviction are handled by the Django cache itself.
+    """
+
+    def __init__(self, alias="default", ttl=DEFAULT_LAUNCH_CACHE_TTL, key_prefix="skytap"):
+        from django.core.cache import caches  # pylint: disable=import-outside-toplevel
+        self._cache = caches[alias]
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    def _make_key(self, key):
+        """
+        Namespace `key` so it does not collide with entries stored by other applications.
+        """
+        return "{prefix}:{key}".format(prefix=self.key_prefix, key=key)
+
+    def get(self, key, default=None):
+        """
+        Return the value stored for `key`, or `default` if there is no such entry.
+        """
+        return self._cache.get(self._make_key(key), default)
+
+    def set(self, key, value, timeout=None):
+        """
+        Store `value` for `key` for `timeout` seconds (defaults to the TTL of the cache).
+        """
+        self._cache.set(self._make_key(key), value, self.ttl if timeout is None else timeout)
+
+    def add(self, key, value, timeout=None):
+        """
+        Atomically store `value` for `key` unless there already is an entry for `key`.
+        Return True if the value was stored.
+        """
+        return self._cache.add(self._make_key(key), value, self.ttl if timeout is None else timeout)
+
+    def delete(self, key):
+        """
+        Evict the entry stored for `key`, if any.
+        """
+        self._cache.delete(self._make_key(key))
+
+    def clear(self):
+        """
+        Evict all entries of the underlying Django cache, including entries that belong to other applications.
+
+        Meant for tests; use `delete` to evict individual entries in production.
+        """
+        self._cache.clear()
+
+
+class NullCache(object):
+    """
+    Cache that never stores anything. Used when the launch cache is disabled; see NULL_CACHE.
+    """
+
+    def get(self, key, default=None):  # pylint: disable=unused-argument
+        """
+        Always return `default`.
+        """
+        return default
+
+    def set(self, key, value, timeout=None):
+        """
+        Discard `value`.
+        """
+
+    def add(self, key, value, timeout=None):  # pylint: disable=unused-argument
+        """
+        Discard `value`, pretending it was stored.
+        """
+        return True
+
+    def delete(self, key):
+        """
+        Nothing to evict.
+        """
+
+    def clear(self):
+        """
+        Nothing to evict.
+        """
+
+
+# Stateless, so a single instance is shared by all blocks.
+NULL_CACHE = NullCache()
+
+# Functions #########################################################
+
+def django_cache_available():
+    """
+    Return True if Django is installed and its settings are configured.
+    """
+    try:
+        from django.conf import settings  # pylint: disable=import-outside-toplevel
+        return bool(settings.configured and getattr(settings, "CACHES", None))
+    except ImportError:
+        return False
+
+
+def launch_cache_shared(xblock_settings):
+    """
+    Return True if the launch cache configured by `xblock_settings` is shared between processes,
+    i.e. if it is a Django cache and the Django settings are configured.
+    """
+    cache_configuration = xblock_settings.get("launch_cache", {})
+    if not cache_configuration.get("enabled", True):
+        return False
+    return cache_configuration.get("backend", "auto") in ("auto", "django") and django_cache_available()
+
+
+def create_cache(backend, ttl, max_size, alias):
+    """
+    Instantiate the cache `backend` ("memory", "django" or "auto").
+    """
+    if backend == "auto":
+        backend = "django" if django_cache_available() else "memory"
+    if backend == "django":
+        return DjangoCache(alias=alias, ttl=ttl)
+    if backend == "memory":
+        return InProcessCache(max_size=max_size, ttl=ttl)
+    raise ValueError("Unknown cache backend: {backend}".format(backend=backend))
+
+
+def get_launch_cache(xblock_settings):
+    """
+    Return the process-wide launch cache configured by the "launch_cache" entry of `xblock_settings`.
+
+    Supported options are "enabled", "backend" ("auto", "memory" or "django"), "ttl" (in seconds),
+    "max_size" (in-process backend only) and "django_cache_alias".
+    """
+    cache_configuration = xblock_settings.get("launch_cache", {})
+    if not cache_configuration.get("enabled", True):
+        return NULL_CACHE
+    options = (
+        cache_configuration.get("backend", "auto"),
+        cache_configuration.get("ttl", DEFAULT_LAUNCH_CACHE_TTL),
+        cache_configuration.get("max_size", DEFAULT_LAUNCH_CACHE_MAX_SIZE),
+        cache_configuration.get("django_cache_alias", "default"),
+    )
+    cache = _caches.get(options)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(options)
+            if cache is None:
+                cache = create_cache(*options)
+                _caches[options] = cache
+    return cache
+
+
+def launch_cache_key(email, course_name, course_run, template=None):
+    """
+    Return the launch cache key for a learner and course run, and optionally an environment template.
+
+    The components are hashed so the key is safe for every cache backend (e.g. memcached).
+    """
+    components = (email, course_name, course_run) if template is None else (email, course_name, course_run, template)
+    digest = hashlib.sha1(
+        "\n".join(components).encode("utf-8")
+    ).hexdigest()
+    return "launch:{digest}".format(digest=digest)
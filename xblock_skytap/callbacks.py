@@ -0,0 +1,47 @@
+"""
+Signing of Boomi completion callbacks.
+
+In callback mode, `launch` sends Boomi a callback URL together with a correlation ID and returns right away.
+When provisioning finishes, Boomi POSTs the result to the callback URL. The callback handler does not
+require authentication, so the callback URL carries an HMAC signature of the correlation ID
+that proves it was issued by the Skytap XBlock.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import hashlib
+import hmac
+
+# Functions #########################################################
+
+
+def launch_callbacks_enabled(xblock_settings):
+    """
+    Return True if Boomi should report launch results via callbacks.
+    """
+    return bool(xblock_settings.get("launch_callbacks", {}).get("enabled", False))
+
+
+def get_callback_secret(xblock_settings):
+    """
+    Return the secret used to sign callback URLs, or None if it is not configured.
+    """
+    return xblock_settings.get("launch_callbacks", {}).get("secret") or None
+
+
+def sign_correlation_id(secret, correlation_id):
+    """
+    Return the HMAC-SHA256 signature of `correlation_id`.
+    """
+    return hmac.new(secret.encode("utf-8"), correlation_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_correlation_id(secret, correlation_id, signature):
+    """
+    Return True if `signature` is the signature of `correlation_id`.
+    """
+    if not (secret and correlation_id and signature):
+        return False
+    return hmac.compare_digest(sign_correlation_id(secret, correlation_id), signature)
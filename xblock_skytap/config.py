@@ -0,0 +1,309 @@
+"""
+Compiled Boomi configuration for the Skytap XBlock.
+
+The "boomi_configuration" entry of XBLOCK_SETTINGS is validated and compiled once into an immutable
+BoomiConfiguration that carries everything a launch needs (endpoint URLs, auth headers, client and routing options),
+so the hot path does not need to re-validate settings or rebuild strings.
+
+Besides a single "base_url" and "endpoint", the configuration can list several Boomi "endpoints"
+(e.g. atoms in different regions), which inherit any settings they don't specify from the top level,
+and "routes" that restrict course runs to some of the endpoints (see routing.py).
+Compiled configurations are keyed by a fingerprint of the settings, so changed settings are picked up automatically.
+Computing the fingerprint is skipped when the very same settings dict is compiled again with an unchanged content,
+which is what happens on every launch.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import base64
+import copy
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+from urllib.parse import urljoin
+
+from .exceptions import BoomiConfigurationInvalidError
+
+# Globals ###########################################################
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+
+DEFAULT_HEDGE_MIN_DELAY = 0.5
+DEFAULT_TIMEOUT_PERCENTILE = 99
+DEFAULT_TIMEOUT_MULTIPLIER = 2
+# Launching an environment normally takes tens of seconds.
+DEFAULT_MIN_READ_TIMEOUT = 30
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_FAILURE_COOLDOWN = 30
+
+AUTH_METHOD_HEADER = "header"
+AUTH_METHOD_URL = "url"
+
+REQUIRED_SETTINGS = ("base_url", "endpoint", "username", "token")
+
+# Name of the only endpoint of configurations that don't list "endpoints".
+DEFAULT_ENDPOINT_NAME = "default"
+
+# Client options: (name, default, minimum, type)
+CLIENT_OPTIONS = (
+    ("connect_timeout", DEFAULT_CONNECT_TIMEOUT, 0, (int, float)),
+    ("read_timeout", DEFAULT_READ_TIMEOUT, 0, (int, float)),
+    ("pool_connections", DEFAULT_POOL_CONNECTIONS, 1, int),
+    ("pool_maxsize", DEFAULT_POOL_MAXSIZE, 1, int),
+    ("max_retries", DEFAULT_MAX_RETRIES, 0, int),
+    ("retry_backoff", DEFAULT_RETRY_BACKOFF, 0, (int, float)),
+)
+
+# Routing options: (name, default, minimum, type)
+ROUTING_OPTIONS = (
+    ("hedge_percentile", None, 50, (int, float)),
+    ("hedge_min_delay", DEFAULT_HEDGE_MIN_DELAY, 0, (int, float)),
+    ("timeout_percentile", DEFAULT_TIMEOUT_PERCENTILE, 50, (int, float)),
+    ("timeout_multiplier", DEFAULT_TIMEOUT_MULTIPLIER, 1, (int, float)),
+    ("min_read_timeout", DEFAULT_MIN_READ_TIMEOUT, 0, (int, float)),
+    ("failure_threshold", DEFAULT_FAILURE_THRESHOLD, 1, int),
+    ("failure_cooldown", DEFAULT_FAILURE_COOLDOWN, 0, (int, float)),
+)
+
+# Options that can be set to None to disable the feature they control.
+NULLABLE_OPTIONS = frozenset(("hedge_percentile", "timeout_percentile"))
+
+# Compiled configurations rarely change, so a handful of entries is plenty.
+MAX_COMPILED_CONFIGURATIONS = 16
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+# Maps the id() of recently compiled settings dicts to a copy of their content and their compiled configuration.
+_compiled_by_id = {}
+
+# Classes ###########################################################
+
+
+class BoomiEndpoint(object):
+    """
+    Immutable Boomi endpoint: its name, URL and (read-only) request headers.
+    """
+
+    __slots__ = ("name", "url", "headers")
+
+    def __init__(self, name, url, headers):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "url", url)
+        object.__setattr__(self, "headers", headers)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BoomiEndpoint is immutable.")
+
+    def __repr__(self):
+        # Never include credentials.
+        return "<BoomiEndpoint {name} {url}>".format(name=self.name, url=self.url.split(";", 1)[0])
+
+
+class BoomiConfiguration(object):
+    """
+    Immutable, validated Boomi configuration.
+
+    `url` and `headers` are those of the first of the `endpoints`.
+    `routes` is a read-only mapping of course run keys (see routing.py) to tuples of endpoint names.
+    """
+
+    __slots__ = ("fingerprint", "endpoints", "routes", "auth_method", "client_options", "routing_options")
+
+    def __init__(
+            self, fingerprint, endpoints, routes, auth_method, client_options, routing_options
+    ):  # pylint: disable=too-many-arguments
+        object.__setattr__(self, "fingerprint", fingerprint)
+        object.__setattr__(self, "endpoints", endpoints)
+        object.__setattr__(self, "routes", routes)
+        object.__setattr__(self, "auth_method", auth_method)
+        object.__setattr__(self, "client_options", client_options)
+        object.__setattr__(self, "routing_options", routing_options)
+
+    @property
+    def url(self):
+        """
+        Return the URL of the first endpoint.
+        """
+        return self.endpoints[0].url
+
+    @property
+    def headers(self):
+        """
+        Return the request headers of the first endpoint.
+        """
+        return self.endpoints[0].headers
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BoomiConfiguration is immutable.")
+
+    def __repr__(self):
+        # Never include credentials.
+        return "<BoomiConfiguration {fingerprint} {endpoints}>".format(
+            fingerprint=self.fingerprint[:8], endpoints=" ".join(repr(endpoint) for endpoint in self.endpoints)
+        )
+
+
+# Functions #########################################################
+
+def fingerprint_configuration(boomi_configuration):
+    """
+    Return a fingerprint that changes whenever the content of `boomi_configuration` changes.
+    """
+    serialized = json.dumps(boomi_configuration, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def get_endpoint_settings(boomi_configuration):
+    """
+    Return a list of (name, settings) of all endpoints of `boomi_configuration`.
+
+    Listed "endpoints" take the settings they don't specify from the top level;
+    without "endpoints", the top level describes the only endpoint, called "default".
+    """
+    endpoints = boomi_configuration.get("endpoints")
+    if endpoints is None:
+        return [(DEFAULT_ENDPOINT_NAME, boomi_configuration)]
+    endpoint_settings = []
+    for index, endpoint in enumerate(endpoints):
+        settings = dict(boomi_configuration, **endpoint) if isinstance(endpoint, dict) else None
+        name = (endpoint.get("name") if settings else None) or "endpoints[{index}]".format(index=index)
+        endpoint_settings.append((name, settings))
+    return endpoint_settings
+
+
+def validate_endpoint(settings, prefix=""):
+    """
+    Return a list of all problems with the `settings` of an endpoint, each starting with `prefix`.
+    """
+    errors = []
+    missing_settings = [setting for setting in REQUIRED_SETTINGS if setting not in settings]
+    if missing_settings:
+        errors.append("{prefix}Boomi configuration is missing the following settings: {missing_settings}".format(
+            prefix=prefix, missing_settings=", ".join(missing_settings)
+        ))
+    for setting in REQUIRED_SETTINGS:
+        value = settings.get(setting)
+        if setting in settings and not (isinstance(value, str) and value):
+            errors.append("{prefix}{setting} must be a non-empty string".format(prefix=prefix, setting=setting))
+    return errors
+
+
+def validate_configuration(boomi_configuration):
+    """
+    Return a list of all problems with `boomi_configuration`.
+    """
+    errors = []
+    endpoints = boomi_configuration.get("endpoints")
+    names = set()
+    if endpoints is None:
+        errors.extend(validate_endpoint(boomi_configuration))
+        names.add(DEFAULT_ENDPOINT_NAME)
+    elif not (isinstance(endpoints, list) and endpoints):
+        errors.append("endpoints must be a non-empty list")
+    else:
+        for name, settings in get_endpoint_settings(boomi_configuration):
+            if settings is None:
+                errors.append("{name} must be a dict".format(name=name))
+                continue
+            if name in names:
+                errors.append("{name}: endpoint names must be unique".format(name=name))
+            names.add(name)
+            errors.extend(validate_endpoint(settings, prefix="{name}: ".format(name=name)))
+
+    routes = boomi_configuration.get("routes", {})
+    if not isinstance(routes, dict):
+        errors.append("routes must be a dict")
+        routes = {}
+    for route, route_names in routes.items():
+        if not (isinstance(route_names, list) and route_names and set(route_names) <= names):
+            errors.append("routes[{route}] must be a non-empty list of endpoint names".format(route=route))
+    for name, default, minimum, expected_type in CLIENT_OPTIONS + ROUTING_OPTIONS:
+        if name not in boomi_configuration:
+            continue
+        value = boomi_configuration[name]
+        if value is None and name in NULLABLE_OPTIONS:
+            continue
+        if isinstance(value, bool) or not isinstance(value, expected_type) or value < minimum:
+            errors.append("{name} must be a number greater than or equal to {minimum}".format(
+                name=name, minimum=minimum
+            ))
+    auth_method = boomi_configuration.get("auth_method", AUTH_METHOD_HEADER)
+    if auth_method not in (AUTH_METHOD_HEADER, AUTH_METHOD_URL):
+        errors.append("auth_method must be either '{header}' or '{url}'".format(
+            header=AUTH_METHOD_HEADER, url=AUTH_METHOD_URL
+        ))
+    return errors
+
+
+def build_configuration(boomi_configuration, fingerprint):
+    """
+    Validate `boomi_configuration` and compile it into a BoomiConfiguration.
+
+    Raise BoomiConfigurationInvalidError listing all problems if the configuration is invalid.
+    """
+    errors = validate_configuration(boomi_configuration)
+    if errors:
+        raise BoomiConfigurationInvalidError("; ".join(errors))
+
+    auth_method = boomi_configuration.get("auth_method", AUTH_METHOD_HEADER)
+    endpoints = tuple(
+        build_endpoint(name, settings, auth_method) for name, settings in get_endpoint_settings(boomi_configuration)
+    )
+    routes = MappingProxyType({
+        route: tuple(route_names) for route, route_names in boomi_configuration.get("routes", {}).items()
+    })
+    client_options = tuple(
+        (name, boomi_configuration.get(name, default)) for name, default, _, _ in CLIENT_OPTIONS
+    )
+    routing_options = tuple(
+        (name, boomi_configuration.get(name, default)) for name, default, _, _ in ROUTING_OPTIONS
+    )
+    return BoomiConfiguration(fingerprint, endpoints, routes, auth_method, client_options, routing_options)
+
+
+def build_endpoint(name, settings, auth_method):
+    """
+    Compile the `settings` of the endpoint called `name` into a BoomiEndpoint.
+    """
+    auth_string = "{}:{}".format(settings["username"], settings["token"]).encode("utf-8")
+    base64_auth_string = base64.b64encode(auth_string).decode("ascii")
+    url = urljoin(settings["base_url"], settings["endpoint"])
+    headers = {"Accept": "application/json"}
+    if auth_method == AUTH_METHOD_URL:
+        url = "{url};boomi_auth={base64_auth_string}".format(url=url, base64_auth_string=base64_auth_string)
+    else:
+        headers["Authorization"] = "Basic {base64_auth_string}".format(base64_auth_string=base64_auth_string)
+    return BoomiEndpoint(name, url, MappingProxyType(headers))
+
+
+def compile_boomi_configuration(boomi_configuration):
+    """
+    Return the compiled BoomiConfiguration for the "boomi_configuration" dict,
+    compiling it only if it was not compiled before.
+    """
+    # Settings dicts live as long as the Django settings, so the same dict is usually compiled over and over;
+    # comparing it to a copy of its content is much cheaper than fingerprinting it, and catches changes.
+    entry = _compiled_by_id.get(id(boomi_configuration))
+    if entry is not None and entry[0] == boomi_configuration:
+        return entry[1]
+
+    fingerprint = fingerprint_configuration(boomi_configuration)
+    configuration = _compiled.get(fingerprint)
+    if configuration is None:
+        configuration = build_configuration(boomi_configuration, fingerprint)
+    with _compiled_lock:
+        if len(_compiled) >= MAX_COMPILED_CONFIGURATIONS:
+            _compiled.clear()
+        if len(_compiled_by_id) >= MAX_COMPILED_CONFIGURATIONS:
+            _compiled_by_id.clear()
+        _compiled[fingerprint] = configuration
+        _compiled_by_id[id(boomi_configuration)] = (copy.deepcopy(boomi_configuration), configuration)
+    return configuration
@@ -2,6 +2,8 @@
 Exceptions for the Skytap XBlock.
 """
 
+from xblock.exceptions import JsonHandlerError
+
 
 class BoomiConfigurationMissingError(RuntimeError):
     """
@@ -12,3 +14,59 @@ class BoomiConfigurationInvalidError(RuntimeError):
     """
     Raised if "boomi_configuration" for Skytap XBlock is missing one or more relevant entries.
     """
+
+class BoomiUnavailableError(RuntimeError):
+    """
+    Raised if the Boomi endpoint could not be reached, or kept failing after all retries.
+    """
+
+class BoomiTimeoutError(BoomiUnavailableError):
+    """
+    Raised if the Boomi endpoint did not respond within the configured timeouts.
+    """
+
+class DeadlineExceededError(BoomiTimeoutError):
+    """
+    Raised if the deadline of a launch passed before the Boomi endpoint responded.
+    """
+
+class LaunchInProgressError(RuntimeError):
+    """
+    Raised if a concurrent launch for the same learner and course run did not finish in time.
+    """
+
+class ServiceUnavailableError(JsonHandlerError):
+    """
+    Raised by handlers to invoke a 503 error response that tells the client when to retry.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(503, message)
+        self.retry_after = retry_after
+
+    def get_response(self, **kwargs):
+        """
+        Return the error response, including a Retry-After header.
+        """
+        response = super().get_response(**kwargs)
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+class BoomiMalformedResponseError(RuntimeError):
+    """
+    Raised if the Boomi endpoint returned a response that is not valid JSON, or lacks required fields.
+    """
+
+    def __init__(self, message, content):
+        super().__init__(message)
+        self.content = content
+
+class BoomiLaunchError(RuntimeError):
+    """
+    Raised if Boomi reports that it failed to launch an environment.
+    """
+
+class LaunchQueueFullError(RuntimeError):
+    """
+    Raised if a launch cannot be queued because the launch queue is full.
+    """
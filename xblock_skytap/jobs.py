@@ -0,0 +1,197 @@
+"""
+Asynchronous launch jobs.
+
+Provisioning VMs through Boomi can take tens of seconds. In asynchronous mode, the `launch` handler
+only enqueues a job and returns its ID; an executor performs the Boomi call in the background,
+and the browser polls the `launch_status` handler until the job is ready.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import importlib
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from xblock.exceptions import JsonHandlerError
+
+from .cache import create_cache
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_JOB_TTL = 600
+DEFAULT_JOB_STORE_MAX_SIZE = 10000
+
+JOB_PENDING = "pending"
+# Pending jobs that wait for admission control (see admission.py) are reported as queued.
+JOB_QUEUED = "queued"
+JOB_READY = "ready"
+JOB_ERROR = "error"
+
+_job_stores = {}
+_executors = {}
+_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class LaunchJobStore(object):
+    """
+    Keeps track of the status of launch jobs.
+
+    Each job records its owner, so that learners can only query the status of their own launches.
+    """
+
+    def __init__(self, cache, ttl=DEFAULT_JOB_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    @staticmethod
+    def _make_key(job_id):
+        """
+        Return the cache key for `job_id`.
+        """
+        return "job:{job_id}".format(job_id=job_id)
+
+    def create(self, owner):
+        """
+        Register a new pending job for `owner` and return its ID.
+        """
+        job_id = uuid.uuid4().hex
+        self.cache.set(self._make_key(job_id), {"status": JOB_PENDING, "owner": owner}, self.ttl)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return the job with the given ID (or the job it is linked to), or None if it does not exist (anymore).
+        """
+        job = self.cache.get(self._make_key(job_id))
+        if job is not None and "linked_job_id" in job:
+            return self.cache.get(self._make_key(job["linked_job_id"]))
+        return job
+
+    def link(self, job_id, owner, linked_job_id):
+        """
+        Make the job report the status of the job `linked_job_id`, whose launch it joined.
+        """
+        self.cache.set(self._make_key(job_id), {
+            "status": JOB_PENDING,
+            "owner": owner,
+            "linked_job_id": linked_job_id,
+        }, self.ttl)
+
+    def set_ready(self, job_id, owner, sharing_portal_url):
+        """
+        Mark the job as done, storing the resulting `sharing_portal_url`.
+        """
+        self.cache.set(self._make_key(job_id), {
+            "status": JOB_READY,
+            "owner": owner,
+            "sharing_portal_url": sharing_portal_url,
+        }, self.ttl)
+
+    def set_error(self, job_id, owner, status_code, message):
+        """
+        Mark the job as failed, storing the error to report to the learner.
+        """
+        self.cache.set(self._make_key(job_id), {
+            "status": JOB_ERROR,
+            "owner": owner,
+            "status_code": status_code,
+            "error": message,
+        }, self.ttl)
+
+    def run(self, job_id, owner, func):
+        """
+        Call `func` to perform the launch, and record its outcome.
+        """
+        try:
+            sharing_portal_url = func()
+        except JsonHandlerError as exc:
+            self.set_error(job_id, owner, exc.status_code, exc.message)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Launch job %s failed.", job_id)
+            self.set_error(job_id, owner, 500, "An unknown error occurred.")
+        else:
+            self.set_ready(job_id, owner, sharing_portal_url)
+
+
+class ThreadPoolJobExecutor(object):
+    """
+    Run launch jobs in a pool of background threads.
+
+    Custom executors (e.g. one that hands jobs to Celery) must provide the same `submit` method.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedule `func(*args, **kwargs)` to run in the background.
+        """
+        self._executor.submit(func, *args, **kwargs)
+
+
+# Functions #########################################################
+
+def get_job_store(xblock_settings):
+    """
+    Return the process-wide job store configured by the "launch_jobs" entry of `xblock_settings`.
+
+    Jobs are kept in a cache; use the Django cache ("backend": "django") if LMS workers do not share memory.
+    """
+    jobs_configuration = xblock_settings.get("launch_jobs", {})
+    options = (
+        jobs_configuration.get("backend", "auto"),
+        jobs_configuration.get("job_ttl", DEFAULT_JOB_TTL),
+        jobs_configuration.get("max_size", DEFAULT_JOB_STORE_MAX_SIZE),
+        jobs_configuration.get("django_cache_alias", "default"),
+    )
+    job_store = _job_stores.get(options)
+    if job_store is None:
+        with _lock:
+            job_store = _job_stores.get(options)
+            if job_store is None:
+                job_store = LaunchJobStore(create_cache(*options), ttl=options[1])
+                _job_stores[options] = job_store
+    return job_store
+
+
+def get_job_executor(xblock_settings):
+    """
+    Return the process-wide executor configured by the "launch_jobs" entry of `xblock_settings`.
+
+    "executor" is either "thread", or the dotted path of a custom executor class,
+    which is instantiated with the keyword arguments given in "executor_options".
+    """
+    jobs_configuration = xblock_settings.get("launch_jobs", {})
+    executor_path = jobs_configuration.get("executor", "thread")
+    executor_options = jobs_configuration.get("executor_options", {})
+    key = (executor_path, tuple(sorted(executor_options.items())))
+    executor = _executors.get(key)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(key)
+            if executor is None:
+                if executor_path == "thread":
+                    executor_class = ThreadPoolJobExecutor
+                else:
+                    module_name, class_name = executor_path.rsplit(".", 1)
+                    executor_class = getattr(importlib.import_module(module_name), class_name)
+                executor = executor_class(**executor_options)
+                _executors[key] = executor
+    return executor
+
+
+def launch_jobs_enabled(xblock_settings):
+    """
+    Return True if launches should run as asynchronous jobs.
+    """
+    return bool(xblock_settings.get("launch_jobs", {}).get("enabled", False))
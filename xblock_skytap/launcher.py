@@ -0,0 +1,401 @@
+"""
+Launching Skytap environments through Boomi.
+
+Launches often outlive the handler request that starts them: launch jobs, queued launches, prewarms and
+environments that miss the deadline of a multi-environment launch go on in background threads. These must not
+use the block, its runtime or its services, which are only valid while the request is served. So the block
+captures everything a launch needs (settings, course, translated messages, callback URL) as plain values
+in a Launcher, and background threads only ever call the Launcher.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import time
+from urllib.parse import urlencode
+
+from xblock.exceptions import JsonHandlerError
+
+from .audit import get_audit_log, truncate
+from .breaker import get_circuit_breaker
+from .cache import get_launch_cache, launch_cache_key
+from .callbacks import get_callback_secret, sign_correlation_id
+from .config import compile_boomi_configuration
+from .exceptions import (BoomiConfigurationInvalidError,
+                         BoomiConfigurationMissingError,
+                         BoomiLaunchError,
+                         BoomiMalformedResponseError,
+                         BoomiTimeoutError,
+                         BoomiUnavailableError,
+                         DeadlineExceededError,
+                         LaunchInProgressError,
+                         ServiceUnavailableError)
+from .jobs import JOB_PENDING, get_job_store
+from .metrics import get_metrics
+from .singleflight import get_single_flight
+from .utils import _
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+# The user-facing messages of launches, translated by the block when it creates a Launcher.
+LAUNCH_MESSAGES = (
+    _('The Skytap XBlock is improperly configured.'),
+    _('The Skytap launch service is currently overloaded. Please try again later.'),
+    _('Your exercise environment could not be launched in time. Please try again.'),
+    _('The Skytap launch service did not respond in time.'),
+    _('The Skytap launch service is currently unavailable.'),
+    _('The Skytap launch service returned a malformed response.'),
+    _('The Boomi endpoint returned the following non-JSON response content: %s'),
+    _('Your exercise environment is still being launched. Please try again in a moment.'),
+)
+
+# Classes ###########################################################
+
+
+class Launcher(object):
+    """
+    Launches Skytap environments through Boomi for the course run identified by the (org, course, run)
+    `routing_key`, configured by `xblock_settings`.
+
+    `messages` maps the LAUNCH_MESSAGES to their translations; untranslated messages are used as they are.
+    `callback_url` is the URL of the `launch_callback` handler of the block, if launch callbacks are enabled.
+    """
+
+    def __init__(self, xblock_settings, routing_key=None, messages=None, callback_url=None):
+        self.xblock_settings = xblock_settings
+        self.routing_key = routing_key
+        self.messages = messages or {}
+        self.callback_url = callback_url
+
+    def _(self, text):
+        """ Translate text. """
+        return self.messages.get(text, text)
+
+    @staticmethod
+    def raise_error(message='An unknown error occurred.', exception=False):
+        """
+        Given an error message, log the error and raise a JsonHandlerError to invoke an error response.
+        """
+        if exception:
+            log.exception(message)
+        else:
+            log.error(message)
+
+        raise JsonHandlerError(500, message)
+
+    @staticmethod
+    def record_boomi_failure(circuit_breaker):
+        """
+        Record a failed Boomi call with `circuit_breaker`, if it is enabled.
+        """
+        if circuit_breaker is not None:
+            circuit_breaker.record_failure()
+
+    def get_boomi_configuration(self):
+        """
+        Return the Boomi configuration of the settings, compiled into a BoomiConfiguration.
+
+        Raise an exception if configuration is missing or invalid.
+        """
+        return load_boomi_configuration(self.xblock_settings)
+
+    def get_metric_tags(self, course_name, course_run):
+        """
+        Return the tags identifying the course run in metrics.
+        """
+        return metric_tags(course_name, course_run, self.routing_key[0] if self.routing_key else None)
+
+    def get_callback_url(self, query):
+        """
+        Return the URL of the `launch_callback` handler with the parameters of the dict `query`.
+        """
+        if self.callback_url is None:
+            self.raise_error(self._('The Skytap XBlock is improperly configured.'))
+        base_url = self.callback_url.rstrip('?&')
+        return '{}{}{}'.format(base_url, '&' if '?' in base_url else '?', urlencode(query))
+
+    def request_boomi(self, payload, deadline=None, callback=False):
+        """
+        Post `payload` to the Boomi endpoint and return the decoded response.
+
+        Invoke an error response if the request fails, or Boomi reports an error or does not return a sharing
+        portal URL, or if the `deadline` of the launch (in seconds since the epoch) passes first.
+        With `callback`, Boomi may only accept the launch, and report its result to the launch callback later.
+        """
+        # The Boomi client (and the HTTP client and JSON decoder it needs) are only imported by the first launch,
+        # so that LMS workers, which import every installed XBlock, boot faster.
+        # pylint: disable=import-outside-toplevel
+        from .boomi import decode_response, get_sharing_portal_url, make_idempotency_key, raise_for_boomi_error
+        from .routing import get_boomi_router
+
+        requested = time.time()
+        metrics = get_metrics(self.xblock_settings)
+        tags = self.get_metric_tags(payload['course_name'], payload['course_run'])
+
+        def record_outcome(outcome, error=None, response=None):
+            """
+            Count a launch with the given `outcome`, and record it in the audit log along with the user-facing `error`
+            and the endpoint that sent `response`.
+            """
+            metrics.increment('launch.outcome', dict(tags, outcome=outcome))
+            self.audit_launch(
+                payload['email'],
+                tags,
+                outcome,
+                latency=time.time() - requested,
+                endpoint=getattr(response, 'boomi_endpoint', None),
+                error=error,
+            )
+
+        try:
+            with metrics.timer('launch.config', tags):
+                boomi_configuration = self.get_boomi_configuration()
+        except (BoomiConfigurationInvalidError, BoomiConfigurationMissingError):
+            error = self._('The Skytap XBlock is improperly configured.')
+            record_outcome('misconfigured', error)
+            self.raise_error(error, exception=True)
+
+        # Fail fast while Boomi is known to be degraded.
+        circuit_breaker = get_circuit_breaker(self.xblock_settings)
+        if circuit_breaker is not None:
+            retry_after = circuit_breaker.retry_after()
+            if retry_after is not None:
+                error = self._('The Skytap launch service is currently overloaded. Please try again later.')
+                record_outcome('rejected', error)
+                log.warning('Rejecting Skytap launch: the circuit breaker for Boomi is open.')
+                raise ServiceUnavailableError(error, retry_after)
+
+        # Launches let through while the circuit is open probe whether Boomi recovered.
+        probing = circuit_breaker is not None and circuit_breaker.is_open()
+        try:
+            started = time.time()
+            try:
+                with metrics.timer('launch.boomi', tags):
+                    response = get_boomi_router(boomi_configuration).post(
+                        payload,
+                        idempotency_key=make_idempotency_key(),
+                        course_key=self.routing_key,
+                        deadline=deadline,
+                    )
+            except DeadlineExceededError:
+                # The deadline passed before Boomi was even asked, so this does not mean that Boomi is degraded.
+                error = self._('Your exercise environment could not be launched in time. Please try again.')
+                record_outcome('deadline_exceeded', error)
+                self.raise_error(error)
+            except BoomiTimeoutError:
+                error = self._('The Skytap launch service did not respond in time.')
+                record_outcome('timeout', error)
+                self.record_boomi_failure(circuit_breaker)
+                self.raise_error(error, exception=True)
+            except BoomiUnavailableError:
+                error = self._('The Skytap launch service is currently unavailable.')
+                record_outcome('unavailable', error)
+                self.record_boomi_failure(circuit_breaker)
+                self.raise_error(error, exception=True)
+
+            # Handle response errors
+            try:
+                with metrics.timer('launch.decode', tags):
+                    response_json = decode_response(response)
+            except BoomiMalformedResponseError as exc:
+                error = self._('The Skytap launch service returned a malformed response.')
+                record_outcome('malformed', error, response)
+                self.record_boomi_failure(circuit_breaker)
+                # Error pages can be large; only log their beginning.
+                log.error(
+                    self._('The Boomi endpoint returned the following non-JSON response content: %s'),
+                    truncate(exc.content)
+                )
+                self.raise_error(error, exception=True)
+
+            # Errors reported by Boomi itself mean that the service is healthy.
+            if circuit_breaker is not None:
+                circuit_breaker.record_success(time.time() - started)
+        finally:
+            if probing:
+                # Outcomes that say nothing about Boomi (e.g. the deadline passed before it was asked) neither close
+                # nor reopen the circuit; let the next launch probe instead of waiting for the probe to time out.
+                circuit_breaker.release_probe()
+
+        # Check if Boomi encountered an error while processing the request,
+        # and pass it back to the client.
+        try:
+            if callback:
+                raise_for_boomi_error(response_json)
+            else:
+                get_sharing_portal_url(response_json)
+        except BoomiLaunchError as exc:
+            record_outcome('boomi_error', str(exc), response)
+            self.raise_error(str(exc))
+        except BoomiMalformedResponseError as exc:
+            error = self._('The Skytap launch service returned a malformed response.')
+            record_outcome('malformed', error, response)
+            log.error('The Boomi endpoint returned an incomplete response: %s', truncate(exc.content))
+            self.raise_error(error, exception=True)
+
+        if callback and not response_json.get('SkytapURL'):
+            # Nothing has launched yet; the outcome is recorded when the launch callback arrives.
+            record_outcome('accepted', response=response)
+        else:
+            record_outcome('success', response=response)
+        return response_json
+
+    def request_sharing_portal_url(  # pylint: disable=too-many-arguments
+            self, email, course_name, course_run, template=None, deadline=None
+    ):
+        """
+        Ask Boomi to launch the Skytap environment of the given learner and course run
+        (or the given environment `template`) before `deadline`, and return the resulting sharing portal URL.
+        """
+        from .boomi import launch_payload  # pylint: disable=import-outside-toplevel
+
+        response_json = self.request_boomi(launch_payload(email, course_name, course_run, template), deadline)
+        return response_json['SkytapURL']
+
+    def fetch_sharing_portal_url(  # pylint: disable=too-many-arguments
+            self, email, course_name, course_run, template=None, deadline=None
+    ):
+        """
+        Fetch the sharing portal URL for the given learner and course run (and environment `template`, if any)
+        from Boomi, cache it, and return it.
+
+        Concurrent calls for the same learner and course run share a single Boomi call.
+        If a `deadline` (in seconds since the epoch) is given, neither the Boomi call nor waiting for a concurrent
+        call goes on past it.
+        """
+        launch_cache = get_launch_cache(self.xblock_settings)
+        cache_key = launch_cache_key(email, course_name, course_run, template)
+
+        def request_and_cache():
+            """
+            Request the sharing portal URL from Boomi and cache it.
+            """
+            try:
+                url = self.request_sharing_portal_url(email, course_name, course_run, template, deadline)
+            except JsonHandlerError:
+                # Don't let other workers hand out a URL for an environment that Boomi failed to launch.
+                launch_cache.delete(cache_key)
+                raise
+            launch_cache.set(cache_key, url)
+            return url
+
+        try:
+            return get_single_flight(self.xblock_settings, launch_cache).do(cache_key, request_and_cache, deadline)
+        except LaunchInProgressError:
+            self.raise_error(
+                self._('Your exercise environment is still being launched. Please try again in a moment.'),
+                exception=True
+            )
+
+    def request_launch_callback(  # pylint: disable=too-many-arguments
+            self, cache_key, email, course_name, course_run, job_id=None, deadline=None
+    ):
+        """
+        Ask Boomi to launch the Skytap environment of the given learner and course run,
+        and to report the result to the `launch_callback` handler once the environment is ready.
+
+        Return the ID of the job that tracks the launch (a new job, unless `job_id` is given).
+
+        Concurrent calls for the same learner and course run share a single Boomi call, like
+        `fetch_sharing_portal_url` does; the jobs of the calls that joined it follow the job of that call.
+        If a `deadline` (in seconds since the epoch) is given, neither the Boomi call nor waiting for a concurrent
+        call goes on past it.
+        """
+        from .boomi import launch_payload  # pylint: disable=import-outside-toplevel
+
+        secret = get_callback_secret(self.xblock_settings)
+        if secret is None:
+            self.raise_error(self._('The Skytap XBlock is improperly configured.'))
+
+        job_store = get_job_store(self.xblock_settings)
+        launch_cache = get_launch_cache(self.xblock_settings)
+
+        def request():
+            """
+            Ask Boomi to launch the environment, and return the launch handler response.
+            """
+            request_job_id = job_id if job_id is not None else job_store.create(owner=cache_key)
+            callback_url = self.get_callback_url({
+                'correlation_id': request_job_id,
+                'signature': sign_correlation_id(secret, request_job_id),
+            })
+            payload = launch_payload(email, course_name, course_run)
+            payload.update({
+                'callback_url': callback_url,
+                'correlation_id': request_job_id,
+            })
+            response_json = self.request_boomi(payload, deadline, callback=True)
+
+            # Boomi may already know the sharing portal URL, e.g. if the environment is running.
+            sharing_portal_url = response_json.get('SkytapURL')
+            if sharing_portal_url:
+                job_store.set_ready(request_job_id, cache_key, sharing_portal_url)
+                launch_cache.set(cache_key, sharing_portal_url)
+                return {'sharing_portal_url': sharing_portal_url}
+            return {'job_id': request_job_id, 'status': JOB_PENDING}
+
+        try:
+            response = get_single_flight(self.xblock_settings, launch_cache).do(cache_key, request, deadline)
+        except LaunchInProgressError:
+            self.raise_error(
+                self._('Your exercise environment is still being launched. Please try again in a moment.'),
+                exception=True
+            )
+        if job_id is not None and response.get('job_id') != job_id:
+            # This launch joined the Boomi call of another one.
+            if 'sharing_portal_url' in response:
+                job_store.set_ready(job_id, cache_key, response['sharing_portal_url'])
+            else:
+                job_store.link(job_id, cache_key, response['job_id'])
+        return response
+
+    def audit_launch(self, email, tags, outcome, latency=None, endpoint=None, error=None):
+        """
+        Record a launch attempt by the learner with the given `email` in the audit log, if it is enabled.
+
+        Only queues the event; it is written by a background thread.
+        """
+        audit_log = get_audit_log(self.xblock_settings)
+        if audit_log is None:
+            return
+        audit_log.emit({
+            'time': time.time(),
+            'user': email,
+            'course_run': tags['course_run'],
+            'endpoint': endpoint,
+            'latency': latency,
+            'outcome': outcome,
+            'error': truncate(error),
+        })
+
+
+# Functions #########################################################
+
+def load_boomi_configuration(xblock_settings):
+    """
+    Return the "boomi_configuration" entry of `xblock_settings`, compiled into a BoomiConfiguration.
+
+    Raise an exception if configuration is missing or invalid.
+    """
+    if not xblock_settings or "boomi_configuration" not in xblock_settings:
+        raise BoomiConfigurationMissingError(
+            "XBLOCK_SETTINGS for Skytap XBlock are missing Boomi configuration."
+        )
+    return compile_boomi_configuration(xblock_settings["boomi_configuration"])
+
+
+def metric_tags(course_name, course_run, org=None):
+    """
+    Return the tags identifying a course run in metrics.
+
+    The "course_run" tag leaves out the organization of the course, which is tagged separately, so that
+    the metrics of course runs with the same name in different organizations can be told apart.
+    """
+    tags = {'course_run': '{}/{}'.format(course_name, course_run)}
+    if org:
+        tags['org'] = org
+    return tags
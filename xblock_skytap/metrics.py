@@ -0,0 +1,327 @@
+"""
+Latency and outcome metrics for the Skytap XBlock.
+
+The `launch` handler and `student_view` time their individual phases (runtime service lookups,
+configuration, Boomi network time, response decoding, rendering) and count launch outcomes.
+Measurements always go to an in-memory sink, which keeps HDR-style latency histograms per course run
+(exposed to staff by the `launch_metrics` handler, as JSON or in the Prometheus text format),
+and can additionally be sent to statsd.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import math
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+# Latencies are recorded in microseconds, with SUB_BUCKETS linear buckets per power of two,
+# i.e. with a relative error of at most 1 / SUB_BUCKETS.
+SUB_BUCKETS = 32
+
+DEFAULT_STATSD_HOST = "localhost"
+DEFAULT_STATSD_PORT = 8125
+DEFAULT_PREFIX = "skytap"
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear latency histogram in the spirit of HdrHistogram.
+
+    Memory use is bounded by the range of recorded values, not by the number of recorded values.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _bucket_index(microseconds):
+        """
+        Return the index of the bucket holding `microseconds`.
+        """
+        if microseconds < SUB_BUCKETS:
+            return int(microseconds)
+        exponent = int(math.log2(microseconds)) - int(math.log2(SUB_BUCKETS))
+        return (exponent + 1) * SUB_BUCKETS + (int(microseconds) >> exponent) - SUB_BUCKETS
+
+    @staticmethod
+    def _bucket_value(index):
+        """
+        Return the highest value (in microseconds) that falls into the bucket with the given `index`.
+        """
+        if index < SUB_BUCKETS:
+            return index
+        exponent = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << exponent) - 1
+
+    def record(self, seconds):
+        """
+        Record a latency of `seconds`.
+        """
+        index = self._bucket_index(max(seconds, 0) * 1e6)
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """
+        Return the latency (in seconds) below which `percent` percent of the recorded latencies fall.
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            threshold = max(1, int(math.ceil(self.count * percent / 100.0)))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= threshold:
+                    return min(self._bucket_value(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Return the count, mean, p50, p95, p99 and max of the recorded latencies.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class InMemoryMetrics(object):
+    """
+    Metrics sink keeping counters and latency histograms in memory, per name and tags.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, tags):
+        """
+        Return a hashable key for `name` and `tags`.
+        """
+        return name, tuple(sorted((tags or {}).items()))
+
+    def increment(self, name, tags=None, value=1):
+        """
+        Add `value` to the counter `name`.
+        """
+        key = self._key(name, tags)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def timing(self, name, seconds, tags=None):
+        """
+        Record a latency of `seconds` in the histogram `name`.
+        """
+        key = self._key(name, tags)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        histogram.record(seconds)
+
+    def report(self, **tags):
+        """
+        Return the summaries of all histograms and the values of all counters that carry `tags`.
+        """
+        wanted = set(tags.items())
+
+        def matches(key):
+            """
+            Return True if the tags of `key` include the wanted tags.
+            """
+            return wanted.issubset(key[1])
+
+        timings = {}
+        for key, histogram in list(self.histograms.items()):
+            if matches(key):
+                timings[_describe(key, exclude=tags)] = histogram.summary()
+        counters = {}
+        for key, value in list(self.counters.items()):
+            if matches(key):
+                counters[_describe(key, exclude=tags)] = value
+        return {"timings": timings, "counters": counters}
+
+    def render_prometheus(self, prefix=DEFAULT_PREFIX, **tags):
+        """
+        Return the metrics that carry `tags` in the Prometheus text exposition format.
+
+        Histograms are exposed as summaries with the 0.5, 0.95 and 0.99 quantiles.
+        """
+        wanted = set(tags.items())
+        lines = []
+        for (name, key_tags), histogram in sorted(self.histograms.items()):
+            if not wanted.issubset(key_tags):
+                continue
+            metric = _prometheus_name(prefix, name) + "_seconds"
+            for quantile in (50, 95, 99):
+                labels = key_tags + (("quantile", str(quantile / 100.0)),)
+                lines.append("{metric}{labels} {value}".format(
+                    metric=metric, labels=_prometheus_labels(labels), value=histogram.percentile(quantile)
+                ))
+            lines.append("{metric}_sum{labels} {value}".format(
+                metric=metric, labels=_prometheus_labels(key_tags), value=histogram.total
+            ))
+            lines.append("{metric}_count{labels} {value}".format(
+                metric=metric, labels=_prometheus_labels(key_tags), value=histogram.count
+            ))
+        for (name, key_tags), value in sorted(self.counters.items()):
+            if not wanted.issubset(key_tags):
+                continue
+            lines.append("{metric}_total{labels} {value}".format(
+                metric=_prometheus_name(prefix, name), labels=_prometheus_labels(key_tags), value=value
+            ))
+        return "\n".join(lines) + "\n"
+
+
+class StatsdMetrics(object):
+    """
+    Metrics sink sending counters and timers to statsd over UDP.
+
+    Tags are appended in the DogStatsD format if `tags` is True, and dropped otherwise.
+    """
+
+    def __init__(self, host=DEFAULT_STATSD_HOST, port=DEFAULT_STATSD_PORT, prefix=DEFAULT_PREFIX, tags=False):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.tags = tags
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, name, value, metric_type, tags):
+        """
+        Send a single measurement, ignoring network errors.
+        """
+        line = "{prefix}.{name}:{value}|{metric_type}".format(
+            prefix=self.prefix, name=name, value=value, metric_type=metric_type
+        )
+        if self.tags and tags:
+            line += "|#" + ",".join("{}:{}".format(key, tag) for key, tag in sorted(tags.items()))
+        try:
+            self._socket.sendto(line.encode("utf-8"), self.address)
+        except (OSError, socket.error):
+            log.debug("Unable to send metric %s to statsd.", name)
+
+    def increment(self, name, tags=None, value=1):
+        """
+        Add `value` to the counter `name`.
+        """
+        self._send(name, value, "c", tags)
+
+    def timing(self, name, seconds, tags=None):
+        """
+        Record a latency of `seconds` for the timer `name`.
+        """
+        self._send(name, int(round(seconds * 1000)), "ms", tags)
+
+
+class Metrics(object):
+    """
+    Facade sending measurements to an in-memory sink and any number of additional sinks.
+    """
+
+    def __init__(self, sinks=()):
+        self.memory = InMemoryMetrics()
+        self.sinks = (self.memory,) + tuple(sinks)
+
+    def increment(self, name, tags=None, value=1):
+        """
+        Add `value` to the counter `name` in all sinks.
+        """
+        for sink in self.sinks:
+            sink.increment(name, tags, value)
+
+    def timing(self, name, seconds, tags=None):
+        """
+        Record a latency of `seconds` for `name` in all sinks.
+        """
+        for sink in self.sinks:
+            sink.timing(name, seconds, tags)
+
+    @contextmanager
+    def timer(self, name, tags=None):
+        """
+        Context manager recording the time spent in its body as `name`.
+        """
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.timing(name, time.time() - started, tags)
+
+
+# Functions #########################################################
+
+def _describe(key, exclude):
+    """
+    Return a readable name for a metric `key`, leaving out the tags in `exclude`.
+    """
+    name, tags = key
+    extra = ["{}={}".format(tag, value) for tag, value in tags if tag not in exclude]
+    return "{name}[{extra}]".format(name=name, extra=",".join(extra)) if extra else name
+
+
+def _prometheus_name(prefix, name):
+    """
+    Return the Prometheus metric name for `name`.
+    """
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "{prefix}_{name}".format(prefix=prefix, name=name))
+
+
+def _prometheus_labels(tags):
+    """
+    Return the Prometheus label set for `tags`.
+    """
+    if not tags:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in tags
+    ) + "}"
+
+
+def get_metrics(xblock_settings):
+    """
+    Return the process-wide Metrics configured by the "metrics" entry of `xblock_settings`.
+
+    Besides the in-memory sink, a statsd sink is added if "statsd" is configured
+    (with the optional "host", "port", "prefix" and "tags" options).
+    """
+    metrics_configuration = xblock_settings.get("metrics", {})
+    statsd_configuration = metrics_configuration.get("statsd")
+    key = tuple(sorted(statsd_configuration.items())) if statsd_configuration else None
+    metrics = _metrics.get(key)
+    if metrics is None:
+        with _metrics_lock:
+            metrics = _metrics.get(key)
+            if metrics is None:
+                sinks = [StatsdMetrics(**statsd_configuration)] if statsd_configuration else []
+                metrics = Metrics(sinks)
+                _metrics[key] = metrics
+    return metrics
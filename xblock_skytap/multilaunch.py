@@ -0,0 +1,128 @@
+"""
+Launching several Skytap environments per block.
+
+A block can list several environment templates (e.g. a cluster and a client machine). Each of them is a separate
+Boomi launch, so launching them one after the other would take the sum of their latencies. Instead, the launches
+run concurrently on a bounded, process-wide thread pool, and the block waits for all of them until a single
+overall deadline, so a launch takes as long as the slowest environment (or the deadline, whichever comes first).
+
+Environments that fail or miss the deadline are reported alongside the ones that launched. Launches that miss
+the deadline keep running in the background, and cache their sharing portal URL once they are done, so launching
+again picks them up.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from xblock.exceptions import JsonHandlerError
+
+from .utils import time_left
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_DEADLINE = 60
+
+_launchers = {}
+_launchers_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class MultiLauncher(object):
+    """
+    Run the launches of several environments concurrently, with at most `max_workers` launches in flight
+    per process, and wait for them for at most `deadline` seconds.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, deadline=DEFAULT_DEADLINE):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        # No thread_name_prefix: it needs Python 3.6, and the block supports Python 3.5.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def run(self, launches, timeout_message="The environment could not be launched in time.", deadline=None):
+        """
+        Call the function of each (name, func) pair of `launches` concurrently, each returning a sharing portal URL,
+        and return the results in the same order.
+
+        Each result is either `{"name": name, "sharing_portal_url": url}` or `{"name": name, "error": message}`.
+        Launches that are still running at the deadline, or at the earlier `deadline` of the request
+        (in seconds since the epoch), are reported with `timeout_message`.
+        """
+        futures = [self._executor.submit(func) for _name, func in launches]
+        timeout = self.deadline
+        if deadline is not None:
+            timeout = min(timeout, time_left(deadline))
+        wait(futures, timeout=timeout)
+        results = []
+        for (name, _func), future in zip(launches, futures):
+            if not future.done():
+                # Launches that did not start yet are dropped; running ones can't be interrupted.
+                future.cancel()
+                results.append({"name": name, "error": timeout_message})
+                continue
+            try:
+                results.append({"name": name, "sharing_portal_url": future.result()})
+            except JsonHandlerError as exc:
+                results.append({"name": name, "error": exc.message})
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Unable to launch the Skytap environment %s.", name)
+                results.append({"name": name, "error": "An unknown error occurred while launching."})
+        return results
+
+
+# Functions #########################################################
+
+def parse_environments(environments):
+    """
+    Return the (name, template) pairs of the `environments` field of a block.
+
+    Entries are either template names, or dicts with a "template" and an optional display "name".
+    Raise ValueError if an entry is invalid, or if two entries have the same name.
+    """
+    if not isinstance(environments, list):
+        raise ValueError("Environments must be a list.")
+    parsed = []
+    for entry in environments:
+        if isinstance(entry, dict):
+            template = entry.get("template")
+            name = entry.get("name", template)
+        else:
+            template = name = entry
+        if not template or not isinstance(template, str) or not name or not isinstance(name, str):
+            raise ValueError("Invalid environment: {entry!r}".format(entry=entry))
+        parsed.append((name, template))
+    names = [name for name, _template in parsed]
+    if len(set(names)) != len(names):
+        raise ValueError("Environment names must be unique.")
+    return parsed
+
+
+def get_multi_launcher(xblock_settings):
+    """
+    Return the process-wide MultiLauncher configured by the "multi_launch" entry of `xblock_settings`.
+
+    Supported options are "max_workers" (launches in flight per process, across all learners)
+    and "deadline" (seconds to wait for all the environments of a launch).
+    """
+    multi_launch_configuration = xblock_settings.get("multi_launch", {})
+    key = (
+        multi_launch_configuration.get("max_workers", DEFAULT_MAX_WORKERS),
+        multi_launch_configuration.get("deadline", DEFAULT_DEADLINE),
+    )
+    launcher = _launchers.get(key)
+    if launcher is None:
+        with _launchers_lock:
+            launcher = _launchers.get(key)
+            if launcher is None:
+                launcher = MultiLauncher(*key)
+                _launchers[key] = launcher
+    return launcher
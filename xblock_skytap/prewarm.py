@@ -0,0 +1,131 @@
+"""
+Predictive prewarming of Skytap environments.
+
+Most learners who open the unit containing the block click "Open" within minutes. When prewarming is enabled
+for a course, rendering `student_view` for a learner starts launching their environment in the background,
+and the sharing portal URL lands in the launch cache, so the click that follows is answered from the cache.
+A click while the prewarm is still in flight joins it (see singleflight.py) instead of calling Boomi again.
+
+Page views must not flood Boomi: prewarms of the same environment are deduplicated, at most `max_concurrent`
+prewarms run at the same time in each process, and at most `rate` start per second. Prewarms beyond these limits
+are skipped, not queued; the learner's click launches the environment as usual.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import TokenBucket, course_key_patterns
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_RATE = 2
+
+# Outcomes of Prewarmer.schedule.
+PREWARM_SCHEDULED = "scheduled"
+PREWARM_DUPLICATE = "duplicate"
+PREWARM_BUSY = "busy"
+PREWARM_RATE_LIMITED = "rate_limited"
+
+_prewarmers = {}
+_prewarmers_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class Prewarmer(object):
+    """
+    Run prewarms in the background, deduplicated by key, with a cap on concurrent prewarms and a rate limit.
+
+    `courses` lists the course keys ("org/course/run", "org/course" or "org") for which prewarming is enabled,
+    or is None to enable it for all courses. `rate` is the number of prewarms started per second (0: no limit).
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, rate=DEFAULT_RATE, courses=None):
+        self.max_concurrent = max_concurrent
+        self.courses = frozenset(courses) if courses is not None else None
+        self.rate_limiter = TokenBucket(rate, capacity=max(rate, 1)) if rate else None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def enabled_for(self, course_key):
+        """
+        Return True if prewarming is enabled for the (org, course, run) `course_key`.
+        """
+        if self.courses is None:
+            return True
+        return any(pattern in self.courses for pattern in course_key_patterns(course_key))
+
+    def in_flight(self):
+        """
+        Return the number of prewarms in flight.
+        """
+        with self._lock:
+            return len(self._in_flight)
+
+    def schedule(self, key, func):
+        """
+        Call `func` in the background, unless a prewarm for `key` is already in flight or the limits are reached.
+
+        Return one of "scheduled", "duplicate", "busy" and "rate_limited". Never waits.
+        """
+        with self._lock:
+            if key in self._in_flight:
+                return PREWARM_DUPLICATE
+            if len(self._in_flight) >= self.max_concurrent:
+                return PREWARM_BUSY
+            if self.rate_limiter is not None and self.rate_limiter.try_acquire():
+                return PREWARM_RATE_LIMITED
+            self._in_flight.add(key)
+        self._executor.submit(self._run, key, func)
+        return PREWARM_SCHEDULED
+
+    def _run(self, key, func):
+        """
+        Call `func`, and mark the prewarm for `key` as done.
+        """
+        try:
+            func()
+        except Exception:  # pylint: disable=broad-except
+            # The error was logged where it happened; the learner's click will try again.
+            log.info("Prewarming a Skytap environment failed.")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+
+# Functions #########################################################
+
+def get_prewarmer(xblock_settings):
+    """
+    Return the process-wide Prewarmer configured by the "prewarm" entry of `xblock_settings`,
+    or None if prewarming is disabled (the default).
+
+    Supported options are "enabled", "courses" (course keys for which prewarming is enabled; all courses if omitted),
+    "max_concurrent" (prewarms in flight per process) and "rate" (prewarms started per second, 0 for no limit).
+    """
+    prewarm_configuration = xblock_settings.get("prewarm", {})
+    if not prewarm_configuration.get("enabled", False):
+        return None
+    courses = prewarm_configuration.get("courses")
+    key = (
+        prewarm_configuration.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+        prewarm_configuration.get("rate", DEFAULT_RATE),
+        tuple(sorted(courses)) if courses is not None else None,
+    )
+    prewarmer = _prewarmers.get(key)
+    if prewarmer is None:
+        with _prewarmers_lock:
+            prewarmer = _prewarmers.get(key)
+            if prewarmer is None:
+                prewarmer = Prewarmer(*key)
+                _prewarmers[key] = prewarmer
+    return prewarmer
@@ -0,0 +1,302 @@
+"""
+Bulk pre-provisioning of Skytap environments for a cohort of learners.
+
+Before a live training session starts, environments can be warmed for every enrolled learner,
+so they don't all get provisioned when the session starts. This command reads a roster
+from a CSV file (or stdin), sends the same createVm request that the `launch` handler sends
+for every learner through a bounded pool of workers with rate limiting, and stores the
+resulting sharing portal URLs in the launch cache.
+
+Example::
+
+    skytap-provision roster.csv --settings skytap.json --concurrency 8 --rate 4 --state roster.state
+
+The roster must have an "email" column; "course_name" and "course_run" columns can be
+replaced by the --course-name and --course-run options. The settings file contains the
+XBLOCK_SETTINGS entry for the Skytap XBlock; if it is omitted, the settings are read from
+the Django settings given by DJANGO_SETTINGS_MODULE. Either way, the launch cache must be a Django cache
+shared with the LMS, so DJANGO_SETTINGS_MODULE must point to the LMS settings: the command refuses to run
+with an in-process cache, whose URLs would be lost when it exits. URLs are cached for 12 hours by default.
+
+With --state, every result is appended to a state file, and learners that were provisioned
+successfully are skipped when the command is run again, so an interrupted run can be resumed.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .boomi import decode_response, get_sharing_portal_url, launch_payload, make_idempotency_key
+from .cache import get_launch_cache, launch_cache_key, launch_cache_shared
+from .config import compile_boomi_configuration
+from .exceptions import (BoomiConfigurationInvalidError, BoomiLaunchError,
+                         BoomiMalformedResponseError, BoomiUnavailableError)
+from .routing import get_boomi_router
+from .utils import TokenBucket
+
+# Globals ###########################################################
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 2
+# Environments are usually provisioned hours before a session starts.
+DEFAULT_CACHE_TTL = 12 * 3600
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+# Classes ###########################################################
+
+
+class ProvisionState(object):
+    """
+    Append-only record of provisioning results, used to resume interrupted runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed(self):
+        """
+        Return the set of (email, course_name, course_run) tuples that were provisioned successfully.
+        """
+        completed = set()
+        if not self.path or not os.path.exists(self.path):
+            return completed
+        line = ""
+        with open(self.path) as state_file:
+            for line in state_file:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A partially written last line of an interrupted run.
+                    continue
+                key = (result["email"], result["course_name"], result["course_run"])
+                if result["status"] == STATUS_OK:
+                    completed.add(key)
+                else:
+                    completed.discard(key)
+        if line and not line.endswith("\n"):
+            # Terminate the partially written line, so new results start on a line of their own.
+            self.record(None)
+        return completed
+
+    def record(self, result):
+        """
+        Append `result` to the state file (or just a line break if `result` is None).
+        """
+        if not self.path:
+            return
+        with self._lock:
+            with open(self.path, "a") as state_file:
+                state_file.write((json.dumps(result) if result is not None else "") + "\n")
+
+
+class Provisioner(object):
+    """
+    Provision environments for roster entries through a bounded worker pool with rate limiting.
+    """
+
+    def __init__(self, xblock_settings, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 cache_ttl=DEFAULT_CACHE_TTL):
+        self.configuration = compile_boomi_configuration(xblock_settings.get("boomi_configuration", {}))
+        self.router = get_boomi_router(self.configuration)
+        self.launch_cache = get_launch_cache(xblock_settings)
+        self.concurrency = concurrency
+        self.rate_limiter = TokenBucket(rate, capacity=1) if rate else None
+        self.cache_ttl = cache_ttl
+
+    def provision(self, email, course_name, course_run):
+        """
+        Provision the environment of one learner, cache its sharing portal URL, and return the result.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        result = {"email": email, "course_name": course_name, "course_run": course_run}
+        started = time.time()
+        try:
+            response = self.router.post(launch_payload(email, course_name, course_run), make_idempotency_key())
+            sharing_portal_url = get_sharing_portal_url(decode_response(response))
+        except (BoomiUnavailableError, BoomiMalformedResponseError, BoomiLaunchError) as exc:
+            result.update(status=STATUS_ERROR, error=str(exc))
+        else:
+            self.launch_cache.set(launch_cache_key(email, course_name, course_run), sharing_portal_url, self.cache_ttl)
+            result.update(status=STATUS_OK, sharing_portal_url=sharing_portal_url)
+        result["latency"] = time.time() - started
+        return result
+
+    def run(self, roster, state=None, progress=None):
+        """
+        Provision the environments for all entries of `roster`, and return the list of results.
+
+        Entries recorded as completed in `state` are skipped. `progress` is called with each result.
+        """
+        completed = state.completed() if state else set()
+        pending = [entry for entry in roster if entry not in completed]
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self.provision, *entry) for entry in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if state:
+                    state.record(result)
+                if progress:
+                    progress(result)
+        return results, len(roster) - len(pending)
+
+
+# Functions #########################################################
+
+def read_roster(roster_file, course_name=None, course_run=None):
+    """
+    Read (email, course_name, course_run) tuples from a CSV roster, dropping duplicates.
+
+    Raise ValueError if an entry lacks a value that has no default.
+    """
+    roster = []
+    seen = set()
+    for line_number, row in enumerate(csv.DictReader(roster_file), start=2):
+        entry = (
+            (row.get("email") or "").strip(),
+            (row.get("course_name") or course_name or "").strip(),
+            (row.get("course_run") or course_run or "").strip(),
+        )
+        if not all(entry):
+            raise ValueError("Line {line_number} of the roster is incomplete: {row}".format(
+                line_number=line_number, row=row
+            ))
+        if entry not in seen:
+            seen.add(entry)
+            roster.append(entry)
+    return roster
+
+
+def percentile(values, fraction):
+    """
+    Return the value at `fraction` (between 0 and 1) of the sorted `values`.
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summarize(results, skipped, elapsed):
+    """
+    Return a human-readable report of the provisioning `results`.
+    """
+    succeeded = [result for result in results if result["status"] == STATUS_OK]
+    failed = [result for result in results if result["status"] != STATUS_OK]
+    latencies = [result["latency"] for result in results]
+    lines = [
+        "Provisioned: {succeeded}".format(succeeded=len(succeeded)),
+        "Failed: {failed}".format(failed=len(failed)),
+        "Skipped (already provisioned): {skipped}".format(skipped=skipped),
+        "Elapsed: {elapsed:.1f}s".format(elapsed=elapsed),
+        "Throughput: {throughput:.2f} launches/s".format(throughput=len(results) / elapsed if elapsed else 0),
+        "Latency: p50 {p50:.2f}s, p95 {p95:.2f}s, max {max:.2f}s".format(
+            p50=percentile(latencies, 0.5), p95=percentile(latencies, 0.95), max=max(latencies or [0])
+        ),
+    ]
+    for result in failed:
+        lines.append("  FAILED {email} ({course_name}/{course_run}): {error}".format(**result))
+    return "\n".join(lines)
+
+
+def setup_django():
+    """
+    Set up Django if its settings are configured (e.g. by DJANGO_SETTINGS_MODULE), and return True if they are.
+    """
+    try:
+        import django  # pylint: disable=import-outside-toplevel
+        from django.conf import settings  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return False
+    if not settings.configured:
+        return False
+    django.setup()
+    return True
+
+
+def load_xblock_settings(settings_path=None):
+    """
+    Return the Skytap XBlock settings from the JSON file at `settings_path`,
+    or from XBLOCK_SETTINGS in the Django settings.
+
+    Django is set up in both cases if its settings are configured, so Django caches can be used.
+    Raise ValueError if there is neither a settings file nor Django settings.
+    """
+    django_configured = setup_django()
+    if settings_path:
+        with open(settings_path) as settings_file:
+            return json.load(settings_file)
+    if not django_configured:
+        raise ValueError("Either --settings or DJANGO_SETTINGS_MODULE is required.")
+
+    from django.conf import settings  # pylint: disable=import-outside-toplevel
+    return getattr(settings, "XBLOCK_SETTINGS", {}).get("skytap", {})
+
+
+def main(argv=None):
+    """
+    Entry point of the `skytap-provision` command.
+    """
+    parser = argparse.ArgumentParser(description="Pre-provision Skytap environments for a roster of learners.")
+    parser.add_argument("roster", help='CSV roster with an "email" column, or "-" to read from stdin')
+    parser.add_argument("--settings", help="JSON file containing the Skytap XBlock settings")
+    parser.add_argument("--course-name", help="course name for roster entries that don't specify one")
+    parser.add_argument("--course-run", help="course run for roster entries that don't specify one")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="number of parallel requests")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="maximum requests per second (0: no limit)")
+    parser.add_argument(
+        "--cache-ttl", type=int, default=DEFAULT_CACHE_TTL, help="seconds to cache the sharing portal URLs for"
+    )
+    parser.add_argument("--state", help="state file for resuming interrupted runs")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.roster == "-":
+            roster = read_roster(sys.stdin, args.course_name, args.course_run)
+        else:
+            with open(args.roster) as roster_file:
+                roster = read_roster(roster_file, args.course_name, args.course_run)
+        xblock_settings = load_xblock_settings(args.settings)
+        if not launch_cache_shared(xblock_settings):
+            raise ValueError(
+                "The launch cache is not shared with the LMS, so the provisioned URLs would be lost: "
+                "set DJANGO_SETTINGS_MODULE to the LMS settings, and use the \"auto\" or \"django\" "
+                "launch cache backend."
+            )
+        provisioner = Provisioner(
+            xblock_settings,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            cache_ttl=args.cache_ttl,
+        )
+    except (IOError, ValueError, BoomiConfigurationInvalidError) as exc:
+        parser.error(str(exc))
+
+    def progress(result):
+        """
+        Report the outcome of a single launch.
+        """
+        sys.stderr.write("{status} {email}\n".format(status=result["status"].upper(), email=result["email"]))
+
+    started = time.time()
+    results, skipped = provisioner.run(roster, state=ProvisionState(args.state), progress=progress)
+    print(summarize(results, skipped, time.time() - started))
+    return 1 if any(result["status"] != STATUS_OK for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
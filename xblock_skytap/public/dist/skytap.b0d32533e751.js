@@ -0,0 +1,372 @@
+function SkytapXBlock(runtime, element, initArgs) {
+"use strict";
+if (typeof gettext == 'undefined') {
+window.gettext = function gettext_stub(string) { return string; };
+window.ngettext = function ngettext_stub(strA, strB, n) { return n == 1 ? strA : strB; };
+}
+var launchForm = $('.skytap-launch-form', element),
+launchButton = launchForm.find('.skytap-launch'),
+launchSpinner = launchForm.find('.skytap-spinner'),
+queueMessage = launchForm.find('.skytap-queue-message'),
+environmentList = launchForm.find('.skytap-environments'),
+resume = launchForm.find('.skytap-resume'),
+refreshButton = resume.find('.skytap-refresh'),
+launchXHR,
+launchStatusTimeout,
+retryCountdownInterval,
+consecutiveUnavailable = 0,
+openWhenReady = false,
+prefetching = false,
+prefetchFailed = false,
+placeholderWindow = null;
+var PREFETCH = Boolean(initArgs && initArgs.prefetch),
+MULTI_LAUNCH = Boolean(initArgs && initArgs.multi_launch),
+PREFETCH_TTL = (initArgs && initArgs.prefetch_ttl) || 0,
+STORAGE_KEY = 'skytap-launch:' + runtime.handlerUrl(element, 'launch');
+var LAUNCH_TIMEOUT = 60,
+LAUNCH_TIMEOUT_MARGIN = 2;
+var INITIAL_POLL_DELAY = 1000,
+POLL_BACKOFF = 1.5,
+MAX_POLL_DELAY = 10000;
+var INITIAL_RETRY_DELAY = 5,
+MAX_RETRY_DELAY = 300;
+launchSpinner.hide();
+if (resume.length) {
+setTimeout(function() {
+resume.hide();
+}, parseInt(resume.data('expires-in'), 10) * 1000);
+}
+function isMobile() {
+var isiOS = navigator.userAgent.match(/(iPod|iPhone|iPad)/i);
+var isAndroid = navigator.userAgent.match(/(android)/i);
+var isWindows = navigator.userAgent.match(/(Windows Phone|iemobile)/i);
+return Boolean(isiOS || isAndroid || isWindows);
+}
+function openPlaceholder() {
+if (MULTI_LAUNCH || isMobile() || (placeholderWindow && !placeholderWindow.closed)) {
+return;
+}
+placeholderWindow = window.open('', '_blank');
+if (placeholderWindow) {
+try {
+placeholderWindow.document.title = gettext('Launching your exercise environment...');
+placeholderWindow.document.body.textContent = gettext('Launching your exercise environment...');
+} catch (e) {
+}
+}
+}
+function closePlaceholder() {
+if (placeholderWindow) {
+placeholderWindow.close();
+placeholderWindow = null;
+}
+}
+function openSharingPortal(url) {
+if (isMobile()) {
+window.location = url;
+} else if (placeholderWindow && !placeholderWindow.closed) {
+placeholderWindow.location = url;
+placeholderWindow.focus();
+placeholderWindow = null;
+} else {
+var sharingPortal = window.open(url, '_blank');
+if (sharingPortal === undefined || sharingPortal === null) {
+alert(gettext("The browser's popup blocker prevented the exercise environment from being launched."));
+} else {
+sharingPortal.focus();
+}
+}
+}
+function getStoredUrl() {
+try {
+var entry = JSON.parse(window.sessionStorage.getItem(STORAGE_KEY));
+if (entry && entry.expires > Date.now()) {
+return entry.url;
+}
+window.sessionStorage.removeItem(STORAGE_KEY);
+} catch (e) {
+}
+return null;
+}
+function storeUrl(url) {
+if (!PREFETCH) {
+return;
+}
+try {
+window.sessionStorage.setItem(
+STORAGE_KEY, JSON.stringify({url: url, expires: Date.now() + PREFETCH_TTL * 1000})
+);
+} catch (e) {
+}
+}
+function clearStoredUrl() {
+try {
+window.sessionStorage.removeItem(STORAGE_KEY);
+} catch (e) {
+}
+}
+function showError(jqXHR) {
+var error;
+if (jqXHR.hasOwnProperty('responseJSON') && jqXHR.responseJSON.hasOwnProperty('error')) {
+error = jqXHR.responseJSON.error;
+} else {
+error = gettext('An unknown error occurred while launching.');
+}
+$('#skytap-error-message').text('Error: ' + error);
+}
+function finishLaunch() {
+launchXHR = null;
+prefetching = false;
+queueMessage.text('');
+launchSpinner.hide();
+launchButton.prop('disabled', false);
+}
+function formatWait(seconds) {
+var minutes = Math.ceil(seconds / 60);
+if (seconds < 60) {
+return ngettext('{seconds} second', '{seconds} seconds', seconds).replace('{seconds}', seconds);
+}
+return ngettext('{minutes} minute', '{minutes} minutes', minutes).replace('{minutes}', minutes);
+}
+function showQueueStatus(response) {
+if (response.status !== 'queued' || !openWhenReady) {
+queueMessage.text('');
+return;
+}
+queueMessage.text(
+gettext('Many learners are launching their exercise environments right now. ' +
+'You are number {position} in line; your environment should start launching in about {wait}.')
+.replace('{position}', response.position)
+.replace('{wait}', formatWait(response.eta))
+);
+}
+function showEnvironments(environments) {
+environmentList.empty();
+$.each(environments, function(index, environment) {
+var item = $('<li>');
+if (environment.sharing_portal_url) {
+item.append($('<a target="_blank" rel="noopener">')
+.attr('href', environment.sharing_portal_url)
+.text(environment.name));
+} else {
+item.addClass('skytap-environment-error').text(environment.name + ': ' + environment.error);
+}
+environmentList.append(item);
+});
+}
+function handleLaunchResponse(response, pollDelay) {
+if (response.environments) {
+consecutiveUnavailable = 0;
+closePlaceholder();
+showEnvironments(response.environments);
+finishLaunch();
+} else if (response.sharing_portal_url) {
+consecutiveUnavailable = 0;
+storeUrl(response.sharing_portal_url);
+if (openWhenReady) {
+openSharingPortal(response.sharing_portal_url);
+}
+finishLaunch();
+} else {
+showQueueStatus(response);
+launchStatusTimeout = setTimeout(function() {
+pollLaunchStatus(response.job_id, Math.min(pollDelay * POLL_BACKOFF, MAX_POLL_DELAY));
+}, pollDelay);
+}
+}
+function startRetryCountdown(jqXHR) {
+var retryAfter = parseInt(jqXHR.getResponseHeader('Retry-After'), 10) || 0,
+backoff = INITIAL_RETRY_DELAY * Math.pow(2, consecutiveUnavailable),
+remaining = Math.min(Math.max(retryAfter, backoff), MAX_RETRY_DELAY),
+errorMessage = $('#skytap-error-message');
+consecutiveUnavailable += 1;
+launchXHR = null;
+queueMessage.text('');
+launchSpinner.hide();
+function updateCountdown() {
+if (remaining <= 0) {
+clearInterval(retryCountdownInterval);
+errorMessage.text('');
+launchButton.prop('disabled', false);
+return;
+}
+errorMessage.text(ngettext(
+'The exercise environment service is busy. You can try again in {seconds} second.',
+'The exercise environment service is busy. You can try again in {seconds} seconds.',
+remaining
+).replace('{seconds}', remaining));
+remaining -= 1;
+}
+clearInterval(retryCountdownInterval);
+updateCountdown();
+retryCountdownInterval = setInterval(updateCountdown, 1000);
+}
+function handleLaunchError(jqXHR, textStatus) {
+if (textStatus === 'abort') {
+return;
+}
+if (!openWhenReady) {
+prefetchFailed = true;
+finishLaunch();
+return;
+}
+closePlaceholder();
+if (jqXHR.status === 503) {
+startRetryCountdown(jqXHR);
+} else if (textStatus === 'timeout') {
+$('#skytap-error-message').text(
+gettext('Launching the exercise environment took too long. Please try again.')
+);
+finishLaunch();
+} else {
+showError(jqXHR);
+finishLaunch();
+}
+}
+function pollLaunchStatus(jobId, pollDelay) {
+var handlerUrl = runtime.handlerUrl(element, 'launch_status');
+launchXHR = $.post(handlerUrl, JSON.stringify({job_id: jobId}))
+.success(function(response) {
+handleLaunchResponse(response, pollDelay);
+})
+.error(handleLaunchError);
+}
+function showLaunchInProgress() {
+launchSpinner.show();
+launchButton.prop('disabled', true);
+$('#skytap-error-message').text('');
+}
+function launch(data, open) {
+var handlerUrl = runtime.handlerUrl(element, 'launch');
+if (launchXHR) {
+launchXHR.abort();
+}
+clearTimeout(launchStatusTimeout);
+openWhenReady = open;
+prefetching = !open;
+if (open) {
+prefetchFailed = false;
+showLaunchInProgress();
+}
+launchXHR = $.ajax({
+type: 'POST',
+url: handlerUrl,
+data: JSON.stringify($.extend({timeout: LAUNCH_TIMEOUT - LAUNCH_TIMEOUT_MARGIN}, data)),
+timeout: LAUNCH_TIMEOUT * 1000
+})
+.success(function(response) {
+handleLaunchResponse(response, INITIAL_POLL_DELAY);
+})
+.error(handleLaunchError);
+}
+function prefetchLaunch() {
+if (!PREFETCH || prefetchFailed || launchXHR || launchButton.prop('disabled') || getStoredUrl()) {
+return;
+}
+launch({}, false);
+}
+launchButton.on('click', function(e) {
+e.preventDefault();
+var storedUrl = getStoredUrl();
+if (storedUrl) {
+openSharingPortal(storedUrl);
+return;
+}
+openPlaceholder();
+if (prefetching) {
+prefetching = false;
+openWhenReady = true;
+showLaunchInProgress();
+return;
+}
+launch({}, true);
+});
+refreshButton.on('click', function(e) {
+e.preventDefault();
+resume.hide();
+clearStoredUrl();
+openPlaceholder();
+launch({refresh: true}, true);
+});
+if (PREFETCH) {
+launchButton.on('mouseenter focus', prefetchLaunch);
+if (window.IntersectionObserver) {
+var visibilityObserver = new IntersectionObserver(function(entries) {
+for (var i = 0; i < entries.length; i++) {
+if (entries[i].isIntersecting) {
+visibilityObserver.disconnect();
+prefetchLaunch();
+return;
+}
+}
+});
+visibilityObserver.observe($(element)[0]);
+}
+}
+function SkytapDashboard(dashboard) {
+var rows = dashboard.find('.skytap-dashboard-table tbody'),
+userFilter = dashboard.find('.skytap-dashboard-user'),
+outcomeFilter = dashboard.find('.skytap-dashboard-outcome'),
+previousButton = dashboard.find('.skytap-dashboard-previous'),
+nextButton = dashboard.find('.skytap-dashboard-next'),
+pageLabel = dashboard.find('.skytap-dashboard-page'),
+errorMessage = dashboard.find('.skytap-dashboard-error'),
+currentPage = 1;
+function formatSeconds(seconds) {
+if (seconds === null) {
+return '\u2014';
+}
+return seconds < 60 ? seconds.toFixed(1) + ' s' : formatWait(Math.round(seconds));
+}
+function showLaunches(response) {
+rows.empty();
+$.each(response.launches, function(index, launch) {
+rows.append($('<tr>').append(
+$('<td>').text(launch.user),
+$('<td>').text(new Date(launch.launched_at * 1000).toLocaleString()),
+$('<td>').text(launch.outcome),
+$('<td>').text(formatSeconds(launch.latency)),
+$('<td>').text(formatSeconds(launch.url_age)),
+$('<td>').text(launch.launches)
+));
+});
+currentPage = response.page;
+pageLabel.text(
+gettext('Page {page} of {pages} ({total} learners)')
+.replace('{page}', response.page)
+.replace('{pages}', response.pages)
+.replace('{total}', response.total)
+);
+previousButton.prop('disabled', response.page <= 1);
+nextButton.prop('disabled', response.page >= response.pages);
+}
+function loadPage(page) {
+errorMessage.text('');
+$.post(runtime.handlerUrl(element, 'launch_history'), JSON.stringify({
+page: page,
+user: userFilter.val(),
+outcome: outcomeFilter.val()
+}))
+.success(showLaunches)
+.error(function(jqXHR) {
+var error = jqXHR.responseJSON && jqXHR.responseJSON.error;
+errorMessage.text(error || gettext('An unknown error occurred while loading launches.'));
+});
+}
+dashboard.find('.skytap-dashboard-filters').on('submit', function(e) {
+e.preventDefault();
+loadPage(1);
+});
+previousButton.on('click', function() {
+loadPage(currentPage - 1);
+});
+nextButton.on('click', function() {
+loadPage(currentPage + 1);
+});
+loadPage(1);
+}
+var dashboard = $('.skytap-dashboard', element);
+if (dashboard.length) {
+SkytapDashboard(dashboard);
+}
+}
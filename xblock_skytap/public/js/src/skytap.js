@@ -1,6 +1,6 @@
 /* Javascript for the Skytap XBlock. */
 
-function SkytapXBlock(runtime, element) {
+function SkytapXBlock(runtime, element, initArgs) {
     "use strict";
 
     // Set up gettext in case it isn't available in the client runtime:
@@ -12,67 +12,455 @@ function SkytapXBlock(runtime, element) {
     var launchForm = $('.skytap-launch-form', element),
         launchButton = launchForm.find('.skytap-launch'),
         launchSpinner = launchForm.find('.skytap-spinner'),
-        launchXHR;
+        queueMessage = launchForm.find('.skytap-queue-message'),
+        environmentList = launchForm.find('.skytap-environments'),
+        resume = launchForm.find('.skytap-resume'),
+        refreshButton = resume.find('.skytap-refresh'),
+        launchXHR,
+        launchStatusTimeout,
+        retryCountdownInterval,
+        consecutiveUnavailable = 0,
+        // Whether the launch in progress should open the sharing portal once it is ready;
+        // launches started by prefetching don't, unless the learner clicks the button in the meantime.
+        openWhenReady = false,
+        prefetching = false,
+        prefetchFailed = false,
+        // The window opened by the click that started the launch in progress, if any (see openPlaceholder).
+        placeholderWindow = null;
+
+    // If prefetching is enabled, launches start as soon as the block becomes visible, or the button is hovered
+    // or focused, and the sharing portal URL is kept in sessionStorage for PREFETCH_TTL seconds.
+    var PREFETCH = Boolean(initArgs && initArgs.prefetch),
+        MULTI_LAUNCH = Boolean(initArgs && initArgs.multi_launch),
+        PREFETCH_TTL = (initArgs && initArgs.prefetch_ttl) || 0,
+        STORAGE_KEY = 'skytap-launch:' + runtime.handlerUrl(element, 'launch');
+
+    // The browser gives up on a launch request after LAUNCH_TIMEOUT seconds, and asks the server to answer
+    // LAUNCH_TIMEOUT_MARGIN seconds before that, so that its response still arrives in time.
+    var LAUNCH_TIMEOUT = 60,
+        LAUNCH_TIMEOUT_MARGIN = 2;
+
+    // Polling of asynchronous launch jobs starts after INITIAL_POLL_DELAY milliseconds,
+    // and the delay grows by POLL_BACKOFF after every poll, up to MAX_POLL_DELAY milliseconds.
+    var INITIAL_POLL_DELAY = 1000,
+        POLL_BACKOFF = 1.5,
+        MAX_POLL_DELAY = 10000;
+
+    // While the launch service is unavailable (HTTP 503), the button stays disabled for the number of seconds
+    // requested by the server via Retry-After, or for an exponentially growing number of seconds
+    // starting at INITIAL_RETRY_DELAY, whichever is longer (but never longer than MAX_RETRY_DELAY).
+    var INITIAL_RETRY_DELAY = 5,
+        MAX_RETRY_DELAY = 300;
 
     // Prepare UI
     launchSpinner.hide();
 
-    // Set up click handler for button that allows learners to launch exercise environment
-    launchButton.on('click', function(e) {
-        e.preventDefault();
+    // The server only renders the link to the last sharing portal URL while it is valid;
+    // hide it once it expires if the learner stays on the page.
+    if (resume.length) {
+        setTimeout(function() {
+            resume.hide();
+        }, parseInt(resume.data('expires-in'), 10) * 1000);
+    }
+
+    /*
+     The standard behaviour is to open the exercise environment in a new tab using a popup,
+     to allow the user to keep the course tab open too. However on iOS devices for example,
+     popups are blocked by default and the user is not informed that the popup failed to open.
+     Therefore for iOS devices a redirect is used instead. For consistency this is done for all
+     mobile devices.
+     */
+    function isMobile() {
+        var isiOS = navigator.userAgent.match(/(iPod|iPhone|iPad)/i);
+        var isAndroid = navigator.userAgent.match(/(android)/i);
+        var isWindows = navigator.userAgent.match(/(Windows Phone|iemobile)/i);
+        return Boolean(isiOS || isAndroid || isWindows);
+    }
+
+    // Popup blockers only let a click open a window synchronously, but the sharing portal URL usually arrives
+    // later, so a click that has to wait for it opens an empty window right away, which is sent to the sharing
+    // portal once the URL arrives, or closed if the launch fails. Blocks that launch several environments
+    // list links instead of opening a window, and mobile devices are redirected, so neither needs one.
+    function openPlaceholder() {
+        if (MULTI_LAUNCH || isMobile() || (placeholderWindow && !placeholderWindow.closed)) {
+            return;
+        }
+        placeholderWindow = window.open('', '_blank');
+        if (placeholderWindow) {
+            try {
+                placeholderWindow.document.title = gettext('Launching your exercise environment...');
+                placeholderWindow.document.body.textContent = gettext('Launching your exercise environment...');
+            } catch (e) {
+                // Ignore windows whose document is not accessible; the sharing portal still loads in them.
+            }
+        }
+    }
+
+    function closePlaceholder() {
+        if (placeholderWindow) {
+            placeholderWindow.close();
+            placeholderWindow = null;
+        }
+    }
+
+    function openSharingPortal(url) {
+        if (isMobile()) {
+            // Simply redirect for mobile devices.
+            window.location = url;
+        } else if (placeholderWindow && !placeholderWindow.closed) {
+            placeholderWindow.location = url;
+            placeholderWindow.focus();
+            placeholderWindow = null;
+        } else {
+            // Desktop browsers offer an easy way to allow the popup so being blocked is ok.
+            var sharingPortal = window.open(url, '_blank');
+            if (sharingPortal === undefined || sharingPortal === null) {
+                // Need to test for both null (from desktop browsers blocking the popup)
+                // and also undefined (from mobile Safari refusing to show the popup).
+                alert(gettext("The browser's popup blocker prevented the exercise environment from being launched."));
+            } else {
+                sharingPortal.focus();
+            }
+        }
+    }
+
+    // sessionStorage may be unavailable (e.g. if the learner blocks site data), in which case nothing is stored.
+    function getStoredUrl() {
+        try {
+            var entry = JSON.parse(window.sessionStorage.getItem(STORAGE_KEY));
+            if (entry && entry.expires > Date.now()) {
+                return entry.url;
+            }
+            window.sessionStorage.removeItem(STORAGE_KEY);
+        } catch (e) {
+            // Ignore unavailable or corrupt storage.
+        }
+        return null;
+    }
+
+    function storeUrl(url) {
+        if (!PREFETCH) {
+            return;
+        }
+        try {
+            window.sessionStorage.setItem(
+                STORAGE_KEY, JSON.stringify({url: url, expires: Date.now() + PREFETCH_TTL * 1000})
+            );
+        } catch (e) {
+            // Ignore unavailable or full storage.
+        }
+    }
+
+    function clearStoredUrl() {
+        try {
+            window.sessionStorage.removeItem(STORAGE_KEY);
+        } catch (e) {
+            // Ignore unavailable storage.
+        }
+    }
+
+    function showError(jqXHR) {
+        var error;
+        if (jqXHR.hasOwnProperty('responseJSON') && jqXHR.responseJSON.hasOwnProperty('error')) {
+            error = jqXHR.responseJSON.error;
+        } else {
+            error = gettext('An unknown error occurred while launching.');
+        }
+        $('#skytap-error-message').text('Error: ' + error);
+    }
+
+    function finishLaunch() {
+        launchXHR = null;
+        prefetching = false;
+        queueMessage.text('');
+        launchSpinner.hide();
+        launchButton.prop('disabled', false);
+    }
+
+    function formatWait(seconds) {
+        var minutes = Math.ceil(seconds / 60);
+        if (seconds < 60) {
+            return ngettext('{seconds} second', '{seconds} seconds', seconds).replace('{seconds}', seconds);
+        }
+        return ngettext('{minutes} minute', '{minutes} minutes', minutes).replace('{minutes}', minutes);
+    }
+
+    // While admission control holds a launch back, show the learner's place in the queue and the expected wait.
+    function showQueueStatus(response) {
+        if (response.status !== 'queued' || !openWhenReady) {
+            queueMessage.text('');
+            return;
+        }
+        queueMessage.text(
+            gettext('Many learners are launching their exercise environments right now. ' +
+                    'You are number {position} in line; your environment should start launching in about {wait}.')
+                .replace('{position}', response.position)
+                .replace('{wait}', formatWait(response.eta))
+        );
+    }
+
+    // Browsers only let a click open a single popup, so blocks that launch several environments
+    // list a link to the sharing portal of each of them instead, along with the environments that failed.
+    function showEnvironments(environments) {
+        environmentList.empty();
+        $.each(environments, function(index, environment) {
+            var item = $('<li>');
+            if (environment.sharing_portal_url) {
+                item.append($('<a target="_blank" rel="noopener">')
+                    .attr('href', environment.sharing_portal_url)
+                    .text(environment.name));
+            } else {
+                item.addClass('skytap-environment-error').text(environment.name + ': ' + environment.error);
+            }
+            environmentList.append(item);
+        });
+    }
+
+    // The launch handler either returns the sharing portal URL (or the URLs of several environments) right away,
+    // or the ID of a background job that we need to poll until it is ready (possibly queued behind other launches).
+    function handleLaunchResponse(response, pollDelay) {
+        if (response.environments) {
+            consecutiveUnavailable = 0;
+            closePlaceholder();
+            showEnvironments(response.environments);
+            finishLaunch();
+        } else if (response.sharing_portal_url) {
+            consecutiveUnavailable = 0;
+            storeUrl(response.sharing_portal_url);
+            if (openWhenReady) {
+                openSharingPortal(response.sharing_portal_url);
+            }
+            finishLaunch();
+        } else {
+            showQueueStatus(response);
+            launchStatusTimeout = setTimeout(function() {
+                pollLaunchStatus(response.job_id, Math.min(pollDelay * POLL_BACKOFF, MAX_POLL_DELAY));
+            }, pollDelay);
+        }
+    }
+
+    function startRetryCountdown(jqXHR) {
+        var retryAfter = parseInt(jqXHR.getResponseHeader('Retry-After'), 10) || 0,
+            backoff = INITIAL_RETRY_DELAY * Math.pow(2, consecutiveUnavailable),
+            remaining = Math.min(Math.max(retryAfter, backoff), MAX_RETRY_DELAY),
+            errorMessage = $('#skytap-error-message');
+
+        consecutiveUnavailable += 1;
+        launchXHR = null;
+        queueMessage.text('');
+        launchSpinner.hide();
+
+        function updateCountdown() {
+            if (remaining <= 0) {
+                clearInterval(retryCountdownInterval);
+                errorMessage.text('');
+                launchButton.prop('disabled', false);
+                return;
+            }
+            errorMessage.text(ngettext(
+                'The exercise environment service is busy. You can try again in {seconds} second.',
+                'The exercise environment service is busy. You can try again in {seconds} seconds.',
+                remaining
+            ).replace('{seconds}', remaining));
+            remaining -= 1;
+        }
+
+        clearInterval(retryCountdownInterval);
+        updateCountdown();
+        retryCountdownInterval = setInterval(updateCountdown, 1000);
+    }
 
+    function handleLaunchError(jqXHR, textStatus) {
+        if (textStatus === 'abort') {
+            return;
+        }
+        if (!openWhenReady) {
+            // Failed prefetches stay silent, and are not retried until the learner clicks the button.
+            prefetchFailed = true;
+            finishLaunch();
+            return;
+        }
+        closePlaceholder();
+        if (jqXHR.status === 503) {
+            startRetryCountdown(jqXHR);
+        } else if (textStatus === 'timeout') {
+            $('#skytap-error-message').text(
+                gettext('Launching the exercise environment took too long. Please try again.')
+            );
+            finishLaunch();
+        } else {
+            showError(jqXHR);
+            finishLaunch();
+        }
+    }
+
+    function pollLaunchStatus(jobId, pollDelay) {
+        var handlerUrl = runtime.handlerUrl(element, 'launch_status');
+
+        launchXHR = $.post(handlerUrl, JSON.stringify({job_id: jobId}))
+            .success(function(response) {
+                handleLaunchResponse(response, pollDelay);
+            })
+            .error(handleLaunchError);
+    }
+
+    function showLaunchInProgress() {
+        launchSpinner.show();
+        launchButton.prop('disabled', true);
+        $('#skytap-error-message').text('');
+    }
+
+    function launch(data, open) {
         var handlerUrl = runtime.handlerUrl(element, 'launch');
 
         if (launchXHR) {
             launchXHR.abort();
         }
+        clearTimeout(launchStatusTimeout);
 
-        launchSpinner.show();
-        launchButton.prop('disabled', true);
+        openWhenReady = open;
+        prefetching = !open;
+        if (open) {
+            prefetchFailed = false;
+            showLaunchInProgress();
+        }
 
-        launchXHR = $.post(handlerUrl, JSON.stringify({}))
+        launchXHR = $.ajax({
+            type: 'POST',
+            url: handlerUrl,
+            data: JSON.stringify($.extend({timeout: LAUNCH_TIMEOUT - LAUNCH_TIMEOUT_MARGIN}, data)),
+            timeout: LAUNCH_TIMEOUT * 1000
+        })
             .success(function(response) {
-                var url = response.sharing_portal_url;
-
-                /*
-                 The standard behaviour is to open the exercise environment in a new tab using a popup,
-                 to allow the user to keep the course tab open too. However on iOS devices for example,
-                 popups are blocked by default and the user is not informed that the popup failed to open.
-                 Therefore for iOS devices a redirect is used instead. For consistency this is done for all
-                 mobile devices.
-                 */
-                var isiOS = navigator.userAgent.match(/(iPod|iPhone|iPad)/i);
-                var isAndroid = navigator.userAgent.match(/(android)/i);
-                var isWindows = navigator.userAgent.match(/(Windows Phone|iemobile)/i);
-                if (isiOS || isAndroid || isWindows) {
-                    // Simply redirect for mobile devices.
-                    window.location = url;
-                } else {
-                    // Desktop browsers offer an easy way to allow the popup so being blocked is ok.
-                    var sharingPortal = window.open(url, '_blank');
-                    if (sharingPortal === undefined || sharingPortal === null) {
-                        // Need to test for both null (from desktop browsers blocking the popup)
-                        // and also undefined (from mobile Safari refusing to show the popup).
-                        alert(gettext("The browser's popup blocker prevented the exercise environment from being launched."));
-                    } else {
-                        sharingPortal.focus();
-                    }
-                }
+                handleLaunchResponse(response, INITIAL_POLL_DELAY);
             })
-            .error(function(jqXHR, textStatus, errorThrown) {
-                var error;
-                if (jqXHR.hasOwnProperty('responseJSON') && jqXHR.responseJSON.hasOwnProperty('error')) {
-                    error = jqXHR.responseJSON.error;
-                } else {
-                    error = gettext('An unknown error occurred while launching.');
+            .error(handleLaunchError);
+    }
+
+    function prefetchLaunch() {
+        if (!PREFETCH || prefetchFailed || launchXHR || launchButton.prop('disabled') || getStoredUrl()) {
+            return;
+        }
+        launch({}, false);
+    }
+
+    // Set up click handler for button that allows learners to launch exercise environment
+    launchButton.on('click', function(e) {
+        e.preventDefault();
+
+        // Opening the sharing portal synchronously in the click handler keeps popup blockers quiet.
+        var storedUrl = getStoredUrl();
+        if (storedUrl) {
+            openSharingPortal(storedUrl);
+            return;
+        }
+        openPlaceholder();
+        // Let a prefetch in progress finish instead of starting over.
+        if (prefetching) {
+            prefetching = false;
+            openWhenReady = true;
+            showLaunchInProgress();
+            return;
+        }
+        launch({}, true);
+    });
+
+    // Set up click handler for button that forces a new launch instead of resuming the last sharing portal URL
+    refreshButton.on('click', function(e) {
+        e.preventDefault();
+        resume.hide();
+        clearStoredUrl();
+        openPlaceholder();
+        launch({refresh: true}, true);
+    });
+
+    if (PREFETCH) {
+        launchButton.on('mouseenter focus', prefetchLaunch);
+        if (window.IntersectionObserver) {
+            var visibilityObserver = new IntersectionObserver(function(entries) {
+                for (var i = 0; i < entries.length; i++) {
+                    if (entries[i].isIntersecting) {
+                        visibilityObserver.disconnect();
+                        prefetchLaunch();
+                        return;
+                    }
                 }
-                $('#skytap-error-message').text('Error: ' + error);
-            })
-            .complete(function() {
-                launchSpinner.hide();
-                launchButton.prop('disabled', false);
             });
+            visibilityObserver.observe($(element)[0]);
+        }
+    }
+
+    // Staff members see the latest launch of every learner of the course run, one page at a time.
+    function SkytapDashboard(dashboard) {
+        var rows = dashboard.find('.skytap-dashboard-table tbody'),
+            userFilter = dashboard.find('.skytap-dashboard-user'),
+            outcomeFilter = dashboard.find('.skytap-dashboard-outcome'),
+            previousButton = dashboard.find('.skytap-dashboard-previous'),
+            nextButton = dashboard.find('.skytap-dashboard-next'),
+            pageLabel = dashboard.find('.skytap-dashboard-page'),
+            errorMessage = dashboard.find('.skytap-dashboard-error'),
+            currentPage = 1;
+
+        function formatSeconds(seconds) {
+            if (seconds === null) {
+                return '\u2014';
+            }
+            return seconds < 60 ? seconds.toFixed(1) + ' s' : formatWait(Math.round(seconds));
+        }
+
+        function showLaunches(response) {
+            rows.empty();
+            $.each(response.launches, function(index, launch) {
+                rows.append($('<tr>').append(
+                    $('<td>').text(launch.user),
+                    $('<td>').text(new Date(launch.launched_at * 1000).toLocaleString()),
+                    $('<td>').text(launch.outcome),
+                    $('<td>').text(formatSeconds(launch.latency)),
+                    $('<td>').text(formatSeconds(launch.url_age)),
+                    $('<td>').text(launch.launches)
+                ));
+            });
+            currentPage = response.page;
+            pageLabel.text(
+                gettext('Page {page} of {pages} ({total} learners)')
+                    .replace('{page}', response.page)
+                    .replace('{pages}', response.pages)
+                    .replace('{total}', response.total)
+            );
+            previousButton.prop('disabled', response.page <= 1);
+            nextButton.prop('disabled', response.page >= response.pages);
+        }
 
-    });
+        function loadPage(page) {
+            errorMessage.text('');
+            $.post(runtime.handlerUrl(element, 'launch_history'), JSON.stringify({
+                page: page,
+                user: userFilter.val(),
+                outcome: outcomeFilter.val()
+            }))
+                .success(showLaunches)
+                .error(function(jqXHR) {
+                    var error = jqXHR.responseJSON && jqXHR.responseJSON.error;
+                    errorMessage.text(error || gettext('An unknown error occurred while loading launches.'));
+                });
+        }
+
+        dashboard.find('.skytap-dashboard-filters').on('submit', function(e) {
+            e.preventDefault();
+            loadPage(1);
+        });
+        previousButton.on('click', function() {
+            loadPage(currentPage - 1);
+        });
+        nextButton.on('click', function() {
+            loadPage(currentPage + 1);
+        });
+        loadPage(1);
+    }
+
+    var dashboard = $('.skytap-dashboard', element);
+    if (dashboard.length) {
+        SkytapDashboard(dashboard);
+    }
 
 }
@@ -0,0 +1,262 @@
+"""
+Reaper of idle Skytap environments.
+
+Environments that learners forget to shut down keep using the Skytap quota that new launches need.
+The reaper reads the launch log (see launchlog.py, which must be enabled and shared with the LMS) to find
+the environments that were not launched for `idle_timeout` seconds, and asks Boomi to suspend (or shut down)
+them, in batches, through a bounded pool of workers with rate limiting. Reclaimed environments are recorded
+in the launch log, so they are not reclaimed again until they are launched anew.
+
+Batches are posted to the `endpoint` path of every Boomi endpoint of the block's Boomi configuration,
+with the same credentials as launches::
+
+    {"action": "suspend", "environments": [{"email": "...", "course_name": "...", "course_run": "..."}, ...]}
+
+Boomi answers with the usual "ErrorExists"/"ErrorMessage" fields. Run the reaper periodically with the
+`skytap-reap` command::
+
+    skytap-reap --settings skytap.json --idle-timeout 14400 --interval 600
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+from .boomi import decode_response, launch_payload, make_idempotency_key, raise_for_boomi_error
+from .config import compile_boomi_configuration
+from .exceptions import (BoomiConfigurationInvalidError, BoomiLaunchError,
+                         BoomiMalformedResponseError, BoomiUnavailableError)
+from .launchlog import OUTCOME_RECLAIMED, get_launch_log, launch_log_enabled
+from .provision import load_xblock_settings
+from .routing import get_boomi_router
+from .utils import TokenBucket
+
+# Globals ###########################################################
+
+ACTION_SUSPEND = "suspend"
+ACTION_SHUTDOWN = "shutdown"
+ACTIONS = (ACTION_SUSPEND, ACTION_SHUTDOWN)
+
+DEFAULT_IDLE_TIMEOUT = 4 * 3600
+DEFAULT_ENDPOINT = "/ws/simple/suspendVm"
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_CONCURRENCY = 2
+DEFAULT_RATE = 1
+DEFAULT_MAX_ENVIRONMENTS = 1000
+
+# Classes ###########################################################
+
+
+class Reaper(object):
+    """
+    Reclaim idle environments recorded in the launch log through Boomi.
+
+    Options default to the "reaper" entry of `xblock_settings`: "idle_timeout" (seconds), "action"
+    ("suspend" or "shutdown"), "endpoint" (path of the Boomi endpoint), "batch_size" (environments per request),
+    "concurrency" (requests in flight), "rate" (requests per second, 0 for no limit) and "max_environments"
+    (environments reclaimed per run).
+    """
+
+    def __init__(self, xblock_settings, **options):
+        if not launch_log_enabled(xblock_settings):
+            raise ValueError("The reaper needs the launch log to be enabled.")
+        reaper_configuration = dict(xblock_settings.get("reaper", {}))
+        reaper_configuration.update((name, value) for name, value in options.items() if value is not None)
+
+        self.idle_timeout = reaper_configuration.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)
+        self.action = reaper_configuration.get("action", ACTION_SUSPEND)
+        if self.action not in ACTIONS:
+            raise ValueError("The reaper action must be one of: {}".format(", ".join(ACTIONS)))
+        self.batch_size = reaper_configuration.get("batch_size", DEFAULT_BATCH_SIZE)
+        self.concurrency = reaper_configuration.get("concurrency", DEFAULT_CONCURRENCY)
+        rate = reaper_configuration.get("rate", DEFAULT_RATE)
+        self.rate_limiter = TokenBucket(rate, capacity=1) if rate else None
+        self.max_environments = reaper_configuration.get("max_environments", DEFAULT_MAX_ENVIRONMENTS)
+
+        self.launch_log = get_launch_log(xblock_settings)
+        self.router = get_boomi_router(compile_boomi_configuration(reaper_boomi_configuration(
+            xblock_settings.get("boomi_configuration", {}), reaper_configuration.get("endpoint", DEFAULT_ENDPOINT)
+        )))
+
+    def idle_environments(self, now=None):
+        """
+        Return the environments that have been idle for longer than the idle timeout.
+        """
+        return self.launch_log.idle_environments((now or time.time()) - self.idle_timeout, self.max_environments)
+
+    def reclaim_batch(self, batch):
+        """
+        Ask Boomi to reclaim the environments in `batch`, record them as reclaimed if it did, and return the result.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        result = {"environments": batch}
+        started = time.time()
+        try:
+            payload = {
+                "action": self.action,
+                "environments": [
+                    launch_payload(environment["user"], *split_course_run(environment["course_run"]))
+                    for environment in batch
+                ],
+            }
+            raise_for_boomi_error(decode_response(self.router.post(payload, make_idempotency_key())))
+        except (BoomiUnavailableError, BoomiMalformedResponseError, BoomiLaunchError) as exc:
+            result["error"] = str(exc)
+        except InvalidKeyError as exc:
+            result["error"] = "The launch log contains an invalid course key: {}".format(exc)
+        else:
+            for environment in batch:
+                self.launch_log.append(environment["course_run"], environment["user"], OUTCOME_RECLAIMED)
+        result["latency"] = time.time() - started
+        return result
+
+    def run(self, now=None, dry_run=False, progress=None):
+        """
+        Reclaim the environments that are idle at `now` (a timestamp; the current time by default),
+        and return a report of the reclaimed capacity. `progress` is called with the result of each batch.
+
+        With `dry_run`, only report the idle environments.
+        """
+        now = now or time.time()
+        started = time.time()
+        environments = self.idle_environments(now)
+        report = {
+            "action": self.action,
+            "idle": len(environments),
+            "reclaimed": 0,
+            "failed": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "idle_hours": 0.0,
+            "course_runs": {},
+            "errors": [],
+        }
+        if dry_run:
+            report["elapsed"] = time.time() - started
+            return report
+
+        batches = [
+            environments[index:index + self.batch_size] for index in range(0, len(environments), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self.reclaim_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                result = future.result()
+                report["batches"] += 1
+                if "error" in result:
+                    report["failed_batches"] += 1
+                    report["failed"] += len(result["environments"])
+                    if result["error"] not in report["errors"]:
+                        report["errors"].append(result["error"])
+                else:
+                    for environment in result["environments"]:
+                        report["reclaimed"] += 1
+                        # Time the environment had been left running since its last launch.
+                        report["idle_hours"] += (now - environment["launched_at"]) / 3600.0
+                        course_run = environment["course_run"]
+                        report["course_runs"][course_run] = report["course_runs"].get(course_run, 0) + 1
+                if progress:
+                    progress(result)
+        report["elapsed"] = time.time() - started
+        return report
+
+
+# Functions #########################################################
+
+def reaper_boomi_configuration(boomi_configuration, endpoint):
+    """
+    Return a copy of `boomi_configuration` whose endpoints post to the `endpoint` path instead,
+    with the same base URLs and credentials.
+    """
+    reaper_configuration = dict(boomi_configuration, endpoint=endpoint)
+    if isinstance(boomi_configuration.get("endpoints"), list):
+        reaper_configuration["endpoints"] = [
+            dict(settings, endpoint=endpoint) if isinstance(settings, dict) else settings
+            for settings in boomi_configuration["endpoints"]
+        ]
+    return reaper_configuration
+
+
+def split_course_run(course_run):
+    """
+    Return the course name and course run of a course run of the launch log, identified by its full course key.
+
+    Raise InvalidKeyError if it is not a valid course key.
+    """
+    course_key = CourseKey.from_string(course_run)
+    return course_key.course, course_key.run
+
+
+def summarize(report):
+    """
+    Return a human-readable version of the `report` of a reaper run.
+    """
+    lines = [
+        "Idle environments: {idle}".format(**report),
+        "Reclaimed ({action}): {reclaimed}".format(**report),
+        "Failed: {failed} ({failed_batches} of {batches} batches)".format(**report),
+        "Idle time reclaimed: {idle_hours:.1f} environment hours".format(**report),
+        "Elapsed: {elapsed:.1f}s".format(**report),
+    ]
+    for course_run, reclaimed in sorted(report["course_runs"].items()):
+        lines.append("  {course_run}: {reclaimed}".format(course_run=course_run, reclaimed=reclaimed))
+    for error in report["errors"]:
+        lines.append("  ERROR {error}".format(error=error))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Entry point of the `skytap-reap` command.
+    """
+    parser = argparse.ArgumentParser(description="Suspend or shut down idle Skytap environments.")
+    parser.add_argument("--settings", help="JSON file containing the Skytap XBlock settings")
+    parser.add_argument("--idle-timeout", type=int, help="seconds after the last launch an environment is idle")
+    parser.add_argument("--action", choices=ACTIONS, help="what to do with idle environments")
+    parser.add_argument("--batch-size", type=int, help="environments per Boomi request")
+    parser.add_argument("--concurrency", type=int, help="number of parallel requests")
+    parser.add_argument("--rate", type=float, help="maximum requests per second (0: no limit)")
+    parser.add_argument("--interval", type=int, help="run every INTERVAL seconds instead of once")
+    parser.add_argument("--dry-run", action="store_true", help="only report the idle environments")
+    args = parser.parse_args(argv)
+
+    try:
+        reaper = Reaper(
+            load_xblock_settings(args.settings),
+            idle_timeout=args.idle_timeout,
+            action=args.action,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            rate=args.rate,
+        )
+    except (IOError, ValueError, BoomiConfigurationInvalidError) as exc:
+        parser.error(str(exc))
+
+    def progress(result):
+        """
+        Report the outcome of a single batch.
+        """
+        sys.stderr.write("{status} batch of {count}\n".format(
+            status="FAILED" if "error" in result else "OK", count=len(result["environments"])
+        ))
+
+    while True:
+        report = reaper.run(dry_run=args.dry_run, progress=progress)
+        print(summarize(report))
+        if not args.interval:
+            return 1 if report["failed"] else 0
+        sys.stdout.flush()
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
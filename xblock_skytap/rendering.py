@@ -0,0 +1,140 @@
+"""
+Cached rendering of the Skytap XBlock's student view.
+
+Rendering the student view through `ResourceLoader.render_django_template` loads the template
+from the package, builds a template engine, parses the template and sets up the i18n tags on every page view.
+Here, templates are compiled once per process (and again whenever the template file changes),
+and rendered fragments are kept in a bounded cache keyed by the template, the active language,
+and the context, so course units with many Skytap blocks don't pay for rendering more than once.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+import threading
+
+import pkg_resources
+
+from .cache import InProcessCache
+
+# Globals ###########################################################
+
+DEFAULT_FRAGMENT_CACHE_MAX_SIZE = 256
+
+TEMPLATE_LIBRARIES = {
+    "i18n": "xblockutils.templatetags.i18n",
+}
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+# Rendered fragments don't expire; they are only evicted when the cache is full.
+_fragments = InProcessCache(max_size=DEFAULT_FRAGMENT_CACHE_MAX_SIZE, ttl=0)
+
+_resource_urls = {}
+
+# Classes ###########################################################
+
+
+class CompiledTemplate(object):
+    """
+    Django template compiled from a package resource, along with the modification time and digest of its source.
+    """
+
+    __slots__ = ("mtime", "digest", "template")
+
+    def __init__(self, mtime, digest, template):
+        self.mtime = mtime
+        self.digest = digest
+        self.template = template
+
+
+# Functions #########################################################
+
+def _template_mtime(module_name, template_path):
+    """
+    Return the modification time of the template, or None if it is not a file (e.g. in a zipped egg).
+    """
+    try:
+        return os.path.getmtime(pkg_resources.resource_filename(module_name, template_path))
+    except (OSError, NotImplementedError):
+        return None
+
+
+def _compile_template(module_name, template_path, mtime):
+    """
+    Load the template at `template_path` relative to `module_name`, and compile it.
+    """
+    # Importing Django is deferred until the first rendering, like in ResourceLoader.
+    from django.template import Engine, Template  # pylint: disable=import-outside-toplevel
+    from django.template.backends.django import get_installed_libraries  # pylint: disable=import-outside-toplevel
+
+    source = pkg_resources.resource_string(module_name, template_path)
+    libraries = get_installed_libraries()
+    libraries.update(TEMPLATE_LIBRARIES)
+    template = Template(source.decode("utf-8"), engine=Engine(libraries=libraries))
+    return CompiledTemplate(mtime, hashlib.sha1(source).hexdigest(), template)
+
+
+def get_template(module_name, template_path):
+    """
+    Return the CompiledTemplate for `template_path`, compiling it if it is new or has changed since it was compiled.
+    """
+    key = (module_name, template_path)
+    mtime = _template_mtime(module_name, template_path)
+    compiled = _templates.get(key)
+    if compiled is None or compiled.mtime != mtime:
+        with _templates_lock:
+            compiled = _templates.get(key)
+            if compiled is None or compiled.mtime != mtime:
+                compiled = _compile_template(module_name, template_path, mtime)
+                _templates[key] = compiled
+    return compiled
+
+
+def render_template(module_name, template_path, context, cache=True):
+    """
+    Render the template at `template_path` with `context`, whose values must be hashable.
+
+    Rendered templates are cached by template digest, active language and context, unless `cache` is False
+    (e.g. for contexts specific to a learner, which would only crowd out the shared entries).
+    """
+    from django.template import Context  # pylint: disable=import-outside-toplevel
+    from django.utils.translation import get_language  # pylint: disable=import-outside-toplevel
+
+    compiled = get_template(module_name, template_path)
+    if not cache:
+        return compiled.template.render(Context(dict(context, _i18n_service=None)))
+    key = (template_path, compiled.digest, get_language(), tuple(sorted(context.items())))
+    rendered = _fragments.get(key)
+    if rendered is None:
+        rendered = compiled.template.render(Context(dict(context, _i18n_service=None)))
+        _fragments.set(key, rendered)
+    return rendered
+
+
+def local_resource_url(block, uri):
+    """
+    Return the URL of the local resource `uri` of `block`.
+
+    The URL only depends on the class of the runtime and on the block type, so it is only resolved once per process.
+    """
+    key = (type(block.runtime), block.scope_ids.block_type, uri)
+    url = _resource_urls.get(key)
+    if url is None:
+        url = block.runtime.local_resource_url(block, uri)
+        _resource_urls[key] = url
+    return url
+
+
+def clear_caches():
+    """
+    Forget all compiled templates, rendered fragments and resource URLs.
+    """
+    with _templates_lock:
+        _templates.clear()
+    _fragments.clear()
+    _resource_urls.clear()
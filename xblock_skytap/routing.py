@@ -0,0 +1,330 @@
+"""
+Latency-aware routing of Boomi requests across several endpoints.
+
+When several Boomi endpoints are configured (e.g. atoms in different regions), every request goes
+to the healthy endpoint with the lowest moving average of recent latencies. If an endpoint fails,
+the request fails over to the next one; endpoints that failed several times in a row are only used
+as a last resort for a while. Course runs can be restricted to some endpoints with "routes", whose keys
+are "<org>/<course>/<run>", "<org>/<course>" or "<org>" (the most specific one wins).
+
+Optionally, requests are hedged: if the first endpoint has not answered after the configured percentile
+of its recent latencies, the same request is sent to the next endpoint, and whichever answers first wins.
+Both requests carry the same idempotency key, so Boomi can recognize the duplicate.
+
+The read timeout of a request adapts to its endpoint as well: once enough requests were answered, it is
+a multiple of the configured percentile of their latencies, between "min_read_timeout" and "read_timeout".
+Requests that time out count as latencies of their timeout, so the timeout grows again when Boomi slows down.
+Requests that carry a deadline never wait past it, and don't fail over or hedge once it has passed.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .boomi import get_boomi_client, make_idempotency_key
+from .config import MAX_COMPILED_CONFIGURATIONS
+from .exceptions import BoomiTimeoutError, BoomiUnavailableError, DeadlineExceededError
+from .metrics import LatencyHistogram
+from .utils import course_key_patterns, time_left
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+# Weight of the latest latency in the moving average.
+EWMA_SMOOTHING = 0.3
+
+# Hedging and adaptive timeouts only start once the latency percentiles of an endpoint are based on this many requests.
+MIN_PERCENTILE_SAMPLES = 20
+# Latency percentiles are based on the last HISTOGRAM_WINDOW to 2 * HISTOGRAM_WINDOW requests.
+HISTOGRAM_WINDOW = 500
+
+# Hedged requests run in threads; this bounds the number of concurrent requests per router.
+MAX_HEDGING_WORKERS = 20
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class EndpointHealth(object):
+    """
+    Latency and failures of recent requests to a Boomi endpoint.
+    """
+
+    def __init__(self):
+        self.ewma = None
+        self.consecutive_failures = 0
+        self.failed_at = None
+        self._histogram = LatencyHistogram()
+        self._previous_histogram = None
+        self._lock = threading.Lock()
+
+    def record_success(self, latency):
+        """
+        Record a request that was answered after `latency` seconds.
+        """
+        with self._lock:
+            self.ewma = latency if self.ewma is None else self.ewma + EWMA_SMOOTHING * (latency - self.ewma)
+            self.consecutive_failures = 0
+            self._histogram.record(latency)
+            if self._histogram.count >= HISTOGRAM_WINDOW:
+                self._previous_histogram, self._histogram = self._histogram, LatencyHistogram()
+
+    def record_timeout(self, timeout):
+        """
+        Record a request that timed out after `timeout` seconds.
+
+        Its latency is at least `timeout`, so it counts as a (censored) latency sample as well as a failure;
+        otherwise adaptive timeouts could never grow again once they are shorter than the actual latencies.
+        """
+        with self._lock:
+            self._histogram.record(timeout)
+            if self._histogram.count >= HISTOGRAM_WINDOW:
+                self._previous_histogram, self._histogram = self._histogram, LatencyHistogram()
+        self.record_failure()
+
+    def record_failure(self):
+        """
+        Record a request that failed.
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            self.failed_at = time.time()
+
+    def is_healthy(self, failure_threshold, failure_cooldown):
+        """
+        Return False if the endpoint failed `failure_threshold` times in a row, less than `failure_cooldown` ago.
+        """
+        return (
+            self.consecutive_failures < failure_threshold or
+            time.time() - self.failed_at >= failure_cooldown
+        )
+
+    def percentile(self, percent):
+        """
+        Return the given percentile of recent latencies, or None if there were too few requests.
+        """
+        with self._lock:
+            histogram = self._histogram
+            if histogram.count < MIN_PERCENTILE_SAMPLES and self._previous_histogram is not None:
+                histogram = self._previous_histogram
+            if histogram.count < MIN_PERCENTILE_SAMPLES:
+                return None
+            return histogram.percentile(percent)
+
+
+class BoomiRouter(object):
+    """
+    Send Boomi requests to the endpoints of the compiled BoomiConfiguration `configuration` using `client`.
+    """
+
+    def __init__(self, configuration, client):
+        self.configuration = configuration
+        self.client = client
+        routing_options = dict(configuration.routing_options)
+        self.hedge_percentile = routing_options["hedge_percentile"]
+        self.hedge_min_delay = routing_options["hedge_min_delay"]
+        self.timeout_percentile = routing_options["timeout_percentile"]
+        self.timeout_multiplier = routing_options["timeout_multiplier"]
+        self.min_read_timeout = routing_options["min_read_timeout"]
+        self.max_read_timeout = dict(configuration.client_options)["read_timeout"]
+        self.failure_threshold = routing_options["failure_threshold"]
+        self.failure_cooldown = routing_options["failure_cooldown"]
+        self.health = {endpoint.name: EndpointHealth() for endpoint in configuration.endpoints}
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def candidates(self, course_key=None):
+        """
+        Return the endpoints that may serve the course run identified by the (org, course, run) `course_key`,
+        best first.
+        """
+        endpoints = self.configuration.endpoints
+        names = route_endpoint_names(self.configuration.routes, course_key)
+        if names is not None:
+            endpoints = [endpoint for endpoint in endpoints if endpoint.name in names]
+
+        def sort_key(endpoint):
+            """
+            Sort healthy endpoints first, then by average latency; endpoints without requests yet go first.
+            """
+            health = self.health[endpoint.name]
+            return (not health.is_healthy(self.failure_threshold, self.failure_cooldown), health.ewma or 0)
+
+        return sorted(endpoints, key=sort_key)
+
+    def read_timeout(self, endpoint):
+        """
+        Return the read timeout for requests to `endpoint`, based on its recent latencies,
+        or None to use the read timeout of the client.
+        """
+        if self.timeout_percentile is None:
+            return None
+        percentile = self.health[endpoint.name].percentile(self.timeout_percentile)
+        if percentile is None:
+            return None
+        return min(max(percentile * self.timeout_multiplier, self.min_read_timeout), self.max_read_timeout)
+
+    def _post(self, endpoint, payload, idempotency_key, deadline=None):
+        """
+        Send `payload` to `endpoint`, recording the latency or failure.
+        """
+        started = time.time()
+        read_timeout = self.read_timeout(endpoint)
+        timeout = read_timeout if read_timeout is not None else self.max_read_timeout
+        # A request cut short by the deadline says nothing about the latency of the endpoint.
+        left = time_left(deadline)
+        deadline_capped = left is not None and left < timeout
+        try:
+            response = self.client.post(
+                endpoint.url,
+                payload,
+                idempotency_key=idempotency_key,
+                headers=endpoint.headers,
+                read_timeout=read_timeout,
+                deadline=deadline,
+            )
+        except DeadlineExceededError:
+            # The request was not even sent, which says nothing about the health of the endpoint.
+            raise
+        except BoomiTimeoutError:
+            if deadline_capped:
+                self.health[endpoint.name].record_failure()
+            else:
+                self.health[endpoint.name].record_timeout(min(timeout, time.time() - started))
+            raise
+        except BoomiUnavailableError:
+            self.health[endpoint.name].record_failure()
+            raise
+        self.health[endpoint.name].record_success(time.time() - started)
+        # Let the caller know which endpoint answered, e.g. for the audit log.
+        response.boomi_endpoint = endpoint.name
+        return response
+
+    def hedge_delay(self, endpoint):
+        """
+        Return the number of seconds after which to hedge a request to `endpoint`, or None not to hedge it.
+        """
+        if self.hedge_percentile is None:
+            return None
+        percentile = self.health[endpoint.name].percentile(self.hedge_percentile)
+        if percentile is None:
+            return None
+        return max(percentile, self.hedge_min_delay)
+
+    def post(self, payload, idempotency_key=None, course_key=None, deadline=None):
+        """
+        Send `payload` to the best endpoint for `course_key`, failing over to the next ones, and return the response.
+
+        Raise BoomiTimeoutError or BoomiUnavailableError if all endpoints fail,
+        and DeadlineExceededError if the `deadline` (in seconds since the epoch) passes first.
+        """
+        idempotency_key = idempotency_key or make_idempotency_key()
+        candidates = self.candidates(course_key)
+        if self.hedge_percentile is not None and len(candidates) > 1:
+            return self._post_hedged(candidates, payload, idempotency_key, deadline)
+
+        error = None
+        for endpoint in candidates:
+            try:
+                return self._post(endpoint, payload, idempotency_key, deadline)
+            except DeadlineExceededError as exc:
+                # Report the failure of the previous endpoint, if any, rather than the deadline it used up.
+                raise error or exc
+            except BoomiUnavailableError as exc:
+                log.warning("Boomi endpoint %s failed (%s).", endpoint.name, exc)
+                error = exc
+        raise error
+
+    def _get_executor(self):
+        """
+        Return the executor running hedged requests.
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=MAX_HEDGING_WORKERS)
+        return self._executor
+
+    def _post_hedged(self, candidates, payload, idempotency_key, deadline=None):
+        """
+        Send `payload` to the first of the `candidates`, and to the next one if the first one is slow or fails.
+        Return the first successful response.
+        """
+        executor = self._get_executor()
+        remaining = list(candidates)
+        pending = {}
+        error = None
+
+        def send_next():
+            """
+            Send the request to the next endpoint.
+            """
+            endpoint = remaining.pop(0)
+            pending[executor.submit(self._post, endpoint, payload, idempotency_key, deadline)] = endpoint
+
+        send_next()
+        hedged = False
+        while pending:
+            timeout = None
+            if not hedged and remaining:
+                timeout = self.hedge_delay(next(iter(pending.values())))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                log.info("Hedging Boomi request %s to endpoint %s.", idempotency_key, remaining[0].name)
+                send_next()
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    return future.result()
+                except DeadlineExceededError as exc:
+                    raise error or exc
+                except BoomiUnavailableError as exc:
+                    log.warning("Boomi endpoint %s failed (%s).", endpoint.name, exc)
+                    error = exc
+            if not pending and remaining:
+                send_next()
+        raise error
+
+
+# Functions #########################################################
+
+def route_endpoint_names(routes, course_key):
+    """
+    Return the names of the endpoints that `routes` assign to the (org, course, run) `course_key`,
+    or None if no route applies.
+    """
+    if not routes or course_key is None:
+        return None
+    for route in course_key_patterns(course_key):
+        if route in routes:
+            return routes[route]
+    return None
+
+
+def get_boomi_router(configuration):
+    """
+    Return the process-wide router for the compiled BoomiConfiguration `configuration`.
+
+    The router keeps track of the latency and health of the endpoints, so it is shared by all requests.
+    """
+    key = configuration.fingerprint
+    router = _routers.get(key)
+    if router is None:
+        with _routers_lock:
+            router = _routers.get(key)
+            if router is None:
+                if len(_routers) >= MAX_COMPILED_CONFIGURATIONS:
+                    _routers.clear()
+                router = BoomiRouter(configuration, get_boomi_client(configuration))
+                _routers[key] = router
+    return router
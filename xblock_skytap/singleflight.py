@@ -0,0 +1,392 @@
+"""
+Single-flight coalescing of concurrent launches.
+
+Learners double-click, open several tabs, or retry while a launch is still in progress.
+Concurrent launches for the same learner and course run are coalesced into a single Boomi call:
+the first caller (the leader) performs the call, and all other callers (the followers) receive its result.
+
+Within a process, followers wait on the leader's in-flight call directly. Across processes
+(e.g. several gunicorn workers), a lock/result backend decides which worker leads, and followers
+poll the backend for the leader's result.
+"""
+
+# Imports ###########################################################
+
+from __future__ import absolute_import
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from xblock.exceptions import JsonHandlerError
+
+from .cache import DjangoCache, InProcessCache
+from .exceptions import LaunchInProgressError
+
+# Globals ###########################################################
+
+DEFAULT_LOCK_TIMEOUT = 120
+DEFAULT_WAIT_TIMEOUT = 120
+DEFAULT_POLL_INTERVAL = 0.2
+DEFAULT_RESULT_TTL = 30
+
+_single_flights = {}
+_single_flights_lock = threading.Lock()
+
+# Classes ###########################################################
+
+
+class CacheLockBackend(object):
+    """
+    Lock/result backend storing locks and results in a cache.
+
+    Relies on the atomicity of `cache.add`, so use a shared Django cache (e.g. memcached or redis)
+    to coordinate several workers. With an InProcessCache, it is an in-memory stand-in for tests.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def acquire(self, key, token, timeout):
+        """
+        Try to take the lock for `key`. Return True if it was taken.
+        """
+        return self.cache.add("lock:" + key, token, timeout)
+
+    def release(self, key, token):
+        """
+        Release the lock for `key` if it is still held with `token`.
+        """
+        if self.cache.get("lock:" + key) == token:
+            self.cache.delete("lock:" + key)
+
+    def is_locked(self, key):
+        """
+        Return True if somebody holds the lock for `key`.
+        """
+        return self.cache.get("lock:" + key) is not None
+
+    def set_result(self, key, result, timeout):
+        """
+        Publish the `result` of the call for `key` for `timeout` seconds.
+        """
+        self.cache.set("result:" + key, result, timeout)
+
+    def get_result(self, key):
+        """
+        Return the published result of the call for `key`, or None.
+        """
+        return self.cache.get("result:" + key)
+
+    def clear_result(self, key):
+        """
+        Forget the published result of the call for `key`.
+        """
+        self.cache.delete("result:" + key)
+
+
+class FileLockBackend(object):
+    """
+    Lock/result backend using lock and result files in a local directory.
+
+    Suitable for coordinating several workers running on the same host, e.g. in development or tests.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "xblock-skytap-single-flight")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, kind, key):
+        """
+        Return the path of the lock or result file for `key`.
+        """
+        return os.path.join(self.directory, "{kind}-{key}".format(kind=kind, key=key.replace(":", "-")))
+
+    def _read(self, path):
+        """
+        Return the unexpired JSON content of `path`, or None.
+        """
+        try:
+            with open(path) as json_file:
+                content = json.load(json_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if content["expires_at"] <= time.time():
+            return None
+        return content["value"]
+
+    def _write_temporary(self, value, timeout):
+        """
+        Write `value`, expiring in `timeout` seconds, to a new temporary file, and return its path.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as json_file:
+            json.dump({"value": value, "expires_at": time.time() + timeout}, json_file)
+        return tmp_path
+
+    def _write(self, path, value, timeout):
+        """
+        Atomically replace the content of `path` with `value`, expiring in `timeout` seconds.
+        """
+        os.replace(self._write_temporary(value, timeout), path)
+
+    def _is_expired(self, path, timeout):
+        """
+        Return True if the lock file at `path` has expired or is gone.
+
+        A lock file that can't be parsed (e.g. written by an older version, or truncated) counts as held
+        until it is older than `timeout` seconds.
+        """
+        try:
+            with open(path) as json_file:
+                content = json.load(json_file)
+        except FileNotFoundError:
+            return True
+        except (IOError, OSError, ValueError):
+            try:
+                return os.path.getmtime(path) + timeout <= time.time()
+            except OSError:
+                return True
+        return content["expires_at"] <= time.time()
+
+    def acquire(self, key, token, timeout):
+        """
+        Try to take the lock for `key`. Return True if it was taken.
+
+        The lock file is written in full before it is linked into place, so other workers never see
+        a partially written lock. Locks left behind by crashed workers are taken over once they expire.
+        """
+        path = self._path("lock", key)
+        tmp_path = self._write_temporary(token, timeout)
+        try:
+            while True:
+                try:
+                    # Unlike os.replace, os.link fails if the lock file exists.
+                    os.link(tmp_path, path)
+                    return True
+                except FileExistsError:
+                    if not self._is_expired(path, timeout):
+                        return False
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        finally:
+            os.remove(tmp_path)
+
+    def release(self, key, token):
+        """
+        Release the lock for `key` if it is still held with `token`.
+        """
+        path = self._path("lock", key)
+        if self._read(path) == token:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def is_locked(self, key):
+        """
+        Return True if somebody holds the lock for `key`.
+        """
+        return self._read(self._path("lock", key)) is not None
+
+    def set_result(self, key, result, timeout):
+        """
+        Publish the `result` of the call for `key` for `timeout` seconds.
+        """
+        self._write(self._path("result", key), result, timeout)
+
+    def get_result(self, key):
+        """
+        Return the published result of the call for `key`, or None.
+        """
+        return self._read(self._path("result", key))
+
+    def clear_result(self, key):
+        """
+        Forget the published result of the call for `key`.
+        """
+        try:
+            os.remove(self._path("result", key))
+        except OSError:
+            pass
+
+
+class _Call(object):
+    """
+    An in-flight call that local followers can wait for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent calls that share the same key into a single call.
+
+    Errors raised by the leader as JsonHandlerError are passed on to the followers.
+    """
+
+    def __init__(
+            self,
+            backend=None,
+            lock_timeout=DEFAULT_LOCK_TIMEOUT,
+            wait_timeout=DEFAULT_WAIT_TIMEOUT,
+            poll_interval=DEFAULT_POLL_INTERVAL,
+            result_ttl=DEFAULT_RESULT_TTL,
+    ):  # pylint: disable=too-many-arguments
+        self.backend = backend
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, deadline=None):
+        """
+        Call `func` and return its result, unless a call for `key` is already in flight,
+        in which case wait for that call to finish and return its result instead.
+
+        Raise LaunchInProgressError if the in-flight call does not finish within `wait_timeout` seconds,
+        or before `deadline` (in seconds since the epoch), if given.
+        """
+        wait_until = time.time() + self.wait_timeout
+        if deadline is not None:
+            wait_until = min(wait_until, deadline)
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            if not call.done.wait(max(wait_until - time.time(), 0)):
+                raise LaunchInProgressError("Timed out waiting for the in-flight call for {}.".format(key))
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._do_shared(key, func, wait_until)
+            return call.value
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_shared(self, key, func, deadline):
+        """
+        Call `func` unless another process is already calling it for `key`, in which case
+        wait until `deadline` for the result it publishes in the backend.
+        """
+        if self.backend is None:
+            return func()
+
+        token = uuid.uuid4().hex
+        while True:
+            if self.backend.acquire(key, token, self.lock_timeout):
+                try:
+                    return self._lead(key, func)
+                finally:
+                    self.backend.release(key, token)
+
+            while self.backend.is_locked(key) and time.time() < deadline:
+                result = self.backend.get_result(key)
+                if result is not None:
+                    return self._unpack(result)
+                time.sleep(self.poll_interval)
+
+            # The leader finished: use its result if it published one, otherwise try to take the lead.
+            result = self.backend.get_result(key)
+            if result is not None:
+                return self._unpack(result)
+            if time.time() >= deadline:
+                raise LaunchInProgressError("Timed out waiting for the in-flight call for {}.".format(key))
+
+    def _lead(self, key, func):
+        """
+        Call `func` as the leader for `key` and publish the outcome for followers in other processes.
+        """
+        self.backend.clear_result(key)
+        try:
+            value = func()
+        except JsonHandlerError as exc:
+            self.backend.set_result(key, ["error", exc.status_code, exc.message], self.result_ttl)
+            raise
+        self.backend.set_result(key, ["ok", value], self.result_ttl)
+        return value
+
+    @staticmethod
+    def _unpack(result):
+        """
+        Return the value of a result published by a leader, or raise its error.
+        """
+        if result[0] == "error":
+            raise JsonHandlerError(result[1], result[2])
+        return result[1]
+
+
+# Functions #########################################################
+
+def _create_backend(single_flight_configuration, launch_cache):
+    """
+    Instantiate the lock/result backend configured in `single_flight_configuration`.
+    """
+    backend = single_flight_configuration.get("backend", "auto")
+    if backend == "auto":
+        # Coordinate workers through the launch cache if it is shared between them.
+        return CacheLockBackend(launch_cache) if isinstance(launch_cache, DjangoCache) else None
+    if backend == "local":
+        return None
+    if backend == "memory":
+        return CacheLockBackend(InProcessCache())
+    if backend == "cache":
+        return CacheLockBackend(DjangoCache(
+            alias=single_flight_configuration.get("django_cache_alias", "default"),
+            key_prefix="skytap-single-flight",
+        ))
+    if backend == "file":
+        return FileLockBackend(single_flight_configuration.get("directory"))
+    raise ValueError("Unknown single-flight backend: {backend}".format(backend=backend))
+
+
+def get_single_flight(xblock_settings, launch_cache):
+    """
+    Return the process-wide SingleFlight configured by the "single_flight" entry of `xblock_settings`.
+
+    Supported options are "backend" ("auto", "local", "memory", "cache" or "file"), "lock_timeout",
+    "wait_timeout", "poll_interval" and "result_ttl" (in seconds), "django_cache_alias" ("cache" backend)
+    and "directory" ("file" backend).
+    """
+    single_flight_configuration = xblock_settings.get("single_flight", {})
+    # The "auto" backend depends on the launch cache, which is identified by its configuration.
+    key = (
+        tuple(sorted(single_flight_configuration.items())),
+        tuple(sorted(xblock_settings.get("launch_cache", {}).items())),
+    )
+    single_flight = _single_flights.get(key)
+    if single_flight is None:
+        with _single_flights_lock:
+            single_flight = _single_flights.get(key)
+            if single_flight is None:
+                single_flight = SingleFlight(
+                    backend=_create_backend(single_flight_configuration, launch_cache),
+                    lock_timeout=single_flight_configuration.get("lock_timeout", DEFAULT_LOCK_TIMEOUT),
+                    wait_timeout=single_flight_configuration.get("wait_timeout", DEFAULT_WAIT_TIMEOUT),
+                    poll_interval=single_flight_configuration.get("poll_interval", DEFAULT_POLL_INTERVAL),
+                    result_ttl=single_flight_configuration.get("result_ttl", DEFAULT_RESULT_TTL),
+                )
+                _single_flights[key] = single_flight
+    return single_flight
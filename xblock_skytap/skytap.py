@@ -13,28 +13,50 @@ for opening the sharing portal link in a new browser tab.
 
 from __future__ import absolute_import
 
-import base64
+import functools
+import json
 import logging
-from urllib.parse import urljoin
+import time
 
-import requests
-from simplejson import JSONDecodeError
+from webob import Response
 from xblock.core import XBlock
 from xblock.exceptions import JsonHandlerError
-from xblock.fields import Scope, String
+from xblock.fields import Float, List, Scope, String
 from xblock.fragment import Fragment
-from xblockutils.resources import ResourceLoader
+from xblock.validation import ValidationMessage
 from xblockutils.settings import XBlockWithSettingsMixin
 from xblockutils.studio_editable import StudioEditableXBlockMixin
 
-from .exceptions import (BoomiConfigurationInvalidError,
-                         BoomiConfigurationMissingError)
+from .admission import get_admission_controller
+from .assets import CSS_SOURCES, JS_SOURCES, get_content, get_manifest
+from .audit import get_audit_log, truncate
+from .cache import get_launch_cache, launch_cache_key
+from .callbacks import get_callback_secret, launch_callbacks_enabled, verify_correlation_id
+from .exceptions import LaunchQueueFullError, ServiceUnavailableError
+from .jobs import (JOB_ERROR, JOB_PENDING, JOB_QUEUED, JOB_READY,
+                   get_job_executor, get_job_store, launch_jobs_enabled)
+from .launcher import LAUNCH_MESSAGES, Launcher, load_boomi_configuration, metric_tags
+from .launchlog import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, OUTCOME_ERROR, OUTCOME_READY, OUTCOME_REJECTED, OUTCOMES,
+                        get_launch_log, get_launch_log_writer, launch_log_enabled)
+from .metrics import get_metrics
+from .multilaunch import get_multi_launcher, parse_environments
+from .prewarm import get_prewarmer
+from .rendering import local_resource_url, render_template
 from .utils import _  # pylint: disable=unused-import
 
 # Globals ###########################################################
 
 log = logging.getLogger(__name__)
-loader = ResourceLoader(__name__)
+
+# By default, student_view links to the last sharing portal URL of a learner for this many seconds.
+DEFAULT_RESUME_LINK_TTL = 300
+
+# By default, the launch handler answers within this many seconds, however long the browser is willing to wait;
+# keep it below the timeouts of the proxies in front of the LMS (e.g. proxy_read_timeout in nginx).
+DEFAULT_MAX_LAUNCH_TIMEOUT = 55
+
+# By default, prefetched sharing portal URLs are kept in the browser's sessionStorage for this many seconds.
+DEFAULT_PREFETCH_TTL = 300
 
 # Classes ###########################################################
 
@@ -56,9 +78,37 @@ class SkytapXBlock(StudioEditableXBlockMixin, XBlockWithSettingsMixin, XBlock):
         default=_("Skytap XBlock"),
     )
 
+    environments = List(
+        display_name=_("Environments"),
+        help=_(
+            'The environment templates to launch, e.g. ["cluster", {"name": "Client", "template": "client-vm"}]. '
+            'Leave empty to launch the environment of the course run.'
+        ),
+        scope=Scope.settings,
+        default=[],
+    )
+
     # User state
 
-    editable_fields = ("display_name",)
+    sharing_portal_url = String(
+        help=_("The sharing portal URL returned by the learner's last launch."),
+        scope=Scope.user_state,
+        default=None,
+    )
+
+    launched_at = Float(
+        help=_("When the learner's last launch returned the sharing portal URL (seconds since the epoch)."),
+        scope=Scope.user_state,
+        default=None,
+    )
+
+    launch_expires_at = Float(
+        help=_("Until when student_view links to the sharing portal URL of the last launch (seconds since the epoch)."),
+        scope=Scope.user_state,
+        default=None,
+    )
+
+    editable_fields = ("display_name", "environments")
 
     block_settings_key = "skytap"
 
@@ -66,23 +116,172 @@ class SkytapXBlock(StudioEditableXBlockMixin, XBlockWithSettingsMixin, XBlock):
         """ Translate text. """
         return self.runtime.service(self, "i18n").ugettext(text)
 
-    def student_view(self, context):
+    def validate_field_data(self, validation, data):
+        """
+        Validate the environment templates of the block.
+        """
+        try:
+            parse_environments(data.environments)
+        except ValueError as exc:
+            validation.add(ValidationMessage(ValidationMessage.ERROR, str(exc)))
+
+    def get_environments(self):
+        """
+        Return the (name, template) pairs of the environments that the block launches,
+        or an empty list if it launches the environment of the course run.
+        """
+        return parse_environments(self.environments)
+
+    def student_view(self, context):  # pylint: disable=unused-argument
         """
         View shown to students.
+
+        Staff members also see the launches of the course run, if the launch log is enabled.
+
+        If the last launch of the learner is recent enough, link to its sharing portal URL directly,
+        so returning learners don't need to launch their environment again.
+        Otherwise, the rendered template is cached per display name and language (see rendering.py).
+
+        If prewarming is enabled, start launching the environment of the learner in the background.
         """
-        context = context.copy() if context else {}
+        started = time.time()
+        self.prewarm()
+        context = {"display_name": self.display_name}
+        resume_link = self.get_resume_link()
+        if resume_link is not None:
+            context["resume_url"], context["resume_expires_in"] = resume_link
         fragment = Fragment()
-        context["display_name"] = self.display_name
-        fragment.add_content(loader.render_template("templates/skytap.html", context))
-        fragment.add_css_url(
-            self.runtime.local_resource_url(self, "public/css/skytap.css")
+        fragment.add_content(
+            render_template(__name__, "templates/skytap.html", context, cache=resume_link is None)
         )
-        fragment.add_javascript_url(
-            self.runtime.local_resource_url(self, "public/js/src/skytap.js")
-        )
-        fragment.initialize_js("SkytapXBlock")
+        self.add_assets(fragment)
+        if getattr(self.runtime, "user_is_staff", False) and launch_log_enabled(self.get_xblock_settings(default={})):
+            fragment.add_content(render_template(__name__, "templates/dashboard.html", {"outcomes": OUTCOMES}))
+        prefetch_ttl = self.get_prefetch_ttl()
+        fragment.initialize_js("SkytapXBlock", {
+            "prefetch": prefetch_ttl is not None,
+            "prefetch_ttl": prefetch_ttl,
+            "multi_launch": bool(self.environments),
+        })
+        current_course = self.get_current_course()
+        if current_course is not None:
+            self.get_metrics().timing(
+                'student_view.render',
+                time.time() - started,
+                self.get_metric_tags(current_course.course, current_course.run),
+            )
         return fragment
 
+    def add_assets(self, fragment):
+        """
+        Add the CSS and JavaScript of the block to `fragment`.
+
+        Use the fingerprinted bundles listed in the asset manifest (see assets.py), unless they were not built
+        or the "assets" setting disables them. The CSS is small enough to inline if "inline_css" is enabled,
+        which saves a request per page.
+        """
+        assets_configuration = self.get_xblock_settings(default={}).get("assets", {})
+        manifest = get_manifest() if assets_configuration.get("bundled", True) else None
+        if manifest is not None:
+            css_paths, js_paths = [manifest["css"]], [manifest["js"]]
+        else:
+            css_paths, js_paths = CSS_SOURCES, JS_SOURCES
+        for css_path in css_paths:
+            if assets_configuration.get("inline_css", False):
+                fragment.add_css(get_content(css_path))
+            else:
+                fragment.add_css_url(local_resource_url(self, css_path))
+        for js_path in js_paths:
+            fragment.add_javascript_url(local_resource_url(self, js_path))
+
+    def prewarm(self):
+        """
+        Start launching the environment of the current learner in the background, if prewarming is enabled
+        for the current course and the sharing portal URL is not cached yet.
+        Blocks that launch several environments are not prewarmed.
+
+        Failing to prewarm does not fail student_view.
+        """
+        try:
+            prewarmer = get_prewarmer(self.get_xblock_settings(default={}))
+            course_key = self.get_routing_key() if prewarmer is not None and not self.environments else None
+            if course_key is None or not prewarmer.enabled_for(course_key):
+                return
+            # Only authenticated learners have an email address.
+            emails = getattr(self.get_current_user(), 'emails', None)
+            if not emails:
+                return
+            email, course_name, course_run = emails[-1], course_key[1], course_key[2]
+            cache_key = launch_cache_key(email, course_name, course_run)
+            if self.get_launch_cache().get(cache_key) is not None:
+                return
+            launcher = self.get_launcher()
+            outcome = prewarmer.schedule(
+                cache_key, functools.partial(launcher.fetch_sharing_portal_url, email, course_name, course_run)
+            )
+            self.get_metrics().increment(
+                'prewarm.outcome', dict(self.get_metric_tags(course_name, course_run), outcome=outcome)
+            )
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Unable to prewarm the Skytap environment.')
+
+    def get_resume_link_ttl(self):
+        """
+        Return the number of seconds during which student_view links to the last sharing portal URL,
+        or None if this is disabled.
+        """
+        resume_configuration = self.get_xblock_settings(default={}).get("resume_link", {})
+        if not resume_configuration.get("enabled", True):
+            return None
+        return resume_configuration.get("ttl", DEFAULT_RESUME_LINK_TTL)
+
+    def get_prefetch_ttl(self):
+        """
+        Return the number of seconds during which the browser keeps prefetched sharing portal URLs,
+        or None if prefetching is disabled (the default).
+
+        When prefetching is enabled, the browser launches the environment as soon as the block becomes visible,
+        so enable it only if launching environments that learners may not open is acceptable.
+        Blocks that launch several environments are not prefetched.
+        """
+        prefetch_configuration = self.get_xblock_settings(default={}).get("prefetch", {})
+        if not prefetch_configuration.get("enabled", False) or self.environments:
+            return None
+        return prefetch_configuration.get("ttl", DEFAULT_PREFETCH_TTL)
+
+    def get_resume_link(self):
+        """
+        Return the sharing portal URL of the last launch of the learner and the number of seconds until it expires,
+        or None if there is no such URL or it has expired.
+        """
+        if not self.sharing_portal_url or self.launch_expires_at is None:
+            return None
+        expires_in = int(self.launch_expires_at - time.time())
+        if expires_in <= 0 or self.get_resume_link_ttl() is None:
+            return None
+        return self.sharing_portal_url, expires_in
+
+    def remember_launch(self, sharing_portal_url):
+        """
+        Store `sharing_portal_url` as the result of the last launch of the learner, for student_view to link to.
+        """
+        ttl = self.get_resume_link_ttl()
+        if ttl is None:
+            return
+        now = time.time()
+        if sharing_portal_url != self.sharing_portal_url:
+            self.sharing_portal_url = sharing_portal_url
+            self.launched_at = now
+        self.launch_expires_at = now + ttl
+
+    def forget_launch(self):
+        """
+        Forget the result of the last launch of the learner.
+        """
+        del self.sharing_portal_url
+        del self.launched_at
+        del self.launch_expires_at
+
     def get_current_user(self):
         """
         Get current user from user service, and return it.
@@ -103,103 +302,536 @@ class SkytapXBlock(StudioEditableXBlockMixin, XBlockWithSettingsMixin, XBlock):
 
     def get_boomi_configuration(self):
         """
-        Get Boomi configuration from settings service, and return it.
+        Get Boomi configuration from settings service, and return it compiled into a BoomiConfiguration.
 
-        Raise an exception if configuration is missing one or more relevant entries.
+        Raise an exception if configuration is missing or invalid.
         """
-        xblock_settings = self.get_xblock_settings(default={})
-        if not xblock_settings or "boomi_configuration" not in xblock_settings:
-            raise BoomiConfigurationMissingError(
-                "XBLOCK_SETTINGS for Skytap XBlock are missing Boomi configuration."
-            )
-        boomi_configuration = xblock_settings["boomi_configuration"]
-        relevant_settings = ("base_url", "endpoint", "username", "token")
-        missing_settings = [
-            setting for setting in relevant_settings if setting not in boomi_configuration
-        ]
-        if missing_settings:
-            raise BoomiConfigurationInvalidError(
-                "Boomi configuration is missing the following settings: {missing_settings}".format(
-                    missing_settings=", ".join(missing_settings)
-                )
-            )
-        return boomi_configuration
+        return load_boomi_configuration(self.get_xblock_settings(default={}))
 
     def get_boomi_url(self):
         """
-        Using the "boomi_configuration" in the XBLOCK_SETTINGS, construct the authenticated Boomi endpoint URL.
-        """
-        boomi_configuration = self.get_boomi_configuration()
-
-        auth_string = "{}:{}".format(boomi_configuration['username'], boomi_configuration['token']).encode('ascii')
-        base64_auth_string = base64.b64encode(auth_string)
+        Using the "boomi_configuration" in the XBLOCK_SETTINGS, construct the Boomi endpoint URL.
 
-        return "{base_url};boomi_auth={base64_auth_string}".format(
-            base_url=urljoin(boomi_configuration['base_url'], boomi_configuration['endpoint']),
-            base64_auth_string=base64_auth_string.decode('ascii')
-        )
+        The URL only carries credentials if "auth_method" is "url"; by default, they are sent in a header.
+        """
+        return self.get_boomi_configuration().url
 
     @staticmethod
     def raise_error(message='An unknown error occurred.', exception=False):
         """
         Given an error message, log the error and raise a JsonHandlerError to invoke an error response.
         """
-        if exception:
-            log.exception(message)
-        else:
-            log.error(message)
+        Launcher.raise_error(message, exception)
 
-        raise JsonHandlerError(500, message)
+    def get_routing_key(self):
+        """
+        Return the (org, course, run) of the current course, used to route Boomi requests; or None.
+        """
+        current_course = self.get_current_course()
+        if current_course is None:
+            return None
+        return current_course.org, current_course.course, current_course.run
 
-    @XBlock.json_handler
-    def launch(self, data, suffix=""):  # pylint: disable=unused-argument
+    def get_metrics(self):
         """
-        Launch Skytap environment and return the resulting sharing portal URL.
+        Get the sink for latency and outcome metrics, and return it.
+        """
+        return get_metrics(self.get_xblock_settings(default={}))
+
+    def get_metric_tags(self, course_name, course_run):
+        """
+        Return the tags identifying the course run in metrics.
+
+        The "course_run" tag leaves out the organization of the course, which is tagged separately, so that
+        the metrics of course runs with the same name in different organizations can be told apart.
+        """
+        return metric_tags(course_name, course_run, getattr(self.get_current_course(), 'org', None))
+
+    def get_launch_log_key(self):
+        """
+        Return the key of the current course run in the launch log: its full course key, including the organization,
+        so that staff only ever see the launches of their own course run.
+        """
+        return str(self.get_current_course())
+
+    def get_launch_cache(self):
+        """
+        Get the cache that holds sharing portal URLs returned by Boomi, and return it.
+        """
+        return get_launch_cache(self.get_xblock_settings(default={}))
+
+    def get_launcher(self):
+        """
+        Return a Launcher for the launches of this block, capturing what they need from the runtime and its services,
+        so that launches can go on in the background after the handler request returned.
+        """
+        xblock_settings = self.get_xblock_settings(default={})
+        callback_url = None
+        if launch_callbacks_enabled(xblock_settings):
+            callback_url = self.runtime.handler_url(self, 'launch_callback', thirdparty=True)
+        return Launcher(
+            xblock_settings,
+            self.get_routing_key(),
+            {text: self._(text) for text in LAUNCH_MESSAGES},
+            callback_url,
+        )
+
+    def get_launch_identity(self):
         """
+        Return the email address of the current user, and the name and run of the current course.
 
-        # Gather information from the runtime and settings
+        Invoke an error response if the runtime does not provide them.
+        """
         current_user = self.get_current_user()
         current_course = self.get_current_course()
         if current_user is None:
             self.raise_error(self._('Unable to fetch the current user from the runtime.'))
         if current_course is None:
             self.raise_error(self._('This block usage is not associated with a course.'))
-        current_user_email = current_user.emails.pop()
-        current_course_name = current_course.course
-        current_course_run = current_course.run
+        return current_user.emails[-1], current_course.course, current_course.run
+
+    @XBlock.json_handler
+    def launch(self, data, suffix=""):  # pylint: disable=unused-argument
+        """
+        Launch Skytap environment and return the resulting sharing portal URL.
+
+        Sharing portal URLs are cached per learner and course run,
+        so relaunching an environment does not require another Boomi round trip.
+        Concurrent launches for the same learner and course run are coalesced into a single Boomi call.
+
+        If launch jobs or launch callbacks are enabled, or admission control queues the launch,
+        return the ID of a job that tracks the launch instead; use the `launch_status` handler to fetch its result.
+
+        If the block lists several environments, launch them concurrently, and return the sharing portal URL
+        or the error of each of them as `environments` (see `launch_environments`).
+
+        If `data['refresh']` is true, forget the cached sharing portal URL and launch the environment again.
+
+        `data['timeout']` is the number of seconds the browser waits for the response. The launch stops waiting
+        for Boomi once this time, capped by the "max_timeout" of the "launch_deadline" setting, has passed.
+        """
+        started = time.time()
+        current_user_email, current_course_name, current_course_run = self.get_launch_identity()
+        metrics = self.get_metrics()
+        tags = self.get_metric_tags(current_course_name, current_course_run)
+        metrics.timing('launch.runtime', time.time() - started, tags)
+        refresh = isinstance(data, dict) and bool(data.get('refresh'))
+        deadline = self.get_launch_deadline(data, started)
         try:
-            boomi_url = self.get_boomi_url()
-        except (BoomiConfigurationInvalidError, BoomiConfigurationMissingError):
-            self.raise_error(self._('The Skytap XBlock is improperly configured.'), exception=True)
-
-        # Fetch the sharing portal URL from Boomi
-        response = requests.post(
-            boomi_url,
-            json={
-                'email': current_user_email,
-                'course_name': current_course_name,
-                'course_run': current_course_run,
-            },
-            headers={'Accept': 'application/json'},
-        )
+            response = self._launch(
+                current_user_email, current_course_name, current_course_run, tags, refresh, deadline
+            )
+        except ServiceUnavailableError:
+            self.record_launch(current_user_email, OUTCOME_REJECTED, time.time() - started)
+            raise
+        except JsonHandlerError:
+            self.record_launch(current_user_email, OUTCOME_ERROR, time.time() - started)
+            raise
+        finally:
+            metrics.timing('launch.total', time.time() - started, tags)
+        if 'sharing_portal_url' in response:
+            self.remember_launch(response['sharing_portal_url'])
+        outcome = response.get('status', OUTCOME_READY)
+        if any('error' in environment for environment in response.get('environments', ())):
+            outcome = OUTCOME_ERROR
+        self.record_launch(current_user_email, outcome, time.time() - started)
+        return response
+
+    def get_launch_deadline(self, data, started):
+        """
+        Return the time (in seconds since the epoch) after which nobody waits for the response
+        to the launch request with the given `data` that started at `started`, or None if there is no such time.
+        """
+        timeout = data.get('timeout') if isinstance(data, dict) else None
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+            timeout = None
+        deadline_configuration = self.get_xblock_settings(default={}).get("launch_deadline", {})
+        max_timeout = deadline_configuration.get("max_timeout", DEFAULT_MAX_LAUNCH_TIMEOUT)
+        if max_timeout is not None:
+            timeout = max_timeout if timeout is None else min(timeout, max_timeout)
+        return None if timeout is None else started + timeout
+
+    def record_launch(self, email, outcome, latency=None):
+        """
+        Append a launch by the learner with the given `email` for the current course run to the launch log,
+        if it is enabled.
+
+        Only queues the launch; it is written by a background thread. Failing to record a launch does not fail
+        the launch.
+        """
+        xblock_settings = self.get_xblock_settings(default={})
+        if not launch_log_enabled(xblock_settings):
+            return
+        try:
+            get_launch_log_writer(xblock_settings).emit({
+                'course_run': self.get_launch_log_key(),
+                'user': email,
+                'outcome': outcome,
+                'latency': latency,
+                'url_issued_at': self.launched_at if outcome == OUTCOME_READY else None,
+                'launched_at': time.time(),
+            })
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Unable to record a launch in the launch log.')
+
+    def _launch(  # pylint: disable=too-many-arguments
+            self, current_user_email, current_course_name, current_course_run, tags, refresh=False, deadline=None
+    ):
+        """
+        Launch the Skytap environment of the given learner and course run, and return the launch handler response.
 
-        # Handle response errors
+        Launches that answer right away stop at `deadline`; launches tracked by jobs are polled, so they don't.
+        """
         try:
-            response_json = response.json()
-        except JSONDecodeError:
-            log.error(
-                self._('The Boomi endpoint returned the following non-JSON response content: %s'),
-                response.content
+            environments = self.get_environments()
+        except ValueError:
+            log.exception('Invalid environments in the settings of the Skytap XBlock.')
+            self.raise_error(self._('The exercise environments of this block are misconfigured.'))
+        if environments:
+            return self.launch_environments(
+                environments, current_user_email, current_course_name, current_course_run, tags, refresh, deadline
+            )
+        cache_key = launch_cache_key(current_user_email, current_course_name, current_course_run)
+        if refresh:
+            self.forget_launch()
+            self.get_launch_cache().delete(cache_key)
+        sharing_portal_url = self.get_launch_cache().get(cache_key)
+        if sharing_portal_url is not None:
+            self.get_metrics().increment('launch.outcome', dict(tags, outcome='cache_hit'))
+            Launcher(self.get_xblock_settings(default={})).audit_launch(current_user_email, tags, 'cache_hit')
+            return {'sharing_portal_url': sharing_portal_url}
+
+        launcher = self.get_launcher()
+        xblock_settings = launcher.xblock_settings
+        admission = get_admission_controller(xblock_settings)
+        if admission is not None and not admission.admit(tags['course_run']):
+            return self.enqueue_launch(
+                admission, launcher, cache_key, current_user_email, current_course_name, current_course_run
+            )
+
+        def admitted(func):
+            """
+            Return `func`, making it release the admission slot of the launch once it is done.
+            """
+            if admission is None:
+                return func
+            return functools.partial(admission.run_admitted, tags['course_run'], func)
+
+        if launch_callbacks_enabled(xblock_settings):
+            return admitted(launcher.request_launch_callback)(
+                cache_key, current_user_email, current_course_name, current_course_run, deadline=deadline
+            )
+        fetch = admitted(functools.partial(
+            launcher.fetch_sharing_portal_url, current_user_email, current_course_name, current_course_run
+        ))
+        if launch_jobs_enabled(xblock_settings):
+            try:
+                job_store = get_job_store(xblock_settings)
+                job_id = job_store.create(owner=cache_key)
+                get_job_executor(xblock_settings).submit(job_store.run, job_id, cache_key, fetch)
+            except Exception:
+                # The launch never started, so it must not hold on to its admission slot.
+                if admission is not None:
+                    admission.release(tags['course_run'])
+                raise
+            return {'job_id': job_id, 'status': JOB_PENDING}
+
+        return {'sharing_portal_url': fetch(deadline=deadline)}
+
+    def launch_environments(  # pylint: disable=too-many-arguments
+            self, environments, current_user_email, current_course_name, current_course_run, tags, refresh=False,
+            deadline=None,
+    ):
+        """
+        Launch the (name, template) `environments` of the given learner and course run concurrently
+        until `deadline`, and return the launch handler response.
+
+        The response lists `{"name": ..., "sharing_portal_url": ...}` for each environment that launched,
+        and `{"name": ..., "error": ...}` for each environment that failed or missed the deadline.
+        Invoke an error response if none of them launched.
+
+        Admission control counts the launch as a single launch, and rejects it instead of queueing it;
+        launch jobs and launch callbacks don't apply.
+        """
+        if refresh:
+            self.forget_launch()
+        launch_cache = self.get_launch_cache()
+        metrics = self.get_metrics()
+        results = {}
+        launches = []
+        launcher = None
+        for name, template in environments:
+            cache_key = launch_cache_key(current_user_email, current_course_name, current_course_run, template)
+            if refresh:
+                launch_cache.delete(cache_key)
+            sharing_portal_url = launch_cache.get(cache_key)
+            if sharing_portal_url is not None:
+                metrics.increment('launch.environment', dict(tags, environment=name, outcome='cache_hit'))
+                results[name] = {'name': name, 'sharing_portal_url': sharing_portal_url}
+                continue
+            if launcher is None:
+                launcher = self.get_launcher()
+            launches.append((name, functools.partial(
+                launcher.fetch_sharing_portal_url,
+                current_user_email,
+                current_course_name,
+                current_course_run,
+                template,
+                deadline,
+            )))
+
+        if launches:
+            xblock_settings = launcher.xblock_settings
+            run = get_multi_launcher(xblock_settings).run
+            admission = get_admission_controller(xblock_settings)
+            if admission is not None and not admission.admit(tags['course_run']):
+                log.warning('Rejecting Skytap launch: admission control holds back launches.')
+                raise ServiceUnavailableError(
+                    self._('The Skytap launch service is currently overloaded. Please try again later.'),
+                    int(admission.service_time) + 1,
+                )
+            if admission is not None:
+                run = functools.partial(admission.run_admitted, tags['course_run'], run)
+            timeout_message = self._('Your exercise environment could not be launched in time. Please try again.')
+            for result in run(launches, timeout_message, deadline):
+                outcome = 'error' if 'error' in result else 'success'
+                metrics.increment('launch.environment', dict(tags, environment=result['name'], outcome=outcome))
+                results[result['name']] = result
+
+        results = [results[name] for name, _template in environments]
+        if all('error' in result for result in results):
+            self.raise_error(results[0]['error'])
+        return {'environments': results}
+
+    def enqueue_launch(self, admission, launcher, cache_key, email, course_name, course_run):
+        """
+        Queue the launch for the given learner and course run until admission control lets `launcher` start it,
+        and return the ID of the job that tracks it, along with its position in the queue.
+
+        Invoke an error response if the queue is full.
+        """
+        xblock_settings = launcher.xblock_settings
+        job_store = get_job_store(xblock_settings)
+        job_id = job_store.create(owner=cache_key)
+        if launch_callbacks_enabled(xblock_settings):
+            def launch():
+                """
+                Ask Boomi to launch the environment and report the result via callback.
+                """
+                try:
+                    launcher.request_launch_callback(cache_key, email, course_name, course_run, job_id)
+                except JsonHandlerError as exc:
+                    job_store.set_error(job_id, cache_key, exc.status_code, exc.message)
+        else:
+            launch = functools.partial(
+                job_store.run,
+                job_id,
+                cache_key,
+                functools.partial(launcher.fetch_sharing_portal_url, email, course_name, course_run),
             )
-            self.raise_error(self._('The Skytap launch service returned a malformed response.'), exception=True)
 
-        # Check if Boomi encountered an error while processing the request,
-        # and pass it back to the client.
-        # Note that Boomi does not support Boolean values in JSON responses,
-        # so the check needs to compare string values.
-        if response_json['ErrorExists'].lower() == 'true':
-            self.raise_error(response_json['ErrorMessage'])
+        try:
+            admission.enqueue(
+                job_id,
+                self.get_metric_tags(course_name, course_run)['course_run'],
+                launch,
+                on_timeout=functools.partial(
+                    job_store.set_error,
+                    job_id,
+                    cache_key,
+                    503,
+                    self._('Your exercise environment could not be launched in time. Please try again.'),
+                ),
+            )
+        except LaunchQueueFullError:
+            log.warning('Rejecting Skytap launch: the launch queue is full.')
+            error = self._('The Skytap launch service is currently overloaded. Please try again later.')
+            # Don't leave the job pending for anybody who polls it.
+            job_store.set_error(job_id, cache_key, 503, error)
+            raise ServiceUnavailableError(error, int(admission.service_time) + 1)
+        tags = self.get_metric_tags(course_name, course_run)
+        self.get_metrics().increment('launch.queued', tags)
+        launcher.audit_launch(email, tags, 'queued')
+        return self.get_queue_status(admission, job_id) or {'job_id': job_id, 'status': JOB_PENDING}
 
+    @staticmethod
+    def get_queue_status(admission, job_id):
+        """
+        Return the launch handler response for the queued job `job_id`, or None if the job is not queued (anymore).
+        """
+        queue_position = admission.position(job_id)
+        if queue_position is None:
+            return None
+        position, eta = queue_position
+        return {'job_id': job_id, 'status': JOB_QUEUED, 'position': position, 'eta': eta}
+
+    @XBlock.handler
+    def launch_callback(self, request, suffix=""):  # pylint: disable=unused-argument
+        """
+        Receive the result of a launch from Boomi.
+
+        This handler does not require authentication; instead, the request must carry the correlation ID
+        of a pending launch job, signed with the callback secret.
+        """
+        xblock_settings = self.get_xblock_settings(default={})
+        correlation_id = request.GET.get('correlation_id')
+        if not verify_correlation_id(
+                get_callback_secret(xblock_settings), correlation_id, request.GET.get('signature')
+        ):
+            return Response(status=403)
+
+        job_store = get_job_store(xblock_settings)
+        job = job_store.get(correlation_id)
+        if job is None:
+            return Response(status=404)
+        if job['status'] != JOB_PENDING:
+            return Response(status=409)
+
+        try:
+            payload = json.loads(request.body.decode('utf-8'))
+        except ValueError:
+            payload = None
+        error_exists = payload.get('ErrorExists') if isinstance(payload, dict) else None
+        if not isinstance(error_exists, str):
+            log.error('The Boomi callback contained the following malformed content: %s', truncate(request.body))
+            return Response(status=400)
+        error_exists = error_exists.lower() == 'true'
+        sharing_portal_url = payload.get('SkytapURL')
+
+        if error_exists or not sharing_portal_url:
+            message = payload.get('ErrorMessage') or self._('The Skytap launch service returned a malformed response.')
+            log.error(message)
+            job_store.set_error(correlation_id, job['owner'], 500, message)
+            status = JOB_ERROR
+            outcome = 'boomi_error' if error_exists else 'malformed'
+        else:
+            job_store.set_ready(correlation_id, job['owner'], sharing_portal_url)
+            self.get_launch_cache().set(job['owner'], sharing_portal_url)
+            status = JOB_READY
+            outcome = 'success'
+        current_course = self.get_current_course()
+        if current_course is not None:
+            # Completes the 'accepted' outcome counted when Boomi acknowledged the launch.
+            self.get_metrics().increment(
+                'launch.outcome', dict(self.get_metric_tags(current_course.course, current_course.run), outcome=outcome)
+            )
+        return Response(json.dumps({'status': status}), content_type='application/json', charset='utf-8')
+
+    @XBlock.json_handler
+    def launch_status(self, data, suffix=""):  # pylint: disable=unused-argument
+        """
+        Report the status of the launch job identified by `data['job_id']`.
+
+        Return the sharing portal URL once the job is ready, and invoke an error response if the job failed.
+        While the job waits for admission control, report its position in the queue and the estimated wait in seconds.
+        """
+        current_user_email, current_course_name, current_course_run = self.get_launch_identity()
+        job_id = data.get('job_id') if isinstance(data, dict) else None
+        job = get_job_store(self.get_xblock_settings(default={})).get(job_id) if job_id else None
+        if job is None or job['owner'] != launch_cache_key(current_user_email, current_course_name, current_course_run):
+            raise JsonHandlerError(404, self._('This launch could not be found. Please try again.'))
+
+        if job['status'] == JOB_ERROR:
+            self.record_launch(current_user_email, OUTCOME_ERROR)
+            raise JsonHandlerError(job['status_code'], job['error'])
+        if job['status'] == JOB_PENDING:
+            admission = get_admission_controller(self.get_xblock_settings(default={}))
+            queue_status = self.get_queue_status(admission, job_id) if admission is not None else None
+            if queue_status is not None:
+                return queue_status
+        response = {'job_id': job_id, 'status': job['status']}
+        if job['status'] == JOB_READY:
+            response['sharing_portal_url'] = job['sharing_portal_url']
+            self.remember_launch(job['sharing_portal_url'])
+            self.record_launch(current_user_email, OUTCOME_READY)
+        return response
+
+    @XBlock.json_handler
+    def clear_launch_cache(self, data, suffix=""):  # pylint: disable=unused-argument
+        """
+        Evict the cached sharing portal URL of the learner identified by `data['email']`
+        for the current course run. Only available to staff.
+        """
+        if not getattr(self.runtime, 'user_is_staff', False):
+            raise JsonHandlerError(403, self._('You do not have permission to clear the launch cache.'))
+        current_course = self.get_current_course()
+        if current_course is None:
+            self.raise_error(self._('This block usage is not associated with a course.'))
+        email = data.get('email') if isinstance(data, dict) else None
+        if not email:
+            raise JsonHandlerError(400, self._('Please specify the email address of the learner.'))
+
+        self.get_launch_cache().delete(launch_cache_key(email, current_course.course, current_course.run))
+        return {'email': email}
+
+    @XBlock.json_handler
+    def launch_history(self, data, suffix=""):  # pylint: disable=unused-argument
+        """
+        Return a page of the latest launch of each learner of the current course run. Only available to staff.
+
+        `data` may filter learners by (part of) their email address ("user") and by the outcome of their latest launch
+        ("outcome"), and select a "page" (starting at 1) of "page_size" learners.
+        """
+        if not getattr(self.runtime, 'user_is_staff', False):
+            raise JsonHandlerError(403, self._('You do not have permission to view launches.'))
+        current_course = self.get_current_course()
+        if current_course is None:
+            self.raise_error(self._('This block usage is not associated with a course.'))
+        xblock_settings = self.get_xblock_settings(default={})
+        if not launch_log_enabled(xblock_settings):
+            raise JsonHandlerError(404, self._('The launch log is disabled.'))
+
+        data = data if isinstance(data, dict) else {}
+        try:
+            page = max(int(data.get('page', 1)), 1)
+            page_size = min(max(int(data.get('page_size', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            raise JsonHandlerError(400, self._('Invalid page.'))
+        outcome = data.get('outcome') or None
+        if outcome is not None and outcome not in OUTCOMES:
+            raise JsonHandlerError(400, self._('Invalid outcome.'))
+
+        launches, total = get_launch_log(xblock_settings).latest_launches(
+            self.get_launch_log_key(),
+            user=data.get('user') or None,
+            outcome=outcome,
+            offset=(page - 1) * page_size,
+            limit=page_size,
+        )
+        for launch in launches:
+            url_issued_at = launch.pop('url_issued_at')
+            launch['url_age'] = launch['launched_at'] - url_issued_at if url_issued_at is not None else None
         return {
-            'sharing_portal_url': response_json['SkytapURL']
+            'launches': launches,
+            'page': page,
+            'pages': max((total + page_size - 1) // page_size, 1),
+            'total': total,
         }
+
+    @XBlock.handler
+    def launch_metrics(self, request, suffix=""):  # pylint: disable=unused-argument
+        """
+        Report latency percentiles per phase and launch outcome counts for the current course run,
+        as collected by this process. Only available to staff.
+
+        Responds in the Prometheus text format if the `format` query parameter is "prometheus", and in JSON otherwise.
+        """
+        if not getattr(self.runtime, 'user_is_staff', False):
+            return Response(status=403)
+        current_course = self.get_current_course()
+        if current_course is None:
+            return Response(status=404)
+
+        tags = self.get_metric_tags(current_course.course, current_course.run)
+        memory = self.get_metrics().memory
+        audit_log = get_audit_log(self.get_xblock_settings(default={}))
+        if request.GET.get('format') == 'prometheus':
+            body = memory.render_prometheus(**tags)
+            if audit_log is not None:
+                body += audit_log.render_prometheus()
+            return Response(body, content_type='text/plain', charset='utf-8')
+        report = memory.report(**tags)
+        report.update(tags)
+        if audit_log is not None:
+            report['audit'] = audit_log.stats()
+        return Response(json.dumps(report), content_type='application/json', charset='utf-8')
@@ -2,6 +2,9 @@
 Utils for the Skytap XBlock.
 """
 
+import threading
+import time
+
 
 def _(text):
     """
@@ -9,3 +12,74 @@ def _(text):
     scrape strings marked for translation
     """
     return text
+
+
+def course_key_patterns(course_key):
+    """
+    Return the keys that configuration entries can use to refer to the (org, course, run) `course_key`,
+    most specific first: "org/course/run", "org/course" and "org".
+    """
+    org, course, run = course_key
+    return "{}/{}/{}".format(org, course, run), "{}/{}".format(org, course), str(org)
+
+
+def time_left(deadline):
+    """
+    Return the number of seconds left until `deadline` (in seconds since the epoch), but at least 0,
+    or None if there is no deadline.
+    """
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0)
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are added at `rate` tokens per second, up to `capacity` tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """
+        Add the tokens accumulated since the last refill. The caller must hold the lock.
+        """
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self):
+        """
+        Return the number of seconds to wait for the next token, or 0 if a token is available, without taking it.
+        """
+        with self._lock:
+            self._refill(time.time())
+            return 0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def try_acquire(self):
+        """
+        Take a token if one is available. Return the number of seconds to wait for the next token otherwise,
+        or 0 if a token was taken.
+        """
+        with self._lock:
+            self._refill(time.time())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Take a token, waiting until one becomes available.
+        """
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)